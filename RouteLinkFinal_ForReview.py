@@ -9,22 +9,27 @@ RouteLink:
   the Drop field is pre-filled with the route's end_point and set readonly.
 - Gender (M/F) added to registration and to link records.
 - Link Details includes a gender filter (All / Male / Female).
-- DB migration logic to add missing gender columns if DB exists.
+- Versioned DB migrations (migrations.py) add missing gender columns and lookup indexes.
+- List/table queries and joins run on a background DB thread (dbworker.py) so the UI never blocks on SQLite.
+- Passwords are scrypt-hashed in a helper process (passwords.py); old SHA-256 hashes are upgraded on login.
 - All major screens and dialogs are scrollable (horizontal + vertical).
 """
 
 import os
 import re
 import sqlite3
-import hashlib
 import tkinter as tk
 from tkinter import ttk, messagebox
 from datetime import datetime, date
 import calendar
-import json
-import csv
 import random
-from typing import Optional
+
+from migrations import migrate
+from dbpool import get_pool
+from dbworker import DbExecutor
+from holiday_store import HolidayStore
+from slotseq import SlotSequence, slot_label
+from passwords import PasswordHasher, HasherBusy, upgrade_stored_hash
 
 # Optional libs
 try:
@@ -37,35 +42,14 @@ DB = "routelink.db"
 LOGO_PATH = "logo.png"
 HOL_JSON = "academic_holidays.json"
 HOL_CSV = "academic_holidays.csv"
+# shared, pre-configured connections (see dbpool.py); init_db() uses one at startup, after that only
+# the DbExecutor worker thread does: the UI thread never waits on SQLite
+POOL = get_pool(DB, size=2)
 
 
 # ---------------- Database / Migration helpers ----------------
-def ensure_column(table: str, column: str, col_type: str, default: Optional[str] = None):
-    """
-    Ensure a column exists in a table; if not, ALTER TABLE ADD COLUMN.
-    Note: SQLite's ALTER TABLE only supports adding columns.
-    """
-    try:
-        conn = sqlite3.connect(DB)
-        c = conn.cursor()
-        c.execute(f"PRAGMA table_info({table})")
-        cols = [r[1] for r in c.fetchall()]
-        if column not in cols:
-            sql = f"ALTER TABLE {table} ADD COLUMN {column} {col_type}"
-            if default is not None:
-                sql += f" DEFAULT {default}"
-            c.execute(sql)
-            conn.commit()
-        conn.close()
-    except Exception:
-        try:
-            conn.close()
-        except Exception:
-            pass
-
-
 def init_db():
-    conn = sqlite3.connect(DB)
+    conn = POOL.acquire()
     c = conn.cursor()
     c.execute("""
         CREATE TABLE IF NOT EXISTS users (
@@ -107,60 +91,19 @@ def init_db():
         )
     """)
     conn.commit()
-    conn.close()
-
-    # Migrate: add gender columns if not present
-    # users.gender CHAR(1) -> 'M' or 'F' or NULL
-    ensure_column("users", "gender", "TEXT")
-    # links.gender CHAR(1)
-    ensure_column("links", "gender", "TEXT")
+    # Versioned migrations (gender columns, lookup indexes); see migrations.py
+    migrate(conn)
+    POOL.release(conn)
 
 
-def hash_pw(txt: str) -> str:
-    return hashlib.sha256(txt.encode()).hexdigest()
-
-
-def user_exists(email: str) -> bool:
-    conn = sqlite3.connect(DB)
-    c = conn.cursor()
-    c.execute("SELECT id FROM users WHERE email=?", (email,))
-    r = c.fetchone()
-    conn.close()
-    return bool(r)
+# one helper process is plenty for a single user; hashing runs via the DbExecutor, never on the Tk thread
+HASHER = PasswordHasher(workers=1, max_in_flight=4)
 
 
 # ---------------- Holidays loader ----------------
 def load_academic_holidays():
-    if os.path.exists(HOL_JSON):
-        try:
-            with open(HOL_JSON, "r", encoding="utf-8") as f:
-                data = json.load(f)
-            holidays = []
-            if isinstance(data, list):
-                for item in data:
-                    if isinstance(item, str):
-                        holidays.append(item)
-                    elif isinstance(item, dict) and "date" in item:
-                        holidays.append(item["date"])
-            return sorted(set(holidays))
-        except Exception:
-            pass
-    if os.path.exists(HOL_CSV):
-        try:
-            holidays = []
-            with open(HOL_CSV, newline='', encoding="utf-8") as f:
-                reader = csv.reader(f)
-                for row in reader:
-                    if not row:
-                        continue
-                    maybe = row[0].strip()
-                    if maybe.lower() == "date":
-                        continue
-                    holidays.append(maybe)
-            return sorted(set(holidays))
-        except Exception:
-            pass
-    return generate_sample_holidays(date.today().year)
+    """Holidays from HOL_JSON / HOL_CSV (or generated samples); parsed once, reloaded on mtime change."""
+    return list(HOLIDAYS.all())
 
 
 def generate_sample_holidays(year: int, seed: int = 123):
@@ -191,41 +134,45 @@ def generate_sample_holidays(year: int, seed: int = 123):
     return sorted(holidays)
 
 
+HOLIDAYS = HolidayStore(HOL_JSON, HOL_CSV, fallback=generate_sample_holidays)
+
+
+def as_holiday_set(holidays):
+    """Keep a HolidayStore as-is (so reloads show up); snapshot any other iterable into a set."""
+    if isinstance(holidays, HolidayStore):
+        return holidays
+    return set(holidays or [])
+
+
+def month_aggregate(rows):
+    """
+    (travel_date, route_id, slot_no, end_point, time) rows, one per route and day, ordered by date and id
+    -> {iso: {"routes": number of routes, "summary": hover text}} for the mini calendar.
+    """
+    per_day = {}
+    for iso, rid, slot, endp, t in rows:
+        per_day.setdefault(iso, []).append((rid, slot, endp, t))
+    data = {}
+    for iso, routes in per_day.items():
+        lines = [f"{i}) {slot} → {endp} @ {t or '-'} (RouteID:{rid})" for i, (rid, slot, endp, t) in enumerate(routes, start=1)]
+        data[iso] = {"routes": sum(1 for rt in routes if rt[0] is not None), "summary": "\n".join(lines)}
+    return data
+
+
 
 # ---------------- helpers: base36 slot generation ----------------
-def to_base36(n: int) -> str:
-    """Convert non-negative integer to base36 string (0-9, A-Z)."""
-    if n < 0:
-        raise ValueError("n must be non-negative")
-    digits = "0123456789ABCDEFGHIJKLMNOPQRSTUVWXYZ"
-    if n == 0:
-        return "0"
-    out = []
-    while n:
-        n, rem = divmod(n, 36)
-        out.append(digits[rem])
-    return "".join(reversed(out))
+# shared with the web app through the sequences table, so neither can hand out a number the other did
+SLOTS = SlotSequence(POOL, "slot_no", block=8)
 
 
 def generate_next_slot_no() -> str:
     """
     Generate a sequential alphanumeric slot number:
-    - Find max routes.id, next = max + 1
-    - Convert next to base36 and zero-pad to length 4, prefix with 'SL'
+    - Take the next value of the persistent slot_no sequence (slotseq.py)
+    - Convert it to base36 and zero-pad to length 4, prefix with 'SL' (slotseq.slot_label)
     Example: SL0001, SL000A, ...
     """
-    try:
-        conn = sqlite3.connect(DB)
-        c = conn.cursor()
-        c.execute("SELECT MAX(id) FROM routes")
-        r = c.fetchone()
-        conn.close()
-        max_id = int(r[0]) if (r and r[0]) else 0
-        seq = max_id + 1
-    except Exception:
-        seq = 1
-    b36 = to_base36(seq).rjust(4, "0")  # pad to at least 4 chars
-    return f"SL{b36}"
+    return slot_label(SLOTS.next())
 
 
 # ---------------- Tooltip ----------------
@@ -344,15 +291,21 @@ class ScrollableFrame(tk.Frame):
 
 # ---------------- MiniCalendar ----------------
 class MiniCalendar(tk.Frame):
-    def __init__(self, parent, year=None, month=None, on_select=None, holidays=None, get_counts=None, get_summary=None):
+    def __init__(self, parent, year=None, month=None, on_select=None, holidays=None, get_counts=None, get_summary=None,
+                 get_month=None):
         super().__init__(parent)
         self.on_select = on_select
         self.get_counts = get_counts
         self.get_summary = get_summary
+        # get_month(year, month, on_done): one request per draw instead of one query per day;
+        # on_done({iso: {"routes": n, "summary": str}}) runs later, on the Tk thread
+        self.get_month = get_month
+        self.month_data = {}
+        self._month_shown = None   # (year, month) that month_data belongs to
         today = date.today()
         self.year = year or today.year
         self.month = month or today.month
-        self.holidays = set(holidays or [])
+        self.holidays = as_holiday_set(holidays)
         self.today = today
         self._build()
         self.tooltip = ToolTip(self)
@@ -370,68 +323,128 @@ class MiniCalendar(tk.Frame):
             tk.Label(days, text=d, width=8, bg="#dfeff6").pack(side="left", padx=1)
         self.grid_frame = tk.Frame(self)
         self.grid_frame.pack(pady=6)
+        # 6 weeks x 7 days built once; draw() only changes text, colours and state
+        self.rows, self.cells = [], []
+        for r in range(6):
+            row = tk.Frame(self.grid_frame)
+            row.grid(row=r, column=0)
+            self.rows.append(row)
+            for col in range(7):
+                idx = r * 7 + col
+                btn = tk.Button(row, text="", width=8, height=3, relief="solid", borderwidth=1,
+                                disabledforeground="#000000",
+                                command=lambda i=idx: self._on_cell_click(i))
+                btn.pack(side="left", padx=1, pady=1)
+                btn.bind("<Enter>", lambda ev, i=idx: self._on_cell_enter(ev, i))
+                btn.bind("<Leave>", lambda ev: self._on_hover_leave(ev))
+                self.cells.append(btn)
+        self.cell_days = [0] * 42
+        self.cell_iso = [None] * 42
+        self.cell_opts = [None] * 42
         self.draw()
 
+    def _load_month(self):
+        ym = (self.year, self.month)
+        if self._month_shown != ym:
+            # never show the previous month's badges while this one loads
+            self.month_data = {}
+            self._month_shown = ym
+        if not callable(self.get_month):
+            return
+        def loaded(data):
+            if (self.year, self.month) != ym or not self.winfo_exists():
+                return
+            self.month_data = data or {}
+            self._paint()
+        self.get_month(self.year, self.month, loaded)
+
+    def _day_count(self, iso):
+        if callable(self.get_month):
+            return int(self.month_data.get(iso, {}).get("routes", 0))
+        try:
+            if callable(self.get_counts):
+                return int(self.get_counts(iso) or 0)
+        except Exception:
+            pass
+        return 0
+
     def draw(self):
-        for child in self.grid_frame.winfo_children():
-            child.destroy()
-        cal = calendar.Calendar(firstweekday=0)
-        for week in cal.monthdayscalendar(self.year, self.month):
-            row = tk.Frame(self.grid_frame)
-            row.pack()
-            for day in week:
-                if day == 0:
-                    tk.Label(row, text="", width=8, height=3, relief="solid", borderwidth=1, bg="#f0f0f0").pack(side="left", padx=1, pady=1)
-                else:
-                    iso = date(self.year, self.month, day).isoformat()
-                    is_hol = iso in self.holidays
-                    count = 0
-                    try:
-                        if callable(self.get_counts):
-                            count = int(self.get_counts(iso) or 0)
-                    except Exception:
-                        count = 0
-
-                    if is_hol:
-                        line2 = "★ Holiday"
-                    elif count:
-                        line2 = f"{count} joined"
-                    else:
-                        line2 = ""
-
-                    txt = f"{day}\n{line2}" if line2 else f"{day}"
-
-                    # style: today filled blue; holidays pale red; others white
-                    if iso == self.today.isoformat():
-                        bg = "#4a90e2"
-                        fg = "white"
-                        activebg = bg
-                        activefg = fg
-                    elif is_hol:
-                        bg = "#ffecec"
-                        fg = "#b33"
-                        activebg = bg
-                        activefg = fg
-                    else:
-                        bg = "#ffffff"
-                        fg = "#000000"
-                        activebg = "#f0f8ff"
-                        activefg = fg
-
-                    btn = tk.Button(row,
-                                    text=txt,
-                                    width=8,
-                                    height=3,
-                                    bg=bg,
-                                    fg=fg,
-                                    activebackground=activebg,
-                                    activeforeground=activefg,
-                                    relief="solid",
-                                    borderwidth=1,
-                                    command=lambda d=day: self._on_click(d))
-                    btn.pack(side="left", padx=1, pady=1)
-                    btn.bind("<Enter>", lambda ev, iso=iso: self._on_hover_enter(ev, iso))
-                    btn.bind("<Leave>", lambda ev: self._on_hover_leave(ev))
+        """Paint self.year/self.month with what is loaded, then fetch the month's counts and repaint."""
+        if self._month_shown != (self.year, self.month):
+            self.month_data = {}
+        self._paint()
+        self._load_month()
+
+    def _paint(self):
+        """Reconfigure the fixed 6x7 grid for self.year/self.month; no widgets are created or destroyed."""
+        weeks = calendar.Calendar(firstweekday=0).monthdayscalendar(self.year, self.month)
+        today_iso = self.today.isoformat()
+        for r, row in enumerate(self.rows):
+            # 4-6 weeks per month: hide the unused rows but keep their widgets
+            if r < len(weeks):
+                row.grid()
+            else:
+                row.grid_remove()
+        for idx, btn in enumerate(self.cells):
+            r, col = divmod(idx, 7)
+            day = weeks[r][col] if r < len(weeks) else 0
+            if day == 0:
+                self.cell_days[idx] = 0
+                self.cell_iso[idx] = None
+                self._configure_cell(idx, text="", bg="#f0f0f0", fg="#000000", activebackground="#f0f0f0",
+                                     activeforeground="#000000", state="disabled")
+                continue
+            iso = date(self.year, self.month, day).isoformat()
+            self.cell_days[idx] = day
+            self.cell_iso[idx] = iso
+            is_hol = iso in self.holidays
+            count = self._day_count(iso)
+
+            if is_hol:
+                line2 = "★ Holiday"
+            elif count:
+                line2 = f"{count} joined"
+            else:
+                line2 = ""
+
+            txt = f"{day}\n{line2}" if line2 else f"{day}"
+
+            # style: today filled blue; holidays pale red; others white
+            if iso == today_iso:
+                bg = "#4a90e2"
+                fg = "white"
+                activebg = bg
+                activefg = fg
+            elif is_hol:
+                bg = "#ffecec"
+                fg = "#b33"
+                activebg = bg
+                activefg = fg
+            else:
+                bg = "#ffffff"
+                fg = "#000000"
+                activebg = "#f0f8ff"
+                activefg = fg
+
+            self._configure_cell(idx, text=txt, bg=bg, fg=fg, activebackground=activebg,
+                                 activeforeground=activefg, state="normal")
+
+    def _configure_cell(self, idx, **opts):
+        # skip the Tk round-trip when nothing about the cell changed since the last draw
+        key = tuple(sorted(opts.items()))
+        if self.cell_opts[idx] != key:
+            self.cells[idx].config(**opts)
+            self.cell_opts[idx] = key
+
+    def _on_cell_click(self, idx):
+        day = self.cell_days[idx]
+        if day:
+            self._on_click(day)
+
+    def _on_cell_enter(self, event, idx):
+        iso = self.cell_iso[idx]
+        if iso:
+            self._on_hover_enter(event, iso)
 
     def _on_click(self, day):
         iso = date(self.year, self.month, day).isoformat()
@@ -440,19 +453,17 @@ class MiniCalendar(tk.Frame):
 
     def _on_hover_enter(self, event, iso):
         summary = ""
-        try:
-            if callable(self.get_summary):
-                summary = self.get_summary(iso) or ""
-        except Exception:
-            summary = ""
-        if not summary:
-            is_hol = iso in self.holidays
-            count = 0
+        if callable(self.get_month):
+            summary = self.month_data.get(iso, {}).get("summary", "")
+        else:
             try:
-                if callable(self.get_counts):
-                    count = int(self.get_counts(iso) or 0)
+                if callable(self.get_summary):
+                    summary = self.get_summary(iso) or ""
             except Exception:
-                count = 0
+                summary = ""
+        if not summary:
+            is_hol = iso in self.holidays
+            count = self._day_count(iso)
             parts = []
             if is_hol:
                 parts.append("Holiday")
@@ -485,7 +496,7 @@ class MiniCalendar(tk.Frame):
         self.draw()
 
     def update_holidays(self, holidays):
-        self.holidays = set(holidays or [])
+        self.holidays = as_holiday_set(holidays)
         self.draw()
 
     def update_counts_source(self, get_counts):
@@ -550,54 +561,74 @@ class RouteLinkApp(tk.Tk):
         self.link_tab = None
 
         # holidays
-        self.holidays = load_academic_holidays()
+        # live store: O(1) membership, picks up edits to the holidays file
+        self.holidays = HOLIDAYS
+        # (year, month) -> (data_versions n, {iso: {"routes": n, "summary": str}})
+        self.month_cache = {}
+
+        # background DB thread; results are delivered back on this (Tk) thread
+        self.db = DbExecutor(POOL)
+        self.db.attach(self)
+
+    # mini calendar: per-day route counts and hover summaries for a whole month in one query.
+    # Cached per (year, month); an entry is reused while the month's data_versions counter
+    # (bumped by triggers on every calendar/route write, from here or the web app) is unchanged.
+    # Both the version check and the query run on the DB thread; on_done(data) runs on the Tk thread.
+    def load_month(self, year: int, month: int, on_done):
+        key = (year, month)
+        ym = f"{year:04d}-{month:02d}"
+        cached = self.month_cache.get(key)
+        if cached:
+            on_done(cached[1])   # paint what we have now; replaced below if the month changed since
+        def work(conn):
+            r = conn.execute("SELECT n FROM data_versions WHERE key=?", (f"month:{ym}",)).fetchone()
+            ver = r[0] if r else 0
+            if cached and cached[0] == ver:
+                return ver, None
+            rows = conn.execute("""
+                SELECT cal.travel_date, r.id, r.slot_no, r.end_point, r.time
+                FROM calendar cal
+                LEFT JOIN routes r ON cal.route_id = r.id
+                WHERE cal.travel_date BETWEEN ? AND ?
+                GROUP BY cal.travel_date, cal.route_id
+                ORDER BY cal.travel_date, r.id
+            """, (f"{ym}-01", f"{ym}-31")).fetchall()
+            return ver, month_aggregate(rows)
+        def done(result):
+            ver, data = result
+            if data is None:
+                return
+            self.month_cache[key] = (ver, data)
+            on_done(data)
+        # keyed: paging through months quickly only loads the month left on screen
+        self.db.submit(work, on_done=done, on_error=lambda exc: None, key="mini-month")
 
-    # DB helper: count how many joined links for route on date
-    def get_join_count(self, iso_date: str, route_id: int) -> int:
+    def cached_month_day(self, iso_date: str):
+        """The loaded month aggregate for iso_date, or None when that month has not been loaded yet."""
         try:
-            conn = sqlite3.connect(DB)
-            c = conn.cursor()
-            c.execute("SELECT COUNT(*) FROM calendar WHERE travel_date=? AND route_id=? AND link_id IS NOT NULL", (iso_date, route_id))
-            r = c.fetchone()
-            conn.close()
-            return int(r[0]) if r else 0
-        except Exception:
-            return 0
+            cached = self.month_cache.get((int(iso_date[:4]), int(iso_date[5:7])))
+        except (TypeError, ValueError):
+            return None
+        return cached[1].get(iso_date) if cached else None
+
+    def invalidate_month(self, iso_date: str = None):
+        """Drop the cached aggregate for iso_date's month (all months when None). Call after writing routes/links."""
+        if iso_date is None:
+            self.month_cache.clear()
+            return
+        try:
+            self.month_cache.pop((int(iso_date[:4]), int(iso_date[5:7])), None)
+        except (TypeError, ValueError):
+            self.month_cache.clear()
 
-    # used for mini calendar: number of distinct routes on day
+    # used for mini calendar: number of distinct routes on day (from the loaded month; no query here)
     def get_route_count_for_day(self, iso_date: str) -> int:
-        try:
-            conn = sqlite3.connect(DB)
-            c = conn.cursor()
-            c.execute("SELECT COUNT(DISTINCT route_id) FROM calendar WHERE travel_date=?", (iso_date,))
-            r = c.fetchone()
-            conn.close()
-            return int(r[0]) if r else 0
-        except Exception:
-            return 0
+        day = self.cached_month_day(iso_date)
+        return day["routes"] if day else 0
 
     def get_route_summary(self, iso_date: str) -> str:
-        try:
-            conn = sqlite3.connect(DB)
-            c = conn.cursor()
-            c.execute("""
-                SELECT DISTINCT r.id, r.slot_no, r.end_point, r.time
-                FROM calendar cal
-                LEFT JOIN routes r ON cal.route_id = r.id
-                WHERE cal.travel_date = ?
-                ORDER BY r.id
-            """, (iso_date,))
-            rows = c.fetchall()
-            conn.close()
-            if not rows:
-                return "No scheduled routes"
-            lines = []
-            for i, (rid, slot, endp, t) in enumerate(rows, start=1):
-                tdisp = t or "-"
-                lines.append(f"{i}) {slot} → {endp} @ {tdisp} (RouteID:{rid})")
-            return "\n".join(lines)
-        except Exception:
-            return "Unable to load routes"
+        day = self.cached_month_day(iso_date)
+        return day["summary"] if day else "No scheduled routes"
 
     # check if date is in the past
     def is_past_date(self, iso_date: str) -> bool:
@@ -613,7 +644,8 @@ class RouteLinkApp(tk.Tk):
             self.nb.forget(t)
         self.calendar_tab = CalendarTab(self.nb, app=self, holidays=self.holidays,
                                         get_counts=self.get_route_count_for_day,
-                                        get_summary=self.get_route_summary)
+                                        get_summary=self.get_route_summary,
+                                        get_month=self.load_month)
         self.nb.add(self.calendar_tab, text="Calendar")
         self.nb.select(self.calendar_tab)
 
@@ -668,6 +700,7 @@ class StartTab(ttk.Frame):
 class RegisterDialog(tk.Toplevel):
     def __init__(self, app):
         super().__init__(app)
+        self.app = app
         self.title("Register - RouteLink")
         self.geometry("520x520")
         self.resizable(True, True)
@@ -695,7 +728,8 @@ class RegisterDialog(tk.Toplevel):
         tk.Radiobutton(gframe, text="Male", variable=self.gender_var, value="M").pack(side="left", padx=4)
         tk.Radiobutton(gframe, text="Female", variable=self.gender_var, value="F").pack(side="left", padx=4)
 
-        tk.Button(frame, text="Register", bg="#2a9d8f", fg="white", width=20, command=self.do_register).grid(row=6, column=0, columnspan=2, pady=12)
+        self.submit_btn = tk.Button(frame, text="Register", bg="#2a9d8f", fg="white", width=20, command=self.do_register)
+        self.submit_btn.grid(row=6, column=0, columnspan=2, pady=12)
 
     def do_register(self):
         name = self.name.get().strip()
@@ -709,29 +743,34 @@ class RegisterDialog(tk.Toplevel):
             messagebox.showerror("Validation", "Please use a VIT email (example@vitstudent.ac.in).")
             return
 
-        try:
-            conn = sqlite3.connect(DB)
-            c = conn.cursor()
-            # users table may or may not have gender column depending on older DB; migration added it earlier
-            c.execute("INSERT INTO users (name, email, password_hash, gender) VALUES (?, ?, ?, ?)", (name, email, hash_pw(pw), gender))
-            conn.commit()
-            conn.close()
-            messagebox.showinfo("Success", "Registration completed. Now login.")
-            self.destroy()
-        except sqlite3.IntegrityError:
-            messagebox.showerror("Error", "Email already registered.")
-        except Exception as e:
-            # fallback if migration didn't run: try without gender column
+        def work(conn):
+            pw_hash, pw_algo, pw_params = HASHER.hash(pw)
             try:
-                conn = sqlite3.connect(DB)
-                c = conn.cursor()
-                c.execute("INSERT INTO users (name, email, password_hash) VALUES (?, ?, ?)", (name, email, hash_pw(pw)))
+                conn.execute("INSERT INTO users (name, email, password_hash, gender, pw_algo, pw_params) VALUES (?, ?, ?, ?, ?, ?)",
+                             (name, email, pw_hash, gender, pw_algo, pw_params))
                 conn.commit()
-                conn.close()
-                messagebox.showinfo("Success", "Registration completed. Now login.")
-                self.destroy()
-            except Exception:
-                messagebox.showerror("Error", "Unable to register. Please try again.")
+            except sqlite3.IntegrityError:
+                conn.rollback()
+                return False
+            return True
+
+        def done(ok):
+            self.submit_btn.config(state="normal")
+            if not ok:
+                messagebox.showerror("Error", "Email already registered.")
+                return
+            messagebox.showinfo("Success", "Registration completed. Now login.")
+            self.destroy()
+
+        def failed(exc):
+            self.submit_btn.config(state="normal")
+            if isinstance(exc, HasherBusy):
+                messagebox.showwarning("Busy", "Still working on another request. Please try again in a moment.")
+                return
+            messagebox.showerror("Error", "Unable to register. Please try again.")
+
+        self.submit_btn.config(state="disabled")
+        self.app.db.submit(work, on_done=done, on_error=failed)
 
 
 class LoginDialog(tk.Toplevel):
@@ -754,7 +793,8 @@ class LoginDialog(tk.Toplevel):
         tk.Label(frame, text="Password").grid(row=2, column=0, sticky="w", pady=6)
         self.pw = tk.Entry(frame, width=36, show="*"); self.pw.grid(row=2, column=1, pady=6)
 
-        tk.Button(frame, text="Login", bg="#e76f51", fg="white", width=20, command=self.do_login).grid(row=3, column=0, columnspan=2, pady=12)
+        self.submit_btn = tk.Button(frame, text="Login", bg="#e76f51", fg="white", width=20, command=self.do_login)
+        self.submit_btn.grid(row=3, column=0, columnspan=2, pady=12)
 
     def do_login(self):
         email = self.email.get().strip().lower()
@@ -762,30 +802,50 @@ class LoginDialog(tk.Toplevel):
         if not email or not pw:
             messagebox.showerror("Validation", "Enter email and password.")
             return
-        if not user_exists(email):
-            messagebox.showerror("No account", "No account found with this email. Please register first.")
-            return
-        conn = sqlite3.connect(DB)
-        c = conn.cursor()
-        c.execute("SELECT id, name FROM users WHERE email=? AND password_hash=?", (email, hash_pw(pw)))
-        r = c.fetchone()
-        conn.close()
-        if r:
-            messagebox.showinfo("Welcome", f"Hello, {r[1]}! Entering the app.")
-            self.destroy()
-            self.app.show_calendar_tab()
-        else:
-            messagebox.showerror("Error", "Invalid credentials. If you don't have an account, please register.")
+
+        def work(conn):
+            # -> (account exists, name if the password matched)
+            r = conn.execute("SELECT id, name, password_hash, pw_algo, pw_params FROM users WHERE email=?", (email,)).fetchone()
+            if r is None:
+                return False, None
+            if not HASHER.verify(pw, r[2], r[3], r[4]):
+                return True, None
+            # legacy SHA-256 hash: store a scrypt one now that we know the password
+            upgrade_stored_hash(conn, HASHER, r[0], pw, r[2], r[3], r[4])
+            return True, r[1]
+
+        def done(result):
+            self.submit_btn.config(state="normal")
+            exists, name = result
+            if not exists:
+                messagebox.showerror("No account", "No account found with this email. Please register first.")
+            elif name:
+                messagebox.showinfo("Welcome", f"Hello, {name}! Entering the app.")
+                self.destroy()
+                self.app.show_calendar_tab()
+            else:
+                messagebox.showerror("Error", "Invalid credentials. If you don't have an account, please register.")
+
+        def failed(exc):
+            self.submit_btn.config(state="normal")
+            if isinstance(exc, HasherBusy):
+                messagebox.showwarning("Busy", "Still working on another request. Please try again in a moment.")
+                return
+            messagebox.showerror("Error", f"Could not log in: {exc}")
+
+        self.submit_btn.config(state="disabled")
+        self.app.db.submit(work, on_done=done, on_error=failed)
 
 
 # ---------------- Calendar Tab ----------------
 class CalendarTab(ttk.Frame):
-    def __init__(self, parent, app, holidays=None, get_counts=None, get_summary=None):
+    def __init__(self, parent, app, holidays=None, get_counts=None, get_summary=None, get_month=None):
         super().__init__(parent, padding=14)
         self.app = app
-        self.holidays = set(holidays or [])
+        self.holidays = as_holiday_set(holidays)
         self.get_counts = get_counts
         self.get_summary = get_summary
+        self.get_month = get_month
 
         # whole tab scrollable
         scroll = ScrollableFrame(self, width=920, height=620)
@@ -804,7 +864,7 @@ class CalendarTab(ttk.Frame):
         right.pack(side="left", fill="both", expand=True, padx=6, pady=6)
 
         self.mini = MiniCalendar(left, on_select=self.on_mini_select, holidays=self.holidays,
-                                get_counts=self.get_counts, get_summary=self.get_summary)
+                                get_counts=self.get_counts, get_summary=self.get_summary, get_month=self.get_month)
         self.mini.pack()
 
         tk.Label(right, text="Holidays", font=("Arial", 12, "bold")).pack(anchor="nw")
@@ -841,18 +901,19 @@ class CalendarTab(ttk.Frame):
         self.app.show_route_tab(iso_date)
 
     def display_routes_for_date(self, iso_date):
+        def work(conn):
+            return conn.execute("""
+                SELECT DISTINCT r.id, r.slot_no, r.end_point, r.time, r.transport_type
+                FROM calendar cal
+                LEFT JOIN routes r ON cal.route_id = r.id
+                WHERE cal.travel_date = ?
+                ORDER BY r.id DESC
+            """, (iso_date,)).fetchall()
+        # keyed: clicking through dates quickly only renders the last one
+        self.app.db.submit(work, on_done=lambda rows: self._show_routes(iso_date, rows), key="calendar-routes")
+
+    def _show_routes(self, iso_date, rows):
         self.routes_text.delete("1.0", tk.END)
-        conn = sqlite3.connect(DB)
-        c = conn.cursor()
-        c.execute("""
-            SELECT DISTINCT r.id, r.slot_no, r.end_point, r.time, r.transport_type
-            FROM calendar cal
-            LEFT JOIN routes r ON cal.route_id = r.id
-            WHERE cal.travel_date = ?
-            ORDER BY r.id DESC
-        """, (iso_date,))
-        rows = c.fetchall()
-        conn.close()
         if not rows:
             self.routes_text.insert(tk.END, f"No routes on {iso_date}\n\nClick the date to add one.\n")
             return
@@ -914,24 +975,31 @@ class RouteTab(ttk.Frame):
         # Removed the "Route created" messagebox as requested.
 
     def refresh(self):
-        for r in self.tree.get_children():
-            self.tree.delete(r)
         if not self.current_date:
+            self.app.db.cancel("route-tab")
+            self._fill(None, [])
+            return
+        iso_date = self.current_date
+        def work(conn):
+            # join counts come from the same grouped scan instead of one query per row
+            return conn.execute("""
+                SELECT r.id, r.slot_no, r.end_point, r.major_stops, r.time, r.transport_type,
+                       COUNT(cal.link_id) AS count
+                FROM routes r
+                JOIN calendar cal ON cal.route_id = r.id
+                WHERE cal.travel_date = ?
+                GROUP BY r.id
+                ORDER BY r.id DESC
+            """, (iso_date,)).fetchall()
+        self.app.db.submit(work, on_done=lambda rows: self._fill(iso_date, rows), key="route-tab")
+
+    def _fill(self, iso_date, rows):
+        if iso_date != self.current_date:
             return
-        conn = sqlite3.connect(DB)
-        c = conn.cursor()
-        c.execute("""
-            SELECT DISTINCT r.id, r.slot_no, r.end_point, r.major_stops, r.time, r.transport_type
-            FROM routes r
-            JOIN calendar cal ON cal.route_id = r.id
-            WHERE cal.travel_date = ?
-            ORDER BY r.id DESC
-        """, (self.current_date,))
-        rows = c.fetchall()
-        conn.close()
+        for r in self.tree.get_children():
+            self.tree.delete(r)
         for row in rows:
-            rid, slot, endp, stops, ttime, ttype = row
-            count = self.app.get_join_count(self.current_date, rid)
+            rid, slot, endp, stops, ttime, ttype, count = row
             self.tree.insert("", "end", iid=str(rid), values=(slot, endp, stops, ttime or "-", ttype or "-", str(count)))
 
     def on_route_double_click(self, event):
@@ -987,7 +1055,8 @@ class RouteDialog(tk.Toplevel):
             generated = "SL0000"
         self.entries["Slot No"].insert(0, generated)
 
-        tk.Button(frame, text="Create Route", bg="#2a9d8f", fg="white", width=18, command=self.create_route).grid(row=8, column=0, columnspan=2, pady=12)
+        self.create_btn = tk.Button(frame, text="Create Route", bg="#2a9d8f", fg="white", width=18, command=self.create_route)
+        self.create_btn.grid(row=8, column=0, columnspan=2, pady=12)
 
     def create_route(self):
         d = self.date_ent.get().strip()
@@ -1008,56 +1077,60 @@ class RouteDialog(tk.Toplevel):
                 messagebox.showerror("Validation", "Time must be HH:MM.")
                 return
 
-        # Duplicate check: same transport, endpoint, time for date
-        try:
-            conn = sqlite3.connect(DB)
+        def work(conn):
+            # Insert route + calendar mapping in one transaction; the duplicate check (same transport,
+            # endpoint, time for date) is the uq_routes_day_key UNIQUE index from migrations.py
             c = conn.cursor()
-            c.execute("""
-                SELECT r.id
-                FROM routes r
-                JOIN calendar cal ON cal.route_id = r.id
-                WHERE cal.travel_date = ?
-                  AND LOWER(r.end_point) = LOWER(?)
-                  AND COALESCE(r.time, '') = ?
-                  AND LOWER(COALESCE(r.transport_type, '')) = LOWER(?)
-                LIMIT 1
-            """, (d, vals[1], vals[3], vals[4]))
-            existing = c.fetchone()
-            conn.close()
-            if existing:
+            try:
+                conn.execute("BEGIN IMMEDIATE")
+                c.execute("""INSERT INTO routes (slot_no, end_point, major_stops, time, transport_type, no_of_people, key_date)
+                             VALUES (?, ?, ?, ?, ?, ?, ?)""", (vals[0], vals[1], vals[2], vals[3], vals[4], 0, d))
+                route_id = c.lastrowid
+                c.execute("INSERT INTO calendar (travel_date, route_id, link_id) VALUES (?, ?, NULL)", (d, route_id))
+                conn.commit()
+            except sqlite3.IntegrityError:
+                conn.rollback()
+                return None
+            return route_id
+
+        def done(route_id):
+            self.create_btn.config(state="normal")
+            if route_id is None:
                 messagebox.showwarning("Duplicate Route",
                                        "A route with the same endpoint, time and transport already exists for the selected date.\n\n"
                                        "Please check the Route Details for that date before creating a duplicate.")
                 return
-        except Exception:
-            # If DB check fails, continue but ideally log
-            pass
+            self.app.invalidate_month(d)
+            if callable(self.after_create_callback):
+                # callback handles UI refresh; we intentionally do not show a messagebox here
+                self.after_create_callback(route_id, d)
+            self.destroy()
 
-        # Insert route + calendar mapping
-        conn = sqlite3.connect(DB)
-        c = conn.cursor()
-        c.execute("INSERT INTO routes (slot_no, end_point, major_stops, time, transport_type, no_of_people) VALUES (?, ?, ?, ?, ?, ?)",
-                  (vals[0], vals[1], vals[2], vals[3], vals[4], 0))
-        conn.commit()
-        route_id = c.lastrowid
-        c.execute("INSERT INTO calendar (travel_date, route_id, link_id) VALUES (?, ?, NULL)", (d, route_id))
-        conn.commit()
-        conn.close()
+        def failed(exc):
+            self.create_btn.config(state="normal")
+            messagebox.showerror("Error", f"Could not create route: {exc}")
 
-        if callable(self.after_create_callback):
-            # callback handles UI refresh; we intentionally do not show a messagebox here
-            self.after_create_callback(route_id, d)
-        self.destroy()
+        self.create_btn.config(state="disabled")
+        self.app.db.submit(work, on_done=done, on_error=failed)
 
 
 # ---------------- Link Tab (ID column hidden, gender filter) ----------------
 class LinkTab(ttk.Frame):
+    PAGE_SIZE = 200   # rows per keyset page in the all-links view
+    GENDER_CODES = {"Male": "M", "Female": "F"}
+
     def __init__(self, parent, app):
         super().__init__(parent, padding=14)
         self.app = app
         self.route_id = None
         self.route_date = None
         self.route_end_point = None
+        self._route_ready = False   # route_end_point has been loaded for route_id
+        self._joining = False   # a join is in flight on the DB thread
+        # all-links paging: id of the last row shown (keyset cursor), more rows exist, a page is in flight
+        self._last_id = None
+        self._has_more = False
+        self._loading = False
 
         # scrollable
         scroll = ScrollableFrame(self, width=920, height=620)
@@ -1106,11 +1179,16 @@ class LinkTab(ttk.Frame):
 
         # No ID column shown. Visible columns:
         cols = ("Name", "Gender", "Drop", "Phone", "Year", "Branch")
-        self.tree = ttk.Treeview(container, columns=cols, show="headings", height=10, selectmode="extended")
+        tree_frame = tk.Frame(container)
+        tree_frame.pack(fill="both", expand=True, padx=8, pady=8)
+        self.tree = ttk.Treeview(tree_frame, columns=cols, show="headings", height=10, selectmode="extended")
         for c in cols:
             self.tree.heading(c, text=c)
             self.tree.column(c, width=120)
-        self.tree.pack(fill="both", expand=True, padx=8, pady=8)
+        self.tree_vbar = ttk.Scrollbar(tree_frame, orient="vertical", command=self.tree.yview)
+        self.tree.configure(yscrollcommand=self._on_tree_scroll)
+        self.tree_vbar.pack(side="right", fill="y")
+        self.tree.pack(side="left", fill="both", expand=True)
         self.tree.bind("<<TreeviewSelect>>", self.on_tree_select)
 
         self.refresh()
@@ -1132,13 +1210,24 @@ class LinkTab(ttk.Frame):
         """
         self.route_id = route_id
         self.route_date = route_date
-        # fetch route end_point for validation
-        conn = sqlite3.connect(DB)
-        c = conn.cursor()
-        c.execute("SELECT end_point FROM routes WHERE id=?", (route_id,))
-        r = c.fetchone()
-        conn.close()
-        self.route_end_point = r[0] if r else None
+        self.route_end_point = None
+        self._route_ready = False   # join_route waits for the end point below
+        self.delete_link_btn.config(state="disabled")
+        self.refresh_for_route()
+
+        # fetch route end_point for validation, on the DB thread
+        def work(conn):
+            r = conn.execute("SELECT end_point FROM routes WHERE id=?", (route_id,)).fetchone()
+            return r[0] if r else None
+        def done(end_point):
+            if (self.route_id, self.route_date) == (route_id, route_date):
+                self._set_route_end_point(end_point)
+        self.app.db.submit(work, on_done=done, on_error=lambda exc: done(None), key="link-route")
+        # No informational messagebox (per your preferences)
+
+    def _set_route_end_point(self, end_point):
+        self.route_end_point = end_point
+        self._route_ready = True
 
         # set Drop entry to route_end_point and make readonly
         drop_entry = self.entries.get("Drop")
@@ -1162,29 +1251,14 @@ class LinkTab(ttk.Frame):
                 except Exception:
                     pass
 
-        self.delete_link_btn.config(state="disabled")
-        self.refresh_for_route()
-        # No informational messagebox (per your preferences)
-
     def refresh(self):
-        """Show all links (default) — uses iid 'link_<id>' but hides id column."""
-        for r in self.tree.get_children():
-            self.tree.delete(r)
-        gender_sel = self.gender_filter.get()
-        conn = sqlite3.connect(DB)
-        c = conn.cursor()
-        c.execute("SELECT id, name, gender, drop_point, phone, course_year, branch FROM links ORDER BY id DESC")
-        for row in c.fetchall():
-            lid, name, gender, drop, phone, year, branch = row
-            # normalize gender
-            gender = (gender or "").upper()
-            if gender_sel == "Male" and gender != "M":
-                continue
-            if gender_sel == "Female" and gender != "F":
-                continue
-            iid = f"link_{lid}"
-            self.tree.insert("", "end", iid=iid, values=(name, gender or "-", drop or "-", phone or "-", year or "-", branch or "-"))
-        conn.close()
+        """
+        Show all links (default), newest first — uses iid 'link_<id>' but hides id column.
+        Only the first PAGE_SIZE rows are loaded; scrolling near the end fetches the next page.
+        """
+        self._last_id = None
+        self._has_more = False
+        self._load_page(replace=True)
         self.delete_link_btn.config(state="disabled")
         # Ensure Drop entry editable when browsing general link list
         drop_entry = self.entries.get("Drop")
@@ -1196,33 +1270,77 @@ class LinkTab(ttk.Frame):
 
     def refresh_for_route(self):
         """Show only links attached to current route & date, iids still encode link id."""
-        for r in self.tree.get_children():
-            self.tree.delete(r)
         if not self.route_id or not self.route_date:
             self.refresh()
             return
-        gender_sel = self.gender_filter.get()
-        conn = sqlite3.connect(DB)
-        c = conn.cursor()
-        c.execute("""
-            SELECT l.id, l.name, l.gender, l.drop_point, l.phone, l.course_year, l.branch
-            FROM links l
-            JOIN calendar cal ON cal.link_id = l.id
-            WHERE cal.route_id = ? AND cal.travel_date = ?
-            ORDER BY l.id DESC
-        """, (self.route_id, self.route_date))
-        rows = c.fetchall()
-        conn.close()
+        route_id, route_date = self.route_id, self.route_date
+        gender_sql, params = self._gender_clause("l.")
+        def work(conn):
+            return conn.execute(f"""
+                SELECT l.id, l.name, l.gender, l.drop_point, l.phone, l.course_year, l.branch
+                FROM links l
+                JOIN calendar cal ON cal.link_id = l.id
+                WHERE cal.route_id = ? AND cal.travel_date = ?{gender_sql}
+                ORDER BY l.id DESC
+            """, (route_id, route_date, *params)).fetchall()
+        # route lists are small: one query, no paging
+        self._has_more = False
+        self._loading = True
+        self.app.db.submit(work, on_done=lambda rows: self._fill_tree(rows, replace=True), key="link-tab",
+                           on_error=self._load_failed)
+        self.delete_link_btn.config(state="disabled")
+
+    def _gender_clause(self, prefix=""):
+        """SQL filter for the gender combobox on the indexed links.gender_norm column (migration v4)."""
+        code = self.GENDER_CODES.get(self.gender_filter.get())
+        if not code:
+            return "", ()
+        return f" AND {prefix}gender_norm = ?", (code,)
+
+    def _load_page(self, replace=False):
+        gender_sql, params = self._gender_clause()
+        after = None if replace else self._last_id
+        limit = self.PAGE_SIZE
+        def work(conn):
+            # keyset on id: seeks straight to the page, cost does not grow with how far down we are
+            where = " WHERE 1=1" + gender_sql
+            args = list(params)
+            if after is not None:
+                where += " AND id < ?"
+                args.append(after)
+            return conn.execute(f"SELECT id, name, gender, drop_point, phone, course_year, branch FROM links{where} "
+                                f"ORDER BY id DESC LIMIT ?", (*args, limit + 1)).fetchall()
+        def done(rows):
+            self._has_more = len(rows) > limit
+            self._fill_tree(rows[:limit], replace=replace)
+        self._loading = True
+        # same key as refresh_for_route: whichever view was asked for last wins
+        self.app.db.submit(work, on_done=done, on_error=self._load_failed, key="link-tab")
+
+    def _load_failed(self, exc):
+        self._loading = False
+        self._has_more = False
+
+    def _on_tree_scroll(self, first, last):
+        self.tree_vbar.set(first, last)
+        # near the bottom of what is loaded: fetch the next page
+        if self._has_more and not self._loading and float(last) > 0.9:
+            self._load_page()
+
+    def _fill_tree(self, rows, replace=False):
+        self._loading = False
+        if replace:
+            self.tree.delete(*self.tree.get_children())
         for row in rows:
             lid, name, gender, drop, phone, year, branch = row
             gender = (gender or "").upper()
-            if gender_sel == "Male" and gender != "M":
-                continue
-            if gender_sel == "Female" and gender != "F":
-                continue
             iid = f"link_{lid}"
+            if self.tree.exists(iid):
+                continue
             self.tree.insert("", "end", iid=iid, values=(name, gender or "-", drop or "-", phone or "-", year or "-", branch or "-"))
-        self.delete_link_btn.config(state="disabled")
+            self._last_id = lid
+        if replace:
+            self.delete_link_btn.config(state="disabled")
 
     def on_tree_select(self, event):
         sel = self.tree.selection()
@@ -1235,6 +1353,8 @@ class LinkTab(ttk.Frame):
         if not self.route_id or not self.route_date:
             messagebox.showerror("Error", "No route selected.")
             return
+        if not self._route_ready:
+            return   # route details still loading
         # read entries; Gender comes from self.gender_var
         vals = []
         # Name
@@ -1266,25 +1386,41 @@ class LinkTab(ttk.Frame):
         if self.route_end_point and drop.strip().lower() != self.route_end_point.strip().lower():
             messagebox.showerror("Mismatch", f"Drop/location must match route destination: '{self.route_end_point}'.\nPlease use the same destination.")
             return
-        conn = sqlite3.connect(DB)
-        c = conn.cursor()
-        # Prevent duplicate for same phone + route + date
-        c.execute("SELECT l.id FROM links l JOIN calendar cal ON cal.link_id = l.id WHERE cal.travel_date=? AND cal.route_id=? AND l.phone=?", (self.route_date, self.route_id, phone))
-        if c.fetchone():
-            conn.close()
+        if self._joining:
+            return
+        route_id, route_date = self.route_id, self.route_date
+
+        def work(conn):
+            # one transaction: duplicate phone + route + date and a full route are rejected by the
+            # constraint/triggers from migrations.py (v7), so racing joins cannot both get in
+            c = conn.cursor()
+            try:
+                conn.execute("BEGIN IMMEDIATE")
+                c.execute("INSERT INTO links (name, gender, drop_point, phone, course_year, branch) VALUES (?, ?, ?, ?, ?, ?)", (vals[0], vals[1], vals[2], vals[3], vals[4], vals[5]))
+                link_id = c.lastrowid
+                # link to calendar
+                c.execute("INSERT INTO calendar (travel_date, route_id, link_id) VALUES (?, ?, ?)", (route_date, route_id, link_id))
+                conn.commit()
+            except sqlite3.IntegrityError as e:
+                conn.rollback()
+                return "full" if "route full" in str(e) else "duplicate"
+            return link_id
+
+        def failed(exc):
+            self._joining = False
+            messagebox.showerror("Error", f"Could not join route: {exc}")
+
+        self._joining = True
+        self.app.db.submit(work, on_done=lambda result: self._after_join(result, route_date), on_error=failed)
+
+    def _after_join(self, result, route_date):
+        self._joining = False
+        if result == "duplicate":
             messagebox.showerror("Already joined", "This phone has already joined this route on that date.")
             return
-        # insert link (including gender)
-        try:
-            c.execute("INSERT INTO links (name, gender, drop_point, phone, course_year, branch) VALUES (?, ?, ?, ?, ?, ?)", (vals[0], vals[1], vals[2], vals[3], vals[4], vals[5]))
-        except Exception:
-            # fallback if migration somehow didn't happen
-            c.execute("INSERT INTO links (name, drop_point, phone, course_year, branch) VALUES (?, ?, ?, ?, ?)", (vals[0], vals[2], vals[3], vals[4], vals[5]))
-        link_id = c.lastrowid
-        # link to calendar
-        c.execute("INSERT INTO calendar (travel_date, route_id, link_id) VALUES (?, ?, ?)", (self.route_date, self.route_id, link_id))
-        conn.commit()
-        conn.close()
+        if result == "full":
+            messagebox.showerror("Route full", "All seats on this route are taken.")
+            return
         # No join-success popup (quiet)
         # clear inputs but keep Drop readonly if route-specific
         for k,e in self.entries.items():
@@ -1305,6 +1441,7 @@ class LinkTab(ttk.Frame):
                 except Exception:
                     pass
 
+        self.app.invalidate_month(route_date)
         self.refresh_for_route()
         # update route table count and calendar badges
         if self.app.route_tab:
@@ -1316,7 +1453,7 @@ class LinkTab(ttk.Frame):
                 pass
         if self.app.calendar_tab:
             try:
-                self.app.calendar_tab.display_routes_for_date(self.route_date)
+                self.app.calendar_tab.display_routes_for_date(route_date)
             except Exception:
                 pass
 
@@ -1339,12 +1476,26 @@ class LinkTab(ttk.Frame):
             return
         if not messagebox.askyesno("Confirm", f"Delete {len(link_ids)} selected link(s)? This will remove them from the app and any calendar mappings."):
             return
-        conn = sqlite3.connect(DB)
-        c = conn.cursor()
-        c.executemany("DELETE FROM calendar WHERE link_id=?", [(lid,) for lid in link_ids])
-        c.executemany("DELETE FROM links WHERE id=?", [(lid,) for lid in link_ids])
-        conn.commit()
-        conn.close()
+
+        def work(conn):
+            try:
+                c = conn.cursor()
+                c.executemany("DELETE FROM calendar WHERE link_id=?", [(lid,) for lid in link_ids])
+                c.executemany("DELETE FROM links WHERE id=?", [(lid,) for lid in link_ids])
+                conn.commit()
+            except Exception:
+                conn.rollback()
+                raise
+
+        def failed(exc):
+            self.delete_link_btn.config(state="normal")
+            messagebox.showerror("Error", f"Could not delete links: {exc}")
+
+        self.delete_link_btn.config(state="disabled")
+        self.app.db.submit(work, on_done=lambda _r: self._after_delete(link_ids), on_error=failed)
+
+    def _after_delete(self, link_ids):
+        self.app.invalidate_month()   # the links may have been on any date
         messagebox.showinfo("Deleted", f"Deleted {len(link_ids)} link(s).")
         if self.route_id and self.route_date:
             self.refresh_for_route()
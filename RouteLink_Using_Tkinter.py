@@ -12,13 +12,13 @@ RouteLink:
 - Gender (M/F) added to registration and to link records.
 - Link Details includes a gender filter (All / Male / Female).
 - DB migration logic to add missing gender columns if DB exists.
+- Passwords are hashed with scrypt off the Tk thread (passwords.py); old SHA-256 hashes are upgraded at login.
 - All major screens and dialogs are scrollable (horizontal + vertical).
 """
 
 import os
 import re
 import sqlite3
-import hashlib
 import tkinter as tk
 from tkinter import ttk, messagebox
 from datetime import datetime, date
@@ -28,6 +28,10 @@ import csv
 import random
 from typing import Optional
 
+from dbpool import get_pool
+from dbworker import DbExecutor
+from passwords import PasswordHasher, HasherBusy, upgrade_stored_hash
+
 # Optional libs
 try:
     from PIL import Image, ImageTk
@@ -39,6 +43,8 @@ DB = "routelink.db"
 LOGO_PATH = "logo.png"
 HOL_JSON = "academic_holidays.json"
 HOL_CSV = "academic_holidays.csv"
+# used by the background DbExecutor (login / register); the screens still open their own connections
+POOL = get_pool(DB)
 
 
 # ---------------- Database / Migration helpers ----------------
@@ -116,19 +122,13 @@ def init_db():
     ensure_column("users", "gender", "TEXT")
     # links.gender CHAR(1)
     ensure_column("links", "gender", "TEXT")
+    # per-user hash algorithm (passwords.py); NULL means a legacy SHA-256 hash
+    ensure_column("users", "pw_algo", "TEXT")
+    ensure_column("users", "pw_params", "TEXT")
 
 
-def hash_pw(txt: str) -> str:
-    return hashlib.sha256(txt.encode()).hexdigest()
-
-
-def user_exists(email: str) -> bool:
-    conn = sqlite3.connect(DB)
-    c = conn.cursor()
-    c.execute("SELECT id FROM users WHERE email=?", (email,))
-    r = c.fetchone()
-    conn.close()
-    return bool(r)
+# one helper process is plenty for a single user; hashing runs via the DbExecutor, never on the Tk thread
+HASHER = PasswordHasher(workers=1, max_in_flight=4)
 
 
 # ---------------- Holidays loader ----------------
@@ -554,6 +554,10 @@ class RouteLinkApp(tk.Tk):
         # holidays
         self.holidays = load_academic_holidays()
 
+        # background DB thread; results are delivered back on this (Tk) thread
+        self.db = DbExecutor(POOL)
+        self.db.attach(self)
+
     # DB helper: count how many joined links for route on date
     def get_join_count(self, iso_date: str, route_id: int) -> int:
         try:
@@ -670,6 +674,7 @@ class StartTab(ttk.Frame):
 class RegisterDialog(tk.Toplevel):
     def __init__(self, app):
         super().__init__(app)
+        self.app = app
         self.title("Register - RouteLink")
         self.geometry("520x520")
         self.resizable(True, True)
@@ -697,7 +702,8 @@ class RegisterDialog(tk.Toplevel):
         tk.Radiobutton(gframe, text="Male", variable=self.gender_var, value="M").pack(side="left", padx=4)
         tk.Radiobutton(gframe, text="Female", variable=self.gender_var, value="F").pack(side="left", padx=4)
 
-        tk.Button(frame, text="Register", bg="#2a9d8f", fg="white", width=20, command=self.do_register).grid(row=6, column=0, columnspan=2, pady=12)
+        self.submit_btn = tk.Button(frame, text="Register", bg="#2a9d8f", fg="white", width=20, command=self.do_register)
+        self.submit_btn.grid(row=6, column=0, columnspan=2, pady=12)
 
     def do_register(self):
         name = self.name.get().strip()
@@ -711,29 +717,35 @@ class RegisterDialog(tk.Toplevel):
             messagebox.showerror("Validation", "Please use a VIT email (example@vitstudent.ac.in).")
             return
 
-        try:
-            conn = sqlite3.connect(DB)
-            c = conn.cursor()
-            # users table may or may not have gender column depending on older DB; migration added it earlier
-            c.execute("INSERT INTO users (name, email, password_hash, gender) VALUES (?, ?, ?, ?)", (name, email, hash_pw(pw), gender))
-            conn.commit()
-            conn.close()
-            messagebox.showinfo("Success", "Registration completed. Now login.")
-            self.destroy()
-        except sqlite3.IntegrityError:
-            messagebox.showerror("Error", "Email already registered.")
-        except Exception as e:
-            # fallback if migration didn't run: try without gender column
+        def work(conn):
+            # gender / pw_algo / pw_params columns are added by init_db()
+            pw_hash, pw_algo, pw_params = HASHER.hash(pw)
             try:
-                conn = sqlite3.connect(DB)
-                c = conn.cursor()
-                c.execute("INSERT INTO users (name, email, password_hash) VALUES (?, ?, ?)", (name, email, hash_pw(pw)))
+                conn.execute("INSERT INTO users (name, email, password_hash, gender, pw_algo, pw_params) VALUES (?, ?, ?, ?, ?, ?)",
+                             (name, email, pw_hash, gender, pw_algo, pw_params))
                 conn.commit()
-                conn.close()
-                messagebox.showinfo("Success", "Registration completed. Now login.")
-                self.destroy()
-            except Exception:
-                messagebox.showerror("Error", "Unable to register. Please try again.")
+            except sqlite3.IntegrityError:
+                conn.rollback()
+                return False
+            return True
+
+        def done(ok):
+            self.submit_btn.config(state="normal")
+            if not ok:
+                messagebox.showerror("Error", "Email already registered.")
+                return
+            messagebox.showinfo("Success", "Registration completed. Now login.")
+            self.destroy()
+
+        def failed(exc):
+            self.submit_btn.config(state="normal")
+            if isinstance(exc, HasherBusy):
+                messagebox.showwarning("Busy", "Still working on another request. Please try again in a moment.")
+                return
+            messagebox.showerror("Error", "Unable to register. Please try again.")
+
+        self.submit_btn.config(state="disabled")
+        self.app.db.submit(work, on_done=done, on_error=failed)
 
 
 class LoginDialog(tk.Toplevel):
@@ -756,7 +768,8 @@ class LoginDialog(tk.Toplevel):
         tk.Label(frame, text="Password").grid(row=2, column=0, sticky="w", pady=6)
         self.pw = tk.Entry(frame, width=36, show="*"); self.pw.grid(row=2, column=1, pady=6)
 
-        tk.Button(frame, text="Login", bg="#e76f51", fg="white", width=20, command=self.do_login).grid(row=3, column=0, columnspan=2, pady=12)
+        self.submit_btn = tk.Button(frame, text="Login", bg="#e76f51", fg="white", width=20, command=self.do_login)
+        self.submit_btn.grid(row=3, column=0, columnspan=2, pady=12)
 
     def do_login(self):
         email = self.email.get().strip().lower()
@@ -764,20 +777,39 @@ class LoginDialog(tk.Toplevel):
         if not email or not pw:
             messagebox.showerror("Validation", "Enter email and password.")
             return
-        if not user_exists(email):
-            messagebox.showerror("No account", "No account found with this email. Please register first.")
-            return
-        conn = sqlite3.connect(DB)
-        c = conn.cursor()
-        c.execute("SELECT id, name FROM users WHERE email=? AND password_hash=?", (email, hash_pw(pw)))
-        r = c.fetchone()
-        conn.close()
-        if r:
-            messagebox.showinfo("Welcome", f"Hello, {r[1]}! Entering the app.")
-            self.destroy()
-            self.app.show_calendar_tab()
-        else:
-            messagebox.showerror("Error", "Invalid credentials. If you don't have an account, please register.")
+
+        def work(conn):
+            # -> (account exists, name if the password matched)
+            r = conn.execute("SELECT id, name, password_hash, pw_algo, pw_params FROM users WHERE email=?", (email,)).fetchone()
+            if r is None:
+                return False, None
+            if not HASHER.verify(pw, r[2], r[3], r[4]):
+                return True, None
+            # legacy SHA-256 hash: store a scrypt one now that we know the password
+            upgrade_stored_hash(conn, HASHER, r[0], pw, r[2], r[3], r[4])
+            return True, r[1]
+
+        def done(result):
+            self.submit_btn.config(state="normal")
+            exists, name = result
+            if not exists:
+                messagebox.showerror("No account", "No account found with this email. Please register first.")
+            elif name:
+                messagebox.showinfo("Welcome", f"Hello, {name}! Entering the app.")
+                self.destroy()
+                self.app.show_calendar_tab()
+            else:
+                messagebox.showerror("Error", "Invalid credentials. If you don't have an account, please register.")
+
+        def failed(exc):
+            self.submit_btn.config(state="normal")
+            if isinstance(exc, HasherBusy):
+                messagebox.showwarning("Busy", "Still working on another request. Please try again in a moment.")
+                return
+            messagebox.showerror("Error", f"Could not log in: {exc}")
+
+        self.submit_btn.config(state="disabled")
+        self.app.db.submit(work, on_done=done, on_error=failed)
 
 
 # ---------------- Calendar Tab ----------------
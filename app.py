@@ -1,7 +1,16 @@
 # app.py
-import os, re, sqlite3, hashlib, json, random, calendar
-from datetime import date, datetime
-from flask import Flask, request, jsonify, render_template, g, session, redirect, url_for
+import io, os, re, sqlite3, hashlib, json, random, calendar, time, threading
+from collections import OrderedDict
+from datetime import date, datetime, timezone
+from flask import Flask, request, jsonify, render_template, g, session, redirect, url_for, make_response, Response
+from migrations import migrate
+from dbpool import get_pool
+from holiday_store import HolidayStore
+from slotseq import SlotSequence, slot_label
+from pubsub import Hub
+from passwords import PasswordHasher, HasherBusy, hasher_busy, upgrade_stored_hash
+import bulk_io
+from metrics import REGISTRY, SQL_COUNT_BUCKETS, TimedConnection, begin_request, end_request
 
 DB = "routelink.db"
 HOL_JSON = "academic_holidays.json"
@@ -10,124 +19,244 @@ HOL_CSV = "academic_holidays.csv"
 app = Flask(__name__, template_folder="templates", static_folder="static")
 app.secret_key = "dev-secret-change-me"  # change in production
 app.config['JSON_SORT_KEYS'] = False
+POOL = get_pool(DB, factory=TimedConnection)   # statements counted/timed for /metrics
 
 # ---------------- DB helpers ----------------
-def ensure_column(table: str, column: str, col_type: str, default: str = None):
-    try:
-        conn = sqlite3.connect(DB)
-        c = conn.cursor()
-        c.execute(f"PRAGMA table_info({table})")
-        cols = [r[1] for r in c.fetchall()]
-        if column not in cols:
-            sql = f"ALTER TABLE {table} ADD COLUMN {column} {col_type}"
-            if default is not None:
-                sql += f" DEFAULT {default}"
-            c.execute(sql)
-            conn.commit()
-        conn.close()
-    except Exception:
-        try: conn.close()
-        except Exception: pass
-
 def init_db():
-    conn = sqlite3.connect(DB)
-    c = conn.cursor()
-    c.execute("""CREATE TABLE IF NOT EXISTS users (
-                    id INTEGER PRIMARY KEY AUTOINCREMENT, name TEXT, email TEXT UNIQUE, password_hash TEXT
-                 )""")
-    c.execute("""CREATE TABLE IF NOT EXISTS routes (
-                    id INTEGER PRIMARY KEY AUTOINCREMENT, slot_no TEXT, end_point TEXT,
-                    major_stops TEXT, time TEXT, transport_type TEXT, no_of_people INTEGER DEFAULT 0
-                 )""")
-    c.execute("""CREATE TABLE IF NOT EXISTS links (
-                    id INTEGER PRIMARY KEY AUTOINCREMENT, name TEXT, drop_point TEXT, phone TEXT,
-                    course_year TEXT, branch TEXT
-                 )""")
-    c.execute("""CREATE TABLE IF NOT EXISTS calendar (
-                    id INTEGER PRIMARY KEY AUTOINCREMENT, travel_date TEXT, route_id INTEGER, link_id INTEGER,
-                    FOREIGN KEY(route_id) REFERENCES routes(id), FOREIGN KEY(link_id) REFERENCES links(id)
-                 )""")
-    conn.commit()
-    # WAL for better concurrency
-    try:
-        c.execute("PRAGMA journal_mode=WAL;")
-        c.execute("PRAGMA synchronous=NORMAL;")
+    with POOL.connection() as conn:
+        c = conn.cursor()
+        c.execute("""CREATE TABLE IF NOT EXISTS users (
+                        id INTEGER PRIMARY KEY AUTOINCREMENT, name TEXT, email TEXT UNIQUE, password_hash TEXT
+                     )""")
+        c.execute("""CREATE TABLE IF NOT EXISTS routes (
+                        id INTEGER PRIMARY KEY AUTOINCREMENT, slot_no TEXT, end_point TEXT,
+                        major_stops TEXT, time TEXT, transport_type TEXT, no_of_people INTEGER DEFAULT 0
+                     )""")
+        c.execute("""CREATE TABLE IF NOT EXISTS links (
+                        id INTEGER PRIMARY KEY AUTOINCREMENT, name TEXT, drop_point TEXT, phone TEXT,
+                        course_year TEXT, branch TEXT
+                     )""")
+        c.execute("""CREATE TABLE IF NOT EXISTS calendar (
+                        id INTEGER PRIMARY KEY AUTOINCREMENT, travel_date TEXT, route_id INTEGER, link_id INTEGER,
+                        FOREIGN KEY(route_id) REFERENCES routes(id), FOREIGN KEY(link_id) REFERENCES links(id)
+                     )""")
         conn.commit()
-    except Exception:
-        pass
-    conn.close()
-    ensure_column("users", "gender", "TEXT")
-    ensure_column("links", "gender", "TEXT")
+        # WAL etc. are set per connection by the pool (dbpool.PRAGMAS)
+        migrate(conn)
 
 def get_db():
+    # borrowed from the pool for the lifetime of the request, handed back in close_db
     if 'db' not in g:
-        g.db = sqlite3.connect(DB, timeout=30, check_same_thread=False)
-        g.db.row_factory = sqlite3.Row
+        g.db = POOL.acquire()
     return g.db
 
 @app.teardown_appcontext
 def close_db(exc=None):
     db = g.pop('db', None)
     if db:
-        try: db.close()
-        except Exception: pass
+        POOL.release(db)
 
-def hash_pw(txt: str) -> str:
-    return hashlib.sha256(txt.encode()).hexdigest()
+# scrypt in a small process pool, at most ROUTELINK_HASH_INFLIGHT hashes queued (passwords.py)
+HASHER = PasswordHasher(workers=int(os.environ.get("ROUTELINK_HASH_WORKERS", 0)) or None,
+                        max_in_flight=int(os.environ.get("ROUTELINK_HASH_INFLIGHT", 0)) or None)
 
-def to_base36(n: int) -> str:
-    digits = "0123456789ABCDEFGHIJKLMNOPQRSTUVWXYZ"
-    if n == 0: return "0"
-    out=[]
-    while n:
-        n, rem = divmod(n, 36)
-        out.append(digits[rem])
-    return "".join(reversed(out))
+# each process reserves 32 numbers at a time from the sequences table (slotseq.py)
+SLOTS = SlotSequence(POOL, "slot_no", block=32)
 
 def generate_next_slot_no():
-    try:
-        conn = sqlite3.connect(DB)
-        c = conn.cursor()
-        c.execute("SELECT MAX(id) FROM routes")
-        r = c.fetchone()
-        conn.close()
-        max_id = int(r[0]) if (r and r[0]) else 0
-        seq = max_id + 1
-    except Exception:
-        seq = 1
-    b36 = to_base36(seq).rjust(4, "0")
-    return f"SL{b36}"
+    return slot_label(SLOTS.next())
 
 # ---------------- Holidays loader ----------------
 def load_academic_holidays():
-    if os.path.exists(HOL_JSON):
-        try:
-            with open(HOL_JSON, "r", encoding="utf-8") as f:
-                data = json.load(f)
-            holidays=[]
-            if isinstance(data, list):
-                for item in data:
-                    if isinstance(item, str): holidays.append(item)
-                    elif isinstance(item, dict) and "date" in item: holidays.append(item["date"])
-            return sorted(set(holidays))
-        except Exception:
-            pass
-    # fallback sample
-    return generate_sample_holidays(date.today().year)
+    # parsed once, re-read only when the file's mtime changes (holiday_store.py)
+    return list(HOLIDAYS.all())
 
 def generate_sample_holidays(year: int, seed: int = 123):
-    random.seed(seed + year)
+    rnd = random.Random(seed + year)  # own generator: don't reseed the global one
     fixed = [(year,1,26),(year,5,1),(year,8,15),(year,10,2),(year,12,25)]
     holidays=set()
     for y,m,d in fixed:
         try: holidays.add(date(y,m,d).isoformat())
         except Exception: pass
     while len(holidays) < 8:
-        m=random.randint(1,12)
-        d=random.randint(1,calendar.monthrange(year,m)[1])
+        m=rnd.randint(1,12)
+        d=rnd.randint(1,calendar.monthrange(year,m)[1])
         holidays.add(date(year,m,d).isoformat())
     return sorted(holidays)
 
+HOLIDAYS = HolidayStore(HOL_JSON, HOL_CSV, fallback=generate_sample_holidays)
+
+# ---------------- Read cache ----------------
+class TTLCache:
+    """Bounded LRU with per-entry TTL. Keys are tuples: (endpoint, date, route_id)."""
+    def __init__(self, maxsize=2048, ttl=60.0):
+        self.maxsize = maxsize; self.ttl = ttl
+        self._data = OrderedDict(); self._lock = threading.Lock()
+        self._gen = 0  # bumped by every invalidation
+
+    def get(self, key):
+        with self._lock:
+            hit = self._data.get(key)
+            if hit is None: return None
+            expires, value = hit
+            if expires < time.monotonic():
+                del self._data[key]; return None
+            self._data.move_to_end(key)
+            return value
+
+    def generation(self):
+        return self._gen
+
+    def set(self, key, value, gen=None):
+        # gen: generation() taken before the value was computed; if anything was invalidated
+        # meanwhile the value may predate that write, so don't store it
+        with self._lock:
+            if gen is not None and gen != self._gen: return
+            self._data[key] = (time.monotonic() + self.ttl, value)
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+
+    def delete(self, *keys):
+        with self._lock:
+            self._gen += 1
+            for k in keys: self._data.pop(k, None)
+
+    def clear(self):
+        with self._lock:
+            self._gen += 1
+            self._data.clear()
+
+# Per-process: writes from this process invalidate precisely; writes from other processes
+# (desktop client, other workers) are picked up when the TTL runs out.
+CACHE = TTLCache(maxsize=int(os.environ.get("ROUTELINK_CACHE_SIZE", 2048)),
+                 ttl=float(os.environ.get("ROUTELINK_CACHE_TTL", 60)))
+
+def cached(key, compute, version=None):
+    """
+    Read-through helper. `version` (e.g. a data_versions counter) is stored with the value;
+    a hit recorded under another version is recomputed, which also catches writes made by
+    other processes.
+    """
+    hit = CACHE.get(key)
+    if hit is not None and hit[0] == version:
+        return hit[1]
+    gen = CACHE.generation()
+    val = compute()
+    CACHE.set(key, (version, val), gen)
+    return val
+
+def invalidate_route_date(iso, rid=None):
+    """Drop everything derived from the calendar rows of (iso, rid)."""
+    keys = [("calendar", iso, None), ("calendar_month", (iso or "")[:7], None)]
+    if rid is not None:
+        keys += [("route_count", iso, str(rid)), ("route_links", iso, str(rid))]
+    CACHE.delete(*keys)
+
+def route_dates_for(c, link_id=None, route_id=None):
+    """(travel_date, route_id) pairs a link or route is attached to; read before modifying it."""
+    if link_id is not None:
+        c.execute("SELECT DISTINCT travel_date, route_id FROM calendar WHERE link_id=?", (link_id,))
+    else:
+        c.execute("SELECT DISTINCT travel_date, route_id FROM calendar WHERE route_id=?", (route_id,))
+    return [(r["travel_date"], r["route_id"]) for r in c.fetchall()]
+
+# ---------------- Live updates ----------------
+HUB = Hub()
+SSE_HEARTBEAT = 15  # seconds between keep-alive comments / data_versions re-checks
+# Under gunicorn gthread every open /events stream holds a worker thread. At most SSE_MAX_STREAMS
+# streams per process (default: half of ROUTELINK_THREADS), each closed after SSE_MAX_AGE seconds
+# so waiting tabs get their turn; the browser reconnects on its own. The ASGI mode has no such limit.
+SSE_MAX_STREAMS = int(os.environ.get("ROUTELINK_SSE_STREAMS", 0)) or max(1, int(os.environ.get("ROUTELINK_THREADS", 8)) // 2)
+SSE_MAX_AGE = 300
+SSE_BUSY_RETRY_MS = 30000
+
+def join_count(c, iso, rid):
+    c.execute("SELECT COUNT(*) FROM calendar WHERE travel_date=? AND route_id=? AND link_id IS NOT NULL", (iso, rid))
+    r = c.fetchone()
+    return int(r[0]) if r else 0
+
+def publish_count(c, iso, rid, delta):
+    """Push the new join count for (iso, rid) to /events subscribers of that date."""
+    if not HUB.subscriber_count("date:" + iso): return
+    HUB.publish("date:" + iso, {"type": "count", "date": iso, "route_id": rid,
+                                "count": join_count(c, iso, rid), "delta": delta})
+
+
+def data_version(key):
+    """(counter, unix ts) from data_versions; maintained by triggers (migrations.py, v3)."""
+    r = get_db().execute("SELECT n, ts FROM data_versions WHERE key=?", (key,)).fetchone()
+    return (int(r["n"]), r["ts"]) if r else (0, None)
+
+def conditional(etag, last_modified, build):
+    """
+    Answer If-None-Match / If-Modified-Since with a bodyless 304, otherwise call build()
+    and tag the 200 response. build() is not called at all for a 304.
+    """
+    if isinstance(last_modified, (int, float)):
+        last_modified = datetime.fromtimestamp(int(last_modified), timezone.utc)
+    fresh = False
+    if request.if_none_match:
+        fresh = request.if_none_match.contains(etag)
+    elif last_modified and request.if_modified_since:
+        fresh = last_modified <= request.if_modified_since
+    resp = app.response_class(status=304) if fresh else make_response(build())
+    if resp.status_code in (200, 304):
+        resp.set_etag(etag)
+        if last_modified: resp.last_modified = last_modified
+        resp.headers["Cache-Control"] = "no-cache"  # store, but revalidate every time
+    return resp
+
+def query_tag():
+    return hashlib.md5(request.query_string).hexdigest()[:8] if request.query_string else "all"
+
+# ---------------- Metrics ----------------
+# Per process (metrics.py). Endpoint labels are the URL rules ("/calendar/<iso_date>"), never raw paths.
+REQUEST_SECONDS = REGISTRY.histogram("routelink_http_request_seconds",
+                                     "Time to response headers (streamed bodies not included)", ("method", "endpoint"))
+REQUESTS = REGISTRY.counter("routelink_http_requests_total", "Requests by status", ("method", "endpoint", "status"))
+REQUEST_SQL_STATEMENTS = REGISTRY.histogram("routelink_http_request_sql_statements", "SQL statements per request",
+                                            ("endpoint",), buckets=SQL_COUNT_BUCKETS)
+REQUEST_SQL_SECONDS = REGISTRY.histogram("routelink_http_request_sql_seconds", "SQL time per request", ("endpoint",))
+HANDLED = REGISTRY.counter("routelink_handled_exceptions_total",
+                           "Exceptions a handler turned into a fallback response", ("endpoint", "exception"))
+REGISTRY.gauge("routelink_pool_idle_connections", "Idle pooled SQLite connections", lambda: len(POOL._idle))
+REGISTRY.gauge("routelink_cache_entries", "Entries in the read cache", lambda: len(CACHE._data))
+REGISTRY.gauge("routelink_sse_subscribers", "Open /events subscriptions", lambda: HUB.subscriber_count())
+REGISTRY.gauge("routelink_password_hashes_in_flight", "Password hashes queued or running", lambda: HASHER.in_flight())
+
+def endpoint_label():
+    return request.url_rule.rule if request.url_rule is not None else "<unmatched>"
+
+def handled(exc):
+    """A handler is about to answer `exc` with a fallback response: count it and log the traceback."""
+    HANDLED.inc(endpoint_label(), type(exc).__name__)
+    app.logger.warning("%s %s: %r", request.method, request.path, exc, exc_info=exc)
+
+@app.before_request
+def metrics_start():
+    g.metrics_t0 = time.perf_counter()
+    begin_request()
+
+@app.after_request
+def metrics_status(resp):
+    g.metrics_status = resp.status_code
+    return resp
+
+@app.teardown_request
+def metrics_record(exc=None):
+    t0 = g.pop("metrics_t0", None)
+    if t0 is None:
+        return
+    elapsed = time.perf_counter() - t0
+    status = g.pop("metrics_status", 500)   # no after_request: the handler raised
+    endpoint = endpoint_label()
+    statements, sql_seconds = end_request()
+    REQUEST_SECONDS.observe(elapsed, request.method, endpoint)
+    REQUESTS.inc(request.method, endpoint, str(status))
+    REQUEST_SQL_STATEMENTS.observe(statements, endpoint)
+    REQUEST_SQL_SECONDS.observe(sql_seconds, endpoint)
+
 # ---------------- Auth helper ----------------
 def login_required(f):
     from functools import wraps
@@ -138,11 +267,32 @@ def login_required(f):
         return f(*args, **kwargs)
     return wrapped
 
+# bulk writes (POST /import) are for the accounts listed here: comma-separated emails
+ADMINS = {e.strip().lower() for e in os.environ.get("ROUTELINK_ADMINS", "").split(",") if e.strip()}
+
+def admin_required(f):
+    from functools import wraps
+    @wraps(f)
+    def wrapped(*args, **kwargs):
+        uid = session.get("user_id")
+        if uid is None:
+            return jsonify({"error":"Login required"}), 401
+        r = get_db().execute("SELECT email FROM users WHERE id=?", (uid,)).fetchone()
+        if r is None or (r["email"] or "").lower() not in ADMINS:
+            return jsonify({"error":"Admin only"}), 403
+        return f(*args, **kwargs)
+    return wrapped
+
 # ---------------- HTTP API ----------------
 @app.route("/")
 def index():
     return render_template("index.html")
 
+@app.route("/metrics")
+def api_metrics():
+    """Prometheus text exposition of this process's counters and histograms."""
+    return Response(REGISTRY.render(), mimetype="text/plain; version=0.0.4")
+
 @app.route("/me")
 def api_me():
     if session.get("user_id"):
@@ -151,7 +301,15 @@ def api_me():
 
 @app.route("/holidays")
 def api_holidays():
-    return jsonify(load_academic_holidays())
+    # optional ?from=YYYY-MM-DD&to=YYYY-MM-DD range (binary search on the sorted store)
+    start = request.args.get("from"); end = request.args.get("to")
+    def build():
+        if start or end:
+            return jsonify(HOLIDAYS.between(start or "0000-01-01", end or "9999-12-31"))
+        return jsonify(load_academic_holidays())
+    src = HOLIDAYS.json_path if os.path.exists(HOLIDAYS.json_path) else HOLIDAYS.csv_path
+    mtime = os.path.getmtime(src) if src and os.path.exists(src) else None
+    return conditional(f"hol-{HOLIDAYS.version()}-{query_tag()}", mtime, build)
 
 @app.route("/next_slot")
 def api_next_slot():
@@ -159,31 +317,123 @@ def api_next_slot():
 
 @app.route("/calendar/<iso_date>")
 def api_calendar_for_date(iso_date):
-    try:
+    def load():
         conn = get_db(); c = conn.cursor()
+        # join counts come back with the routes so the client needs no /route_count fan-out
         c.execute("""
-            SELECT DISTINCT r.id, r.slot_no, r.end_point, r.major_stops, r.time, r.transport_type
-            FROM calendar cal LEFT JOIN routes r ON cal.route_id = r.id
-            WHERE cal.travel_date = ? ORDER BY r.id DESC
+            SELECT r.id, r.slot_no, r.end_point, r.major_stops, r.time, r.transport_type,
+                   COUNT(cal.link_id) AS count
+            FROM calendar cal JOIN routes r ON cal.route_id = r.id
+            WHERE cal.travel_date = ?
+            GROUP BY r.id ORDER BY r.id DESC
         """, (iso_date,))
-        rows = c.fetchall()
-        out=[]
-        for r in rows:
-            out.append({k: r[k] for k in r.keys()})
-        return jsonify(out)
-    except Exception:
+        return [{k: r[k] for k in r.keys()} for r in c.fetchall()]
+    try:
+        ver, ts = data_version("date:" + iso_date)
+        return conditional(f"cal-{iso_date}-{ver}", ts,
+                           lambda: jsonify(cached(("calendar", iso_date, None), load, ver)))
+    except Exception as e:
+        handled(e)
         return jsonify([]), 500
 
+@app.route("/calendar/month/<ym>")
+def api_calendar_for_month(ym):
+    # one aggregated query for the whole month grid: routes + join counts per day
+    try:
+        first = datetime.strptime(ym, "%Y-%m").date()
+    except Exception:
+        return jsonify({"error":"Invalid month"}), 400
+    ndays = calendar.monthrange(first.year, first.month)[1]
+    last = first.replace(day=ndays)
+    ym = first.strftime("%Y-%m")
+    def load():
+        hols = set(HOLIDAYS.between(first, last))
+        days = {}
+        for i in range(1, ndays+1):
+            iso = first.replace(day=i).isoformat()
+            days[iso] = {"holiday": iso in hols, "joined": 0, "routes": []}
+        conn = get_db(); c = conn.cursor()
+        c.execute("""
+            SELECT cal.travel_date, r.id, r.slot_no, r.end_point, r.time, r.transport_type,
+                   COUNT(cal.link_id) AS joined
+            FROM calendar cal JOIN routes r ON cal.route_id = r.id
+            WHERE cal.travel_date BETWEEN ? AND ?
+            GROUP BY cal.travel_date, r.id
+            ORDER BY cal.travel_date, r.id DESC
+        """, (first.isoformat(), last.isoformat()))
+        for r in c.fetchall():
+            day = days.get(r["travel_date"])
+            if day is None: continue
+            day["routes"].append({k: r[k] for k in r.keys() if k != "travel_date"})
+            day["joined"] += r["joined"]
+        return {"month": ym, "days": days}
+    try:
+        ver, ts = data_version("month:" + ym)
+        tag = f"{ver}-{HOLIDAYS.version()}"
+        return conditional(f"month-{ym}-{tag}", ts,
+                           lambda: jsonify(cached(("calendar_month", ym, None), load, tag)))
+    except Exception as e:
+        handled(e)
+        return jsonify({"month": ym, "days": {}}), 500
+
+@app.route("/events")
+def api_events():
+    """
+    Server-Sent Events for one travel date: GET /events?date=YYYY-MM-DD
+    data: {"type":"count","date":..,"route_id":..,"count":..,"delta":..}
+    data: {"type":"route_deleted",..} / {"type":"refresh",..}
+    "refresh" means the date changed through another process; reload /calendar/<date>.
+    """
+    iso = request.args.get("date") or ""
+    try: datetime.strptime(iso, "%Y-%m-%d")
+    except Exception: return jsonify({"error":"Invalid date"}), 400
+    def version():
+        # short-lived pooled connection: an idle stream must not pin one
+        with POOL.connection() as conn:
+            r = conn.execute("SELECT n FROM data_versions WHERE key=?", ("date:" + iso,)).fetchone()
+        return int(r[0]) if r else 0
+    if HUB.subscriber_count() >= SSE_MAX_STREAMS:
+        # no thread to spare: an empty stream with a long retry; the page still works, just not live
+        return Response(f"retry: {SSE_BUSY_RETRY_MS}\n: busy\n\n", mimetype="text/event-stream",
+                        headers={"Cache-Control": "no-cache"})
+    def stream():
+        with HUB.subscribe("date:" + iso) as sub:
+            seen = version()
+            yield f"retry: 5000\n: subscribed {iso}\n\n"
+            ends = time.monotonic() + SSE_MAX_AGE
+            while time.monotonic() < ends:
+                ev = sub.get(timeout=SSE_HEARTBEAT)
+                if ev is not None:
+                    seen = version()
+                    yield f"data: {json.dumps(ev)}\n\n"
+                    continue
+                now = version()
+                if now != seen:
+                    seen = now
+                    yield f"data: {json.dumps({'type': 'refresh', 'date': iso})}\n\n"
+                else:
+                    yield ": ping\n\n"
+    resp = Response(stream(), mimetype="text/event-stream")
+    resp.headers["Cache-Control"] = "no-cache"
+    resp.headers["X-Accel-Buffering"] = "no"
+    return resp
+
 @app.route("/route_count")
 def api_route_count():
     iso = request.args.get("date"); rid = request.args.get("route_id")
     if not iso or not rid: return jsonify({"count":0})
-    try:
+    def load():
         conn = get_db(); c = conn.cursor()
         c.execute("SELECT COUNT(*) FROM calendar WHERE travel_date=? AND route_id=? AND link_id IS NOT NULL", (iso,rid))
         r = c.fetchone()
-        return jsonify({"count": int(r[0]) if r else 0})
-    except Exception:
+        return {"count": int(r[0]) if r else 0}
+    try:
+        # versioned like the calendar views: joins made by other processes show up at once
+        ver, ts = data_version("date:" + iso)
+        return conditional(f"rc-{iso}-{rid}-{ver}", ts,
+                           lambda: jsonify(cached(("route_count", iso, rid), load, ver)))
+    except Exception as e:
+        handled(e)
         return jsonify({"count":0})
 
 @app.route("/routes", methods=["POST"])
@@ -192,8 +442,17 @@ def api_create_route():
     data = request.get_json(force=True)
     d = data.get("date"); slot = data.get("slot_no"); endp = data.get("end_point")
     stops = data.get("major_stops"); ttime = data.get("time"); ttype = data.get("transport_type")
-    if not all([d, slot, endp]):
+    seat_cap = data.get("seat_cap")   # optional; None = unlimited
+    if not all([d, endp]):
         return "Missing required fields", 400
+    if seat_cap not in (None, ""):
+        try:
+            seat_cap = int(seat_cap)
+            if seat_cap < 1: raise ValueError
+        except (TypeError, ValueError):
+            return "Invalid seat_cap", 400
+    else:
+        seat_cap = None
     try:
         sel = datetime.strptime(d, "%Y-%m-%d").date()
     except Exception:
@@ -203,27 +462,26 @@ def api_create_route():
     if ttime:
         try: datetime.strptime(ttime, "%H:%M")
         except Exception: return "Invalid time", 400
-    # duplicate check for same date
-    try:
-        conn = get_db(); c = conn.cursor()
-        c.execute("""
-            SELECT r.id FROM routes r JOIN calendar cal ON cal.route_id = r.id
-            WHERE cal.travel_date = ? AND LOWER(r.end_point)=LOWER(?) AND COALESCE(r.time,'')=? AND LOWER(COALESCE(r.transport_type,''))=LOWER(?)
-            LIMIT 1
-        """, (d, endp, ttime or "", ttype or ""))
-        if c.fetchone(): return "Duplicate route", 409
-    except Exception:
-        pass
+    # duplicate check is the uq_routes_day_key index (migrations.py v6): both inserts and the check
+    # are one write transaction, so two identical submissions cannot both get through
+    conn = get_db(); c = conn.cursor()
     try:
-        conn = get_db(); c = conn.cursor()
-        c.execute("INSERT INTO routes (slot_no, end_point, major_stops, time, transport_type, no_of_people) VALUES (?, ?, ?, ?, ?, ?)",
-                  (slot, endp, stops, ttime, ttype, 0))
+        slot = slot or generate_next_slot_no()   # no slot from the form: allocate one here
+        conn.execute("BEGIN IMMEDIATE")
+        c.execute("""INSERT INTO routes (slot_no, end_point, major_stops, time, transport_type, no_of_people, key_date, seat_cap)
+                     VALUES (?, ?, ?, ?, ?, ?, ?, ?)""", (slot, endp, stops, ttime, ttype, 0, d, seat_cap))
         rid = c.lastrowid
         c.execute("INSERT INTO calendar (travel_date, route_id, link_id) VALUES (?, ?, NULL)", (d, rid))
         conn.commit()
-        return jsonify({"route_id": rid}), 201
+    except sqlite3.IntegrityError:
+        conn.rollback()
+        return "Duplicate route", 409
     except Exception as e:
+        handled(e)
+        conn.rollback()
         return str(e), 500
+    invalidate_route_date(d, rid)
+    return jsonify({"route_id": rid}), 201
 
 @app.route("/routes/<int:rid>/links", methods=["GET"])
 @login_required
@@ -231,7 +489,7 @@ def api_routes_links(rid):
     # expects query param date=YYYY-MM-DD
     iso = request.args.get("date")
     if not iso: return jsonify([])
-    try:
+    def load():
         conn = get_db(); c = conn.cursor()
         c.execute("""
             SELECT l.id, l.name, l.gender, l.drop_point, l.phone, l.course_year, l.branch
@@ -239,10 +497,16 @@ def api_routes_links(rid):
             WHERE cal.route_id = ? AND cal.travel_date = ?
             ORDER BY l.id DESC
         """, (rid, iso))
-        rows = c.fetchall()
-        out=[{k:r[k] for k in r.keys()} for r in rows]
-        return jsonify(out)
-    except Exception:
+        return [{k:r[k] for k in r.keys()} for r in c.fetchall()]
+    try:
+        # the date counter covers joins/leaves, the links counter edits to the people themselves
+        ver, ts = data_version("date:" + iso)
+        lver, lts = data_version("links")
+        ts = max(t for t in (ts, lts, 0) if t is not None) or None
+        return conditional(f"rl-{iso}-{rid}-{ver}-{lver}", ts,
+                           lambda: jsonify(cached(("route_links", iso, str(rid)), load, (ver, lver))))
+    except Exception as e:
+        handled(e)
         return jsonify([]), 500
 
 @app.route("/routes/<int:rid>/join", methods=["POST"])
@@ -259,42 +523,105 @@ def api_join_route(rid):
     except Exception:
         return "Invalid date", 400
     if sel < date.today(): return "Cannot join for past dates", 400
+    # One write transaction. uq_calendar_join_phone rejects a second join by the same phone and the
+    # seat triggers check/bump routes.no_of_people against seat_cap (migrations.py v7).
     conn = get_db(); c = conn.cursor()
-    c.execute("SELECT end_point FROM routes WHERE id=?", (rid,))
-    rr = c.fetchone()
-    if rr and rr["end_point"] and rr["end_point"].strip().lower() != drop.strip().lower():
-        return f"Drop must match route endpoint '{rr['end_point']}'", 400
-    # duplicate check
-    c.execute("SELECT l.id FROM links l JOIN calendar cal ON cal.link_id = l.id WHERE cal.travel_date=? AND cal.route_id=? AND l.phone=?", (d, rid, phone))
-    if c.fetchone(): return "Already joined", 409
     try:
-        try:
-            c.execute("INSERT INTO links (name, gender, drop_point, phone, course_year, branch) VALUES (?, ?, ?, ?, ?, ?)",
-                      (name, gender, drop, phone, year, branch))
-        except Exception:
-            c.execute("INSERT INTO links (name, drop_point, phone, course_year, branch) VALUES (?, ?, ?, ?, ?)",
-                      (name, drop, phone, year, branch))
+        conn.execute("BEGIN IMMEDIATE")
+        rr = c.execute("SELECT end_point, seat_cap, no_of_people FROM routes WHERE id=?", (rid,)).fetchone()
+        if rr is None:
+            conn.rollback(); return "Route not found", 404
+        if rr["end_point"] and rr["end_point"].strip().lower() != drop.strip().lower():
+            conn.rollback(); return f"Drop must match route endpoint '{rr['end_point']}'", 400
+        if rr["seat_cap"] is not None and (rr["no_of_people"] or 0) >= rr["seat_cap"]:
+            conn.rollback(); return "Route is full", 409
+        c.execute("INSERT INTO links (name, gender, drop_point, phone, course_year, branch) VALUES (?, ?, ?, ?, ?, ?)",
+                  (name, gender, drop, phone, year, branch))
         lid = c.lastrowid
         c.execute("INSERT INTO calendar (travel_date, route_id, link_id) VALUES (?, ?, ?)", (d, rid, lid))
         conn.commit()
-        return jsonify({"link_id": lid}), 201
+    except sqlite3.IntegrityError as e:
+        conn.rollback()
+        return ("Route is full", 409) if "route full" in str(e) else ("Already joined", 409)
     except Exception as e:
+        handled(e)
+        conn.rollback()
         return str(e), 500
+    invalidate_route_date(d, rid)
+    publish_count(c, d, rid, +1)
+    out = {"link_id": lid}
+    if rr["seat_cap"] is not None:
+        out["seats_left"] = max(rr["seat_cap"] - (rr["no_of_people"] or 0) - 1, 0)
+    return jsonify(out), 201
+
+# ---------------- Links listing ----------------
+LINKS_PAGE_DEFAULT = 100
+LINKS_PAGE_MAX = 500
+# query arg -> indexed column (migrations.py v4: (col COLLATE NOCASE, id) indexes)
+LINK_TEXT_FILTERS = {"branch": "branch", "course_year": "course_year", "drop": "drop_point", "drop_point": "drop_point"}
+
+def parse_iso_arg(name):
+    v = request.args.get(name)
+    if not v:
+        return None
+    try:
+        return date.fromisoformat(v).isoformat()
+    except ValueError:
+        raise ValueError(f"Invalid {name} (YYYY-MM-DD)")
 
 @app.route("/links", methods=["GET"])
 @login_required
 def api_links():
-    gender = request.args.get("gender")
+    """
+    GET /links[?gender=M|F][&branch=][&course_year=][&drop_point=][&from=YYYY-MM-DD&to=YYYY-MM-DD]
+              [&cursor=<last id>][&limit=100]
+    Newest first, one page at a time (limit <= LINKS_PAGE_MAX). Pass X-Next-Cursor back as ?cursor=
+    while X-Has-More is 1. Keyset on id, so deep pages cost the same as the first.
+    from/to keep links that joined a route travelling in that date range.
+    """
+    where, params = [], []
+    gender = (request.args.get("gender") or "").upper()[:1]
+    if gender in ("M", "F"):
+        where.append("gender_norm = ?"); params.append(gender)
+    for arg, col in LINK_TEXT_FILTERS.items():
+        v = (request.args.get(arg) or "").strip()
+        if v:
+            where.append(f"{col} = ? COLLATE NOCASE"); params.append(v)
     try:
+        d_from, d_to = parse_iso_arg("from"), parse_iso_arg("to")
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+    if d_from or d_to:
+        where.append("EXISTS (SELECT 1 FROM calendar cal WHERE cal.link_id = links.id AND cal.travel_date BETWEEN ? AND ?)")
+        params += [d_from or "0000-01-01", d_to or "9999-12-31"]
+    cursor = request.args.get("cursor", type=int)
+    if cursor is not None:
+        where.append("id < ?"); params.append(cursor)
+    limit = request.args.get("limit", LINKS_PAGE_DEFAULT, type=int) or LINKS_PAGE_DEFAULT
+    limit = max(1, min(limit, LINKS_PAGE_MAX))
+    sql = ("SELECT id, name, gender, drop_point, phone, course_year, branch FROM links"
+           + (" WHERE " + " AND ".join(where) if where else "") + " ORDER BY id DESC LIMIT ?")
+
+    def build():
         conn = get_db(); c = conn.cursor()
-        if gender and gender.upper() in ("M","F"):
-            c.execute("SELECT id, name, gender, drop_point, phone, course_year, branch FROM links WHERE UPPER(gender)=? ORDER BY id DESC", (gender.upper(),))
-        else:
-            c.execute("SELECT id, name, gender, drop_point, phone, course_year, branch FROM links ORDER BY id DESC")
+        c.execute(sql, (*params, limit + 1))
         rows = c.fetchall()
-        return jsonify([{k:r[k] for k in r.keys()} for r in rows])
-    except Exception:
-        return jsonify([])
+        page = rows[:limit]
+        resp = jsonify([{k:r[k] for k in r.keys()} for r in page])
+        resp.headers["X-Has-More"] = "1" if len(rows) > limit else "0"
+        if len(rows) > limit:
+            resp.headers["X-Next-Cursor"] = str(page[-1]["id"])
+        return resp
+    try:
+        if d_from or d_to:
+            # date filters also depend on calendar rows, which the "links" counter does not track
+            return build()
+        ver, ts = data_version("links")
+        return conditional(f"links-{ver}-{query_tag()}", ts, build)
+    except Exception as e:
+        handled(e)
+        # not an empty 200: that would read as "no links" to the client and to any cache
+        return jsonify({"error": str(e)}), 500
 
 @app.route("/links/<int:lid>", methods=["DELETE","PUT","PATCH"])
 @login_required
@@ -302,11 +629,16 @@ def api_links_modify(lid):
     if request.method == "DELETE":
         try:
             conn = get_db(); c = conn.cursor()
+            touched = route_dates_for(c, link_id=lid)
             c.execute("DELETE FROM calendar WHERE link_id=?", (lid,))
             c.execute("DELETE FROM links WHERE id=?", (lid,))
             conn.commit()
+            for iso, r_id in touched:
+                invalidate_route_date(iso, r_id)
+                publish_count(c, iso, r_id, -1)
             return jsonify({"ok": True})
         except Exception as e:
+            handled(e)
             return str(e), 500
     else:
         data = request.get_json(force=True)
@@ -321,8 +653,13 @@ def api_links_modify(lid):
             conn = get_db(); c = conn.cursor()
             c.execute(f"UPDATE links SET {set_sql} WHERE id=?", vals)
             conn.commit()
+            for iso, r_id in route_dates_for(c, link_id=lid): CACHE.delete(("route_links", iso, str(r_id)))
             return jsonify({"ok": True})
+        except sqlite3.IntegrityError:
+            conn.rollback()
+            return "That phone has already joined one of this link's routes", 409
         except Exception as e:
+            handled(e)
             return str(e), 500
 
 @app.route("/routes/<int:rid>", methods=["PUT","PATCH","DELETE"])
@@ -331,15 +668,20 @@ def api_routes_modify(rid):
     if request.method == "DELETE":
         try:
             conn = get_db(); c = conn.cursor()
+            touched = route_dates_for(c, route_id=rid)
             c.execute("DELETE FROM calendar WHERE route_id=?", (rid,))
             c.execute("DELETE FROM routes WHERE id=?", (rid,))
             conn.commit()
+            for iso, _ in touched:
+                invalidate_route_date(iso, rid)
+                HUB.publish("date:" + iso, {"type": "route_deleted", "date": iso, "route_id": rid})
             return jsonify({"ok": True})
         except Exception as e:
+            handled(e)
             return str(e), 500
     else:
         data = request.get_json(force=True)
-        allowed = ["slot_no","end_point","major_stops","time","transport_type"]
+        allowed = ["slot_no","end_point","major_stops","time","transport_type","seat_cap"]
         updates = {k: data[k] for k in allowed if k in data}
         if not updates: return "No fields", 400
         set_sql = ", ".join([f"{k}=?" for k in updates.keys()])
@@ -348,10 +690,73 @@ def api_routes_modify(rid):
             conn = get_db(); c = conn.cursor()
             c.execute(f"UPDATE routes SET {set_sql} WHERE id=?", vals)
             conn.commit()
+            for iso, _ in route_dates_for(c, route_id=rid): invalidate_route_date(iso, rid)
             return jsonify({"ok": True})
+        except sqlite3.IntegrityError:
+            conn.rollback()
+            return "Duplicate route", 409
         except Exception as e:
+            handled(e)
             return str(e), 500
 
+# ---------------- Bulk import / export ----------------
+BULK_MIMETYPES = {"csv": "text/csv", "jsonl": "application/x-ndjson"}
+
+def bulk_format(default="csv"):
+    fmt = (request.args.get("format") or default).lower()
+    if fmt not in bulk_io.FORMATS:
+        raise ValueError("format must be csv or jsonl")
+    return fmt
+
+@app.route("/import/<kind>", methods=["POST"])
+@admin_required
+def api_import(kind):
+    """
+    POST /import/routes|joins?format=csv|jsonl&dry_run=1   (ROUTELINK_ADMINS accounts only)
+    Body: multipart field "file", or the raw CSV/JSONL. Rows are checked one by one and written in
+    batches; bad rows come back as {"line", "error"} and do not stop the import.
+    """
+    if kind not in ("routes", "joins"):
+        return jsonify({"error": "kind must be routes or joins"}), 404
+    upload = request.files.get("file")
+    try:
+        fmt = bulk_format("jsonl" if upload and upload.filename.endswith((".jsonl", ".ndjson")) else "csv")
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+    dry_run = request.args.get("dry_run") in ("1", "true", "yes")
+    fp = io.TextIOWrapper(upload.stream if upload else request.stream, encoding="utf-8-sig", newline="")
+    try:
+        report = bulk_io.import_stream(get_db(), kind, fp, fmt, dry_run=dry_run, next_slot=generate_next_slot_no)
+    except UnicodeDecodeError:
+        return jsonify({"error": "File must be UTF-8"}), 400
+    except sqlite3.OperationalError as e:
+        handled(e)
+        return jsonify({"error": str(e)}), 503
+    if report["inserted"] and not dry_run:
+        CACHE.clear()  # could touch any date; versioned entries would also catch it, the rest wait for TTL
+    return jsonify(report), (200 if not report["failed"] else 207)
+
+@app.route("/export/<kind>")
+@login_required
+def api_export(kind):
+    """GET /export/routes|joins?from=YYYY-MM-DD&to=YYYY-MM-DD&format=csv|jsonl (streamed)."""
+    if kind not in ("routes", "joins"):
+        return jsonify({"error": "kind must be routes or joins"}), 404
+    try:
+        start, end = parse_iso_arg("from"), parse_iso_arg("to")
+        fmt = bulk_format()
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+    if not start or not end:
+        return jsonify({"error": "from and to are required"}), 400
+    def stream():
+        # own pooled connection: the request's g.db is returned before the body is streamed
+        with POOL.connection() as conn:
+            yield from bulk_io.export_stream(conn, kind, start, end, fmt)
+    resp = Response(stream(), mimetype=BULK_MIMETYPES[fmt])
+    resp.headers["Content-Disposition"] = f'attachment; filename="{kind}_{start}_{end}.{fmt}"'
+    return resp
+
 # Register / Login
 @app.route("/register", methods=["POST"])
 def api_register():
@@ -364,17 +769,21 @@ def api_register():
         return jsonify({"error":"Missing fields"}), 400
     if not re.match(r"^[A-Za-z0-9._%+-]+@vitstudent\.ac\.in$", email):
         return jsonify({"error":"Use a VIT email"}), 400
+    try:
+        # hashed before touching the DB: no transaction is open while the KDF runs
+        pw_hash, pw_algo, pw_params = HASHER.hash(pw)
+    except HasherBusy:
+        return hasher_busy()
     try:
         conn = get_db(); c = conn.cursor()
-        try:
-            c.execute("INSERT INTO users (name, email, password_hash, gender) VALUES (?, ?, ?, ?)", (name, email, hash_pw(pw), gender))
-        except Exception:
-            c.execute("INSERT INTO users (name, email, password_hash) VALUES (?, ?, ?)", (name, email, hash_pw(pw)))
+        c.execute("INSERT INTO users (name, email, password_hash, gender, pw_algo, pw_params) VALUES (?, ?, ?, ?, ?, ?)",
+                  (name, email, pw_hash, gender, pw_algo, pw_params))
         conn.commit()
         return jsonify({"ok": True})
     except sqlite3.IntegrityError:
         return jsonify({"error":"Email exists"}), 409
     except Exception as e:
+        handled(e)
         return jsonify({"error": str(e)}), 500
 
 @app.route("/login", methods=["POST"])
@@ -384,9 +793,14 @@ def api_login():
     pw = data.get("password") or ""
     if not email or not pw: return jsonify({"error":"Missing fields"}), 400
     conn = get_db(); c = conn.cursor()
-    c.execute("SELECT id, name FROM users WHERE email=? AND password_hash=?", (email, hash_pw(pw)))
+    c.execute("SELECT id, name, password_hash, pw_algo, pw_params FROM users WHERE email=?", (email,))
     r = c.fetchone()
-    if r:
+    try:
+        ok = r is not None and HASHER.verify(pw, r["password_hash"], r["pw_algo"], r["pw_params"])
+    except HasherBusy:
+        return hasher_busy()
+    if ok:
+        upgrade_stored_hash(conn, HASHER, r["id"], pw, r["password_hash"], r["pw_algo"], r["pw_params"])
         session["user_id"] = r["id"]
         session["user_name"] = r["name"]
         return jsonify({"ok": True, "name": r["name"]})
@@ -398,7 +812,15 @@ def api_logout():
     return jsonify({"ok": True})
 
 # ---------------- Run ----------------
+# development: python app.py
+# production:  python app.py --prod  (= gunicorn -c gunicorn.conf.py app:app; workers/threads via env, see that file)
 if __name__ == "__main__":
+    import sys
+    if "--prod" in sys.argv[1:]:
+        here = os.path.dirname(os.path.abspath(__file__))
+        os.chdir(here)
+        target = "asgi_app:app" if os.environ.get("ROUTELINK_WORKER") == "asgi" else "app:app"
+        os.execvp("gunicorn", ["gunicorn", "-c", os.path.join(here, "gunicorn.conf.py"), target])
     init_db()
     print("Starting app on http://127.0.0.1:5000")
     app.run(host="0.0.0.0", port=5000, debug=True)
@@ -0,0 +1,218 @@
+# asgi_app.py
+"""
+Async serving mode for RouteLink, for many long-lived connections.
+
+    uvicorn asgi_app:app --host 0.0.0.0 --port 5000      (or: python asgi_app.py)
+
+Under WSGI every client parked on /events or on a chat long-poll holds one
+server thread for the whole wait. Here those two endpoints are coroutines: a
+waiting client costs a pubsub subscription and a suspended task, not a thread.
+
+  GET /events?date=                      SSE counters (same stream as app.py)
+  GET /conversations/<cid>/messages      chat page / long-poll (same contract as app2)
+
+SQLite never runs on the event loop. Every query goes through db(), which
+runs it on a fixed pool of ROUTELINK_DB_THREADS threads, each using a pooled
+connection. A thousand idle waiters therefore need at most that many
+threads, and only while they actually read.
+
+Every other route (calendar, routes, links, auth, all writes) is served
+unchanged by the Flask apps behind WSGIMiddleware: /conversations/* by
+app2, the rest by app.py. Those requests are short and run on Starlette's
+threadpool. Both apps publish into the HUBs the async handlers wait on, so
+run this as ONE process; the hubs are in-process (see pubsub.py).
+Sessions are the Flask cookie sessions of app.py (app2 uses the same
+secret_key), so a login through either mode is valid in both.
+"""
+
+import asyncio
+import contextlib
+import importlib.machinery
+import importlib.util
+import json
+import os
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+
+from itsdangerous import BadSignature
+from starlette.applications import Starlette
+from starlette.middleware.wsgi import WSGIMiddleware
+from starlette.requests import Request
+from starlette.responses import JSONResponse, StreamingResponse
+from starlette.routing import Mount, Route
+
+import app as routelink
+import chatpoll
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+
+
+def _load_source(name):
+    # app2 has no .py extension
+    loader = importlib.machinery.SourceFileLoader(name, os.path.join(HERE, name))
+    module = importlib.util.module_from_spec(importlib.util.spec_from_loader(name, loader))
+    loader.exec_module(module)
+    return module
+
+chat = _load_source("app2")
+
+# ---------------- SQLite executor ----------------
+DB_THREADS = int(os.environ.get("ROUTELINK_DB_THREADS", 8))
+DB_EXECUTOR = ThreadPoolExecutor(max_workers=DB_THREADS, thread_name_prefix="sqlite")
+
+async def db(fn, *args):
+    """Run fn(conn, *args) on the SQLite threads with a pooled connection."""
+    def run():
+        with routelink.POOL.connection() as conn:
+            return fn(conn, *args)
+    return await asyncio.get_running_loop().run_in_executor(DB_EXECUTOR, run)
+
+# ---------------- Request helpers ----------------
+def session_user(request: Request):
+    """user_id from the Flask session cookie, or None."""
+    flask_app = routelink.app
+    cookie = request.cookies.get(flask_app.config["SESSION_COOKIE_NAME"])
+    if not cookie:
+        return None
+    serializer = flask_app.session_interface.get_signing_serializer(flask_app)
+    try:
+        data = serializer.loads(cookie, max_age=int(flask_app.permanent_session_lifetime.total_seconds()))
+    except BadSignature:
+        return None
+    return data.get("user_id")
+
+def int_arg(request: Request, name, default=None):
+    # request.args.get(name, type=int) semantics: unparsable -> default
+    try:
+        return int(request.query_params[name])
+    except (KeyError, ValueError):
+        return default
+
+def float_arg(request: Request, name, default=0.0):
+    try:
+        return float(request.query_params[name])
+    except (KeyError, ValueError):
+        return default
+
+# ---------------- Live updates (SSE) ----------------
+async def api_events(request: Request):
+    """Async twin of app.py /events: one SSE stream per travel date."""
+    iso = request.query_params.get("date") or ""
+    try: datetime.strptime(iso, "%Y-%m-%d")
+    except Exception: return JSONResponse({"error":"Invalid date"}, 400)
+    topic = "date:" + iso
+    def version(conn):
+        r = conn.execute("SELECT n FROM data_versions WHERE key=?", (topic,)).fetchone()
+        return int(r[0]) if r else 0
+    async def stream():
+        # cancelled by Starlette when the client goes away; the with-block then unsubscribes
+        with routelink.HUB.subscribe(topic) as sub:
+            seen = await db(version)
+            yield f"retry: 5000\n: subscribed {iso}\n\n"
+            while True:
+                ev = await sub.aget(timeout=routelink.SSE_HEARTBEAT)
+                if ev is not None:
+                    seen = await db(version)
+                    yield f"data: {json.dumps(ev)}\n\n"
+                    continue
+                now = await db(version)
+                if now != seen:
+                    seen = now
+                    yield f"data: {json.dumps({'type': 'refresh', 'date': iso})}\n\n"
+                else:
+                    yield ": ping\n\n"
+    return StreamingResponse(stream(), media_type="text/event-stream",
+                             headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"})
+
+# ---------------- Conversations (long-poll) ----------------
+async def wait_for_messages(topic, after_id, wait, fetch):
+    """
+    chatpoll.wait_for_messages as a coroutine. Its loop blocks in sub.get() and calls fetch() directly;
+    here the wait must be sub.aget() and the read a db() call, or one waiter would stall the event loop.
+    The message filtering is chatpoll's.
+    """
+    with chat.HUB.subscribe(topic) as sub:
+        msgs, has_more = await fetch()
+        if msgs or wait <= 0:
+            return msgs, has_more
+        loop = asyncio.get_running_loop()
+        deadline = loop.time() + wait
+        while True:
+            remaining = deadline - loop.time()
+            if remaining <= 0:
+                return [], False
+            ev = await sub.aget(timeout=remaining)
+            if ev is None:
+                return [], False
+            new = chatpoll.published_messages(sub, ev, after_id)
+            if new is None:
+                return await fetch()
+            if new:
+                return new, False
+
+async def api_conversation_messages(request: Request):
+    """GET /conversations/<cid>/messages: same query args and X-Has-More as app2."""
+    user_id = session_user(request)
+    if user_id is None:
+        return JSONResponse({"error":"Login required"}, 401)
+    cid = request.path_params["cid"]
+    after_id, before_id = int_arg(request, "after_id"), int_arg(request, "before_id")
+    limit = int_arg(request, "limit", chatpoll.MSG_PAGE_DEFAULT) or chatpoll.MSG_PAGE_DEFAULT
+    limit = max(1, min(limit, chatpoll.MSG_PAGE_MAX))
+    wait = max(0.0, min(float_arg(request, "wait"), chatpoll.LONGPOLL_MAX_WAIT))
+
+    def is_participant(conn):
+        return conn.execute("SELECT 1 FROM conversation_participants WHERE conversation_id=? AND user_id=?",
+                            (cid, user_id)).fetchone() is not None
+    def page(conn):
+        rows, more = chatpoll.fetch_message_page(
+            conn.cursor(), "SELECT id, conversation_id, sender_user_id, sender_name, text, ts FROM messages WHERE conversation_id=?",
+            (cid,), after_id, before_id, limit)
+        return [{k:r[k] for k in r.keys()} for r in rows], more
+    try:
+        if not await db(is_participant):
+            return JSONResponse({"error":"Not a participant"}, 403)
+        if after_id is not None and wait:
+            msgs, has_more = await wait_for_messages(f"conv:{cid}", after_id, wait, lambda: db(page))
+        else:
+            msgs, has_more = await db(page)
+    except Exception:
+        return JSONResponse([], 500)
+    return JSONResponse(msgs, headers={"X-Has-More": "1" if has_more else "0"})
+
+# ---------------- WSGI fallback ----------------
+CHAT_WSGI = WSGIMiddleware(chat.app)
+MAIN_WSGI = WSGIMiddleware(routelink.app)
+
+async def flask_apps(scope, receive, send):
+    path = scope.get("path", "")
+    target = CHAT_WSGI if path == "/conversations" or path.startswith("/conversations/") else MAIN_WSGI
+    await target(scope, receive, send)
+
+# ---------------- App ----------------
+def startup():
+    # same schema work the WSGI entry points do, once, before the first request
+    routelink.init_db()
+    chat.init_db()
+    routelink.POOL.warm(DB_THREADS)
+
+@contextlib.asynccontextmanager
+async def lifespan(_app):
+    await asyncio.get_running_loop().run_in_executor(DB_EXECUTOR, startup)
+    yield
+    DB_EXECUTOR.shutdown(wait=False)
+    routelink.HASHER.shutdown()
+
+app = Starlette(
+    routes=[
+        Route("/events", api_events, methods=["GET"]),
+        Route("/conversations/{cid:int}/messages", api_conversation_messages, methods=["GET"]),
+        Mount("/", app=flask_apps),
+    ],
+    lifespan=lifespan,
+)
+
+if __name__ == "__main__":
+    import uvicorn
+    # one process: long-poll and SSE wake-ups travel through the in-process hubs
+    uvicorn.run(app, host="0.0.0.0", port=int(os.environ.get("ROUTELINK_PORT", 5000)), workers=1)
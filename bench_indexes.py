@@ -0,0 +1,169 @@
+# bench_indexes.py
+"""
+Query latency before/after the lookup indexes from migrations.py.
+
+Builds a throw-away SQLite file with the RouteLink schema, fills it with
+--rows calendar rows (default 1,000,000), then times the hot queries of app.py
+at schema version 1 (no secondary indexes) and again after migrating to the
+latest version.
+
+    python bench_indexes.py                 # 1M calendar rows
+    python bench_indexes.py --rows 200000 --repeat 50
+"""
+
+import argparse
+import os
+import random
+import sqlite3
+import statistics
+import tempfile
+import time
+from datetime import date, timedelta
+
+from migrations import migrate, schema_version
+
+SCHEMA = [
+    """CREATE TABLE users (id INTEGER PRIMARY KEY AUTOINCREMENT, name TEXT, email TEXT UNIQUE, password_hash TEXT)""",
+    """CREATE TABLE routes (id INTEGER PRIMARY KEY AUTOINCREMENT, slot_no TEXT, end_point TEXT,
+           major_stops TEXT, time TEXT, transport_type TEXT, no_of_people INTEGER DEFAULT 0)""",
+    """CREATE TABLE links (id INTEGER PRIMARY KEY AUTOINCREMENT, name TEXT, drop_point TEXT, phone TEXT,
+           course_year TEXT, branch TEXT)""",
+    """CREATE TABLE calendar (id INTEGER PRIMARY KEY AUTOINCREMENT, travel_date TEXT, route_id INTEGER, link_id INTEGER,
+           FOREIGN KEY(route_id) REFERENCES routes(id), FOREIGN KEY(link_id) REFERENCES links(id))""",
+]
+
+END_POINTS = ["Chennai Airport", "Katpadi Jn", "Bangalore", "Chennai Central", "Tirupati", "Vellore Bus Stand",
+              "Hyderabad", "Coimbatore", "Madurai", "Pondicherry"]
+TRANSPORT = ["Cab", "Bus", "Train", "Auto"]
+
+
+def seed(path: str, rows: int, days: int = 365):
+    conn = sqlite3.connect(path)
+    conn.execute("PRAGMA journal_mode=WAL")
+    conn.execute("PRAGMA synchronous=OFF")
+    for sql in SCHEMA:
+        conn.execute(sql)
+    rnd = random.Random(42)
+    start = date(2025, 1, 1)
+    n_routes = max(1, rows // 50)
+    route_dates = []
+    conn.executemany(
+        "INSERT INTO routes (slot_no, end_point, major_stops, time, transport_type) VALUES (?, ?, ?, ?, ?)",
+        ((f"SL{i:04d}", rnd.choice(END_POINTS), "", f"{rnd.randint(5, 22):02d}:{rnd.choice(['00', '30'])}",
+          rnd.choice(TRANSPORT)) for i in range(1, n_routes + 1)))
+    for rid in range(1, n_routes + 1):
+        route_dates.append((start + timedelta(days=rnd.randrange(days))).isoformat())
+    # one placeholder row per route (as api_create_route does), the rest are joins
+    conn.executemany("INSERT INTO calendar (travel_date, route_id, link_id) VALUES (?, ?, NULL)",
+                     ((route_dates[rid - 1], rid) for rid in range(1, n_routes + 1)))
+    n_links = rows - n_routes
+    conn.executemany(
+        "INSERT INTO links (name, drop_point, phone, course_year, branch) VALUES (?, ?, ?, ?, ?)",
+        ((f"Student {i}", "", f"9{rnd.randrange(10**9):09d}", "2", "CSE") for i in range(n_links)))
+    conn.executemany("INSERT INTO calendar (travel_date, route_id, link_id) VALUES (?, ?, ?)",
+                     ((route_dates[rid - 1], rid, lid) for lid, rid in
+                      ((lid, rnd.randint(1, n_routes)) for lid in range(1, n_links + 1))))
+    conn.commit()
+    migrate(conn, target=1)
+    conn.close()
+    return n_routes, route_dates
+
+
+def queries(rnd: random.Random, n_routes: int, route_dates):
+    """(label, sql, params-factory) for the statements app.py runs per request."""
+    def a_route():
+        rid = rnd.randint(1, n_routes)
+        return rid, route_dates[rid - 1]
+
+    def p_date():
+        return (a_route()[1],)
+
+    def p_count():
+        rid, d = a_route()
+        return (d, rid)
+
+    def p_dup_join():
+        rid, d = a_route()
+        return (d, rid, f"9{rnd.randrange(10**9):09d}")
+
+    def p_dup_route():
+        return (a_route()[1], rnd.choice(END_POINTS), "10:00", "cab")
+
+    def p_month():
+        d = a_route()[1]
+        return (d[:8] + "01", d[:8] + "31")
+
+    def p_delete_link():
+        return (rnd.randint(1, 10**6),)
+
+    return [
+        ("routes for date", """SELECT r.id, r.slot_no, r.end_point, r.major_stops, r.time, r.transport_type,
+                                      COUNT(cal.link_id) AS count
+                               FROM calendar cal JOIN routes r ON cal.route_id = r.id
+                               WHERE cal.travel_date = ? GROUP BY r.id ORDER BY r.id DESC""", p_date),
+        ("route_count", "SELECT COUNT(*) FROM calendar WHERE travel_date=? AND route_id=? AND link_id IS NOT NULL",
+         p_count),
+        ("duplicate join", """SELECT l.id FROM links l JOIN calendar cal ON cal.link_id = l.id
+                              WHERE cal.travel_date=? AND cal.route_id=? AND l.phone=?""", p_dup_join),
+        ("duplicate route", """SELECT r.id FROM routes r JOIN calendar cal ON cal.route_id = r.id
+                               WHERE cal.travel_date = ? AND LOWER(r.end_point)=LOWER(?) AND COALESCE(r.time,'')=?
+                                 AND LOWER(COALESCE(r.transport_type,''))=LOWER(?) LIMIT 1""", p_dup_route),
+        ("month aggregate", """SELECT cal.travel_date, r.id, COUNT(cal.link_id) AS joined
+                               FROM calendar cal JOIN routes r ON cal.route_id = r.id
+                               WHERE cal.travel_date BETWEEN ? AND ?
+                               GROUP BY cal.travel_date, r.id""", p_month),
+        ("calendar by link_id", "SELECT id FROM calendar WHERE link_id=?", p_delete_link),
+    ]
+
+
+def time_all(path: str, n_routes: int, route_dates, repeat: int):
+    conn = sqlite3.connect(path)
+    rnd = random.Random(7)
+    out = {}
+    for label, sql, params in queries(rnd, n_routes, route_dates):
+        samples = []
+        for _ in range(repeat):
+            p = params()
+            t0 = time.perf_counter()
+            conn.execute(sql, p).fetchall()
+            samples.append((time.perf_counter() - t0) * 1000.0)
+        out[label] = statistics.median(samples)
+    version = schema_version(conn)
+    conn.close()
+    return version, out
+
+
+def main():
+    ap = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    ap.add_argument("--rows", type=int, default=1_000_000, help="calendar rows to generate")
+    ap.add_argument("--repeat", type=int, default=20, help="timed executions per query")
+    ap.add_argument("--db", help="keep the generated database at this path")
+    args = ap.parse_args()
+
+    tmpdir = None
+    path = args.db
+    if not path:
+        tmpdir = tempfile.TemporaryDirectory()
+        path = os.path.join(tmpdir.name, "bench.db")
+    t0 = time.perf_counter()
+    n_routes, route_dates = seed(path, args.rows)
+    print(f"seeded {args.rows:,} calendar rows / {n_routes:,} routes in {time.perf_counter() - t0:.1f}s")
+
+    v_before, before = time_all(path, n_routes, route_dates, args.repeat)
+    conn = sqlite3.connect(path)
+    t0 = time.perf_counter()
+    migrate(conn)
+    conn.close()
+    print(f"migrated to latest schema in {time.perf_counter() - t0:.1f}s")
+    v_after, after = time_all(path, n_routes, route_dates, args.repeat)
+
+    print(f"\n{'query':<22}{'v' + str(v_before) + ' ms':>12}{'v' + str(v_after) + ' ms':>12}{'speedup':>10}")
+    for label in before:
+        b, a = before[label], after[label]
+        print(f"{label:<22}{b:>12.3f}{a:>12.3f}{(b / a if a else float('inf')):>9.0f}x")
+    if tmpdir:
+        tmpdir.cleanup()
+
+
+if __name__ == "__main__":
+    main()
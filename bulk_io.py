@@ -0,0 +1,477 @@
+# bulk_io.py
+"""
+Bulk import / export of routes and joins (CSV or JSONL).
+
+Import reads rows one by one and writes them in batches. Each batch is one
+BEGIN IMMEDIATE transaction: rows are validated in Python, checked against the
+database (duplicate routes, duplicate phones, end points, seat caps) and then
+inserted with executemany. A bad row is reported with its line number and
+skipped; it never aborts the rest of the file. Should a UNIQUE index or seat
+trigger still reject a batch, that batch is redone row by row under
+savepoints, so only the offending lines fail. With dry_run=True everything
+runs exactly the same and every batch is rolled back at the end.
+
+    python bulk_io.py import routes semester.csv --dry-run
+    python bulk_io.py import joins joins.jsonl
+    python bulk_io.py export routes --from 2025-07-01 --to 2025-11-30 > routes.csv
+    python bulk_io.py export joins --from 2025-07-01 --to 2025-11-30 --format jsonl
+
+Columns (the export writes the same names, so its output can be imported again):
+  routes: date, end_point, slot_no, major_stops, time, transport_type, seat_cap
+          (slot_no is allocated when empty; seat_cap may be empty)
+  joins:  date, route_id | (end_point, time, transport_type), name, gender, drop, phone,
+          course_year, branch
+"""
+
+import argparse
+import csv
+import io
+import json
+import sqlite3
+import sys
+from datetime import date, datetime
+from typing import Callable, Dict, Iterable, Iterator, List, Optional, Tuple
+
+BATCH_SIZE = 1000
+MAX_ERRORS = 1000          # stop listing errors after this many (still counted)
+FORMATS = ("csv", "jsonl")
+
+ROUTE_FIELDS = ["date", "end_point", "slot_no", "major_stops", "time", "transport_type", "seat_cap"]
+JOIN_FIELDS = ["date", "route_id", "end_point", "time", "transport_type", "name", "gender", "drop", "phone",
+               "course_year", "branch"]
+
+
+class RowError(ValueError):
+    pass
+
+
+# ---------------- reading ----------------
+def read_rows(fp, fmt: str) -> Iterator[Tuple[int, Optional[dict], Optional[str]]]:
+    """(line number, row dict or None, parse error or None) for every record in a text stream."""
+    if fmt == "csv":
+        reader = csv.DictReader(fp)
+        while True:
+            try:
+                row = next(reader)
+            except StopIteration:
+                return
+            except csv.Error as e:
+                # line_num has not been advanced past the record that failed
+                yield reader.line_num + 1, None, f"invalid CSV: {e}"
+                continue
+            if None in row:
+                # DictReader files the extra values under the key None
+                yield reader.line_num, None, f"too many fields ({len(reader.fieldnames) + len(row[None])}, header has {len(reader.fieldnames)})"
+                continue
+            yield reader.line_num, {(k or "").strip().lower(): (v or "").strip() for k, v in row.items()}, None
+    elif fmt == "jsonl":
+        for n, line in enumerate(fp, start=1):
+            if not line.strip():
+                continue
+            try:
+                obj = json.loads(line)
+            except ValueError as e:
+                yield n, None, f"invalid JSON: {e}"
+                continue
+            if not isinstance(obj, dict):
+                yield n, None, "expected a JSON object"
+                continue
+            yield n, {str(k).strip().lower(): ("" if v is None else str(v).strip()) for k, v in obj.items()}, None
+    else:
+        raise ValueError(f"unknown format {fmt!r} (csv or jsonl)")
+
+
+def batched(rows: Iterable, size: int) -> Iterator[list]:
+    batch = []
+    for r in rows:
+        batch.append(r)
+        if len(batch) >= size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+
+# ---------------- validation (same rules as the API) ----------------
+def _date(v: str, allow_past: bool) -> str:
+    try:
+        d = datetime.strptime(v, "%Y-%m-%d").date()
+    except (TypeError, ValueError):
+        raise RowError("date must be YYYY-MM-DD")
+    if not allow_past and d < date.today():
+        raise RowError("date is in the past")
+    return d.isoformat()
+
+
+def _time(v: str) -> str:
+    if not v:
+        return ""
+    try:
+        datetime.strptime(v, "%H:%M")
+    except ValueError:
+        raise RowError("time must be HH:MM")
+    return v
+
+
+_ASCII_LOWER = str.maketrans("ABCDEFGHIJKLMNOPQRSTUVWXYZ", "abcdefghijklmnopqrstuvwxyz")
+
+
+def _sql_key(v: Optional[str], lower: bool = True) -> str:
+    # SQLite's TRIM() removes spaces only and LOWER() folds ASCII only; str.strip()/lower() do more
+    v = (v or "").strip(" ")
+    return v.translate(_ASCII_LOWER) if lower else v
+
+
+def route_key(d: str, end_point: str, ttime: str, ttype: str) -> tuple:
+    # same values as the uq_routes_day_key columns, LOWER(TRIM(...)) in SQL (migrations.py v6)
+    return d, _sql_key(end_point), _sql_key(ttime, lower=False), _sql_key(ttype)
+
+
+def clean_route(row: dict, allow_past: bool) -> dict:
+    if not row.get("date") or not row.get("end_point"):
+        raise RowError("date and end_point are required")
+    cap = row.get("seat_cap") or None
+    if cap is not None:
+        try:
+            cap = int(cap)
+        except ValueError:
+            raise RowError("seat_cap must be a whole number")
+        if cap < 1:
+            raise RowError("seat_cap must be at least 1")
+    return {"date": _date(row["date"], allow_past), "end_point": row["end_point"], "slot_no": row.get("slot_no") or None,
+            "major_stops": row.get("major_stops") or None, "time": _time(row.get("time", "")) or None,
+            "transport_type": row.get("transport_type") or None, "seat_cap": cap}
+
+
+def clean_join(row: dict, allow_past: bool) -> dict:
+    missing = [f for f in ("date", "name", "gender", "drop", "phone", "course_year", "branch") if not row.get(f)]
+    if missing:
+        raise RowError("missing " + ", ".join(missing))
+    gender = row["gender"].upper()[:1]
+    if gender not in ("M", "F"):
+        raise RowError("gender must be M or F")
+    phone = row["phone"]
+    if not phone.isdigit() or len(phone) < 7:
+        raise RowError("phone must be at least 7 digits")
+    route_id = row.get("route_id") or None
+    if route_id is not None:
+        try:
+            route_id = int(route_id)
+        except ValueError:
+            raise RowError("route_id must be a number")
+    elif not row.get("end_point"):
+        raise RowError("route_id or end_point (+ time, transport_type) is required")
+    out = {k: row.get(k) or None for k in ("name", "drop", "course_year", "branch", "end_point", "transport_type")}
+    out.update(date=_date(row["date"], allow_past), gender=gender, phone=phone, route_id=route_id,
+               time=_time(row.get("time", "")) or None)
+    return out
+
+
+# ---------------- import ----------------
+class ImportReport:
+    def __init__(self, kind: str, dry_run: bool):
+        self.kind = kind
+        self.dry_run = dry_run
+        self.rows = 0
+        self.inserted = 0
+        self.error_count = 0
+        self.errors: List[dict] = []
+
+    def error(self, line: int, msg: str):
+        self.error_count += 1
+        if len(self.errors) < MAX_ERRORS:
+            self.errors.append({"line": line, "error": msg})
+
+    def as_dict(self) -> dict:
+        return {"kind": self.kind, "dry_run": self.dry_run, "rows": self.rows, "inserted": self.inserted,
+                "failed": self.error_count, "errors": sorted(self.errors, key=lambda e: e["line"])}
+
+
+def _validated(records, report: ImportReport, clean: Callable[[dict, bool], dict], allow_past: bool):
+    for line, row, err in records:
+        report.rows += 1
+        if err is None:
+            try:
+                yield line, clean(row, allow_past)
+                continue
+            except RowError as e:
+                err = str(e)
+        report.error(line, err)
+
+
+def _in_clause(values) -> str:
+    return ",".join("?" * len(values))
+
+
+def _insert(conn, rows, insert_batch, insert_one, report, describe) -> int:
+    """
+    Write `rows` ((line, row) pairs) with insert_batch(rows). If a constraint or trigger still rejects
+    something the checks above missed, redo the batch row by row so only the offending lines fail.
+    """
+    conn.execute("SAVEPOINT bulk_batch")
+    try:
+        insert_batch(rows)
+    except sqlite3.IntegrityError:
+        conn.execute("ROLLBACK TO bulk_batch")
+    else:
+        conn.execute("RELEASE bulk_batch")
+        return len(rows)
+    conn.execute("RELEASE bulk_batch")
+    n = 0
+    for line, row in rows:
+        conn.execute("SAVEPOINT bulk_row")
+        try:
+            insert_one(row)
+            n += 1
+        except sqlite3.IntegrityError as e:
+            conn.execute("ROLLBACK TO bulk_row")
+            report.error(line, describe(e))
+        conn.execute("RELEASE bulk_row")
+    return n
+
+
+def _import_route_batch(conn, batch, report, slots, seen):
+    dates = sorted({r["date"] for _, r in batch})
+    existing = {tuple(k) for k in conn.execute(
+        f"SELECT key_date, end_point_key, time_key, transport_key FROM routes WHERE key_date IN ({_in_clause(dates)})",
+        dates).fetchall()}
+    good = []
+    for line, r in batch:
+        key = route_key(r["date"], r["end_point"], r["time"], r["transport_type"])
+        if key in existing:
+            report.error(line, "duplicate route (same date, end point, time and transport already exists)")
+        elif key in seen:
+            report.error(line, f"duplicate of line {seen[key]}")
+        else:
+            seen[key] = line
+            good.append((line, r))
+    if not good:
+        return
+    for _, r in good:
+        r["slot_no"] = r["slot_no"] or next(slots, None)
+    insert_sql = """INSERT INTO routes (slot_no, end_point, major_stops, time, transport_type, no_of_people, key_date, seat_cap)
+                    VALUES (?, ?, ?, ?, ?, 0, ?, ?)"""
+    def values(r):
+        return r["slot_no"], r["end_point"], r["major_stops"], r["time"], r["transport_type"], r["date"], r["seat_cap"]
+    def insert_batch(rows):
+        before = conn.execute("SELECT COALESCE(MAX(id), 0) FROM routes").fetchone()[0]
+        conn.executemany(insert_sql, [values(r) for _, r in rows])
+        # placeholder calendar row per new route, as api_create_route does; the write lock is held, so
+        # id > before is exactly this batch
+        conn.execute("""INSERT INTO calendar (travel_date, route_id, link_id)
+                        SELECT key_date, id, NULL FROM routes WHERE id > ? ORDER BY id""", (before,))
+    def insert_one(r):
+        rid = conn.execute(insert_sql, values(r)).lastrowid
+        conn.execute("INSERT INTO calendar (travel_date, route_id, link_id) VALUES (?, ?, NULL)", (r["date"], rid))
+    def describe(e):
+        if "UNIQUE" in str(e):
+            return "duplicate route (same date, end point, time and transport already exists)"
+        return str(e)
+    report.inserted += _insert(conn, good, insert_batch, insert_one, report, describe)
+
+
+def _import_join_batch(conn, batch, report, seen):
+    # resolve routes by id or by (date, end point, time, transport)
+    ids = sorted({r["route_id"] for _, r in batch if r["route_id"] is not None})
+    routes: Dict[int, dict] = {}
+    if ids:
+        # routes left out of the key index (pre-v6 duplicates) have no key_date: use their placeholder row
+        for row in conn.execute(f"""SELECT id, COALESCE(key_date, (SELECT MIN(travel_date) FROM calendar
+                                                                   WHERE route_id = routes.id AND link_id IS NULL)),
+                                           end_point, seat_cap, no_of_people
+                                    FROM routes WHERE id IN ({_in_clause(ids)})""", ids):
+            routes[row[0]] = {"date": row[1], "end_point": row[2], "cap": row[3], "taken": row[4] or 0}
+    by_key: Dict[tuple, int] = {}
+    dates = sorted({r["date"] for _, r in batch if r["route_id"] is None})
+    if dates:
+        for row in conn.execute(f"""SELECT id, key_date, end_point, seat_cap, no_of_people, end_point_key, time_key, transport_key
+                                    FROM routes WHERE key_date IN ({_in_clause(dates)})""", dates):
+            by_key[(row[1], row[5], row[6], row[7])] = row[0]
+            routes.setdefault(row[0], {"date": row[1], "end_point": row[2], "cap": row[3], "taken": row[4] or 0})
+
+    resolved = []
+    for line, r in batch:
+        rid = r["route_id"]
+        if rid is None:
+            rid = by_key.get(route_key(r["date"], r["end_point"], r["time"], r["transport_type"]))
+        if rid is None or rid not in routes:
+            report.error(line, "route not found")
+            continue
+        rt = routes[rid]
+        if rt["date"] != r["date"]:
+            report.error(line, f"route {rid} runs on {rt['date']}, not {r['date']}")
+            continue
+        if rt["end_point"] and rt["end_point"].strip().lower() != r["drop"].strip().lower():
+            report.error(line, f"drop must match route endpoint '{rt['end_point']}'")
+            continue
+        resolved.append((line, rid, r))
+
+    pairs = sorted({(r["date"], rid) for _, rid, r in resolved})
+    taken_phones = set()
+    for d, rid in pairs:
+        for (p,) in conn.execute("SELECT join_phone FROM calendar WHERE travel_date=? AND route_id=? AND join_phone IS NOT NULL",
+                                 (d, rid)):
+            taken_phones.add((d, rid, p))
+    good = []
+    for line, rid, r in resolved:
+        key = (r["date"], rid, r["phone"])
+        rt = routes[rid]
+        if key in taken_phones:
+            report.error(line, "already joined")
+        elif key in seen:
+            report.error(line, f"duplicate of line {seen[key]}")
+        elif rt["cap"] is not None and rt["taken"] >= rt["cap"]:
+            report.error(line, "route is full")
+        else:
+            seen[key] = line
+            rt["taken"] += 1
+            good.append((line, (rid, r)))
+    if not good:
+        return
+    link_sql = "INSERT INTO links (name, gender, drop_point, phone, course_year, branch) VALUES (?, ?, ?, ?, ?, ?)"
+    def values(r):
+        return r["name"], r["gender"], r["drop"], r["phone"], r["course_year"], r["branch"]
+    def insert_batch(rows):
+        before = conn.execute("SELECT COALESCE(MAX(id), 0) FROM links").fetchone()[0]
+        conn.executemany(link_sql, [values(r) for _, (_, r) in rows])
+        link_ids = [row[0] for row in conn.execute("SELECT id FROM links WHERE id > ? ORDER BY id", (before,))]
+        conn.executemany("INSERT INTO calendar (travel_date, route_id, link_id) VALUES (?, ?, ?)",
+                         [(r["date"], rid, lid) for (_, (rid, r)), lid in zip(rows, link_ids)])
+    def insert_one(item):
+        rid, r = item
+        lid = conn.execute(link_sql, values(r)).lastrowid
+        conn.execute("INSERT INTO calendar (travel_date, route_id, link_id) VALUES (?, ?, ?)", (r["date"], rid, lid))
+    def describe(e):
+        if "route full" in str(e):
+            return "route is full"
+        if "UNIQUE" in str(e):
+            return "already joined"
+        return str(e)
+    report.inserted += _insert(conn, good, insert_batch, insert_one, report, describe)
+
+
+def import_stream(conn: sqlite3.Connection, kind: str, fp, fmt: str = "csv", dry_run: bool = False,
+                  next_slot: Optional[Callable[[], str]] = None, allow_past: bool = False,
+                  batch_size: int = BATCH_SIZE) -> dict:
+    """
+    Import routes or joins from the text stream `fp`. next_slot() supplies slot numbers for route rows
+    without one (not called on a dry run). Returns the report dict (counts plus per-line errors).
+    """
+    if kind not in ("routes", "joins"):
+        raise ValueError("kind must be routes or joins")
+    if kind == "routes" and next_slot is None:
+        raise ValueError("next_slot is required to import routes")
+    report = ImportReport(kind, dry_run)
+    clean = clean_route if kind == "routes" else clean_join
+    seen: dict = {}
+    conn.commit()
+    for batch in batched(_validated(read_rows(fp, fmt), report, clean, allow_past), batch_size):
+        slots = iter(())
+        if kind == "routes" and not dry_run:
+            # reserved before BEGIN: SlotSequence takes its own write lock on another connection
+            slots = iter([next_slot() for _, r in batch if not r["slot_no"]])
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            if kind == "routes":
+                _import_route_batch(conn, batch, report, slots, seen)
+            else:
+                _import_join_batch(conn, batch, report, seen)
+            if dry_run:
+                conn.rollback()
+            else:
+                conn.commit()
+        except Exception:
+            conn.rollback()
+            raise
+    return report.as_dict()
+
+
+# ---------------- export ----------------
+EXPORT_SQL = {
+    "routes": ("""SELECT cal.travel_date AS date, r.end_point, r.slot_no, r.major_stops, r.time, r.transport_type,
+                         r.seat_cap, r.id AS route_id, r.no_of_people AS joined
+                  FROM calendar cal JOIN routes r ON r.id = cal.route_id
+                  WHERE cal.link_id IS NULL AND cal.travel_date BETWEEN ? AND ?
+                  ORDER BY cal.travel_date, r.id"""),
+    "joins": ("""SELECT cal.travel_date AS date, cal.route_id, r.end_point, r.time, r.transport_type,
+                        l.name, l.gender, l.drop_point AS "drop", l.phone, l.course_year, l.branch
+                 FROM calendar cal JOIN links l ON l.id = cal.link_id JOIN routes r ON r.id = cal.route_id
+                 WHERE cal.travel_date BETWEEN ? AND ?
+                 ORDER BY cal.travel_date, cal.route_id, l.id"""),
+}
+
+
+def export_stream(conn: sqlite3.Connection, kind: str, start: str, end: str, fmt: str = "csv",
+                  chunk_rows: int = 500) -> Iterator[str]:
+    """Yield the export as text chunks of about chunk_rows rows; never holds the whole result in memory."""
+    if kind not in EXPORT_SQL:
+        raise ValueError("kind must be routes or joins")
+    if fmt not in FORMATS:
+        raise ValueError(f"unknown format {fmt!r} (csv or jsonl)")
+    cur = conn.execute(EXPORT_SQL[kind], (start, end))
+    cols = [d[0] for d in cur.description]
+    buf = io.StringIO()
+    writer = csv.writer(buf) if fmt == "csv" else None
+    if writer:
+        writer.writerow(cols)
+    while True:
+        rows = cur.fetchmany(chunk_rows)
+        if not rows:
+            break
+        for row in rows:
+            if writer:
+                writer.writerow(["" if v is None else v for v in row])
+            else:
+                buf.write(json.dumps(dict(zip(cols, row)), ensure_ascii=False) + "\n")
+        yield buf.getvalue()
+        buf.seek(0)
+        buf.truncate()
+    if buf.tell():
+        yield buf.getvalue()
+
+
+# ---------------- CLI ----------------
+def main():
+    from dbpool import get_pool
+    from migrations import migrate
+    from slotseq import SlotSequence, slot_label
+
+    ap = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    ap.add_argument("--db", default="routelink.db")
+    sub = ap.add_subparsers(dest="cmd", required=True)
+    imp = sub.add_parser("import", help="import routes or joins")
+    imp.add_argument("kind", choices=["routes", "joins"])
+    imp.add_argument("file", help="CSV/JSONL file, or - for stdin")
+    imp.add_argument("--format", choices=FORMATS, help="default: from the file extension")
+    imp.add_argument("--dry-run", action="store_true", help="validate and report, write nothing")
+    imp.add_argument("--allow-past", action="store_true", help="accept dates before today (history backfill)")
+    exp = sub.add_parser("export", help="export routes or joins for a date range")
+    exp.add_argument("kind", choices=["routes", "joins"])
+    exp.add_argument("--from", dest="start", required=True)
+    exp.add_argument("--to", dest="end", required=True)
+    exp.add_argument("--format", choices=FORMATS, default="csv")
+    args = ap.parse_args()
+
+    pool = get_pool(args.db)
+    with pool.connection() as conn:
+        migrate(conn)
+        if args.cmd == "import":
+            fmt = args.format or ("jsonl" if args.file.endswith((".jsonl", ".ndjson")) else "csv")
+            slots = SlotSequence(pool, "slot_no", block=256)
+            fp = sys.stdin if args.file == "-" else open(args.file, newline="", encoding="utf-8")
+            try:
+                report = import_stream(conn, args.kind, fp, fmt, dry_run=args.dry_run,
+                                       next_slot=lambda: slot_label(slots.next()), allow_past=args.allow_past)
+            finally:
+                if fp is not sys.stdin:
+                    fp.close()
+            json.dump(report, sys.stdout, indent=2)
+            sys.stdout.write("\n")
+            sys.exit(1 if report["failed"] else 0)
+        else:
+            for chunk in export_stream(conn, args.kind, args.start, args.end, args.format):
+                sys.stdout.write(chunk)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,97 @@
+# chatpoll.py
+"""
+Message paging and long-poll helpers shared by the chat apps (app2, app3)
+and the async mode (asgi_app.py).
+
+    after_id, before_id, limit = message_page_args()
+    rows, has_more = fetch_message_page(c, "SELECT ... FROM messages WHERE conversation_id=?", (cid,),
+                                        after_id, before_id, limit)
+    msgs, has_more = wait_for_messages(HUB, f"conv:{cid}", after_id, message_wait_arg(), page, release=close_db)
+
+Paging is keyset on messages.id; pages are always returned oldest-first.
+A long-poll subscribes to the app's pubsub Hub. It then reads once, and if
+there is nothing new it blocks until a message is published on the topic or
+the wait runs out. Before it blocks it calls release(), so a parked request
+does not keep its SQLite connection open.
+"""
+
+import time
+
+from flask import request
+
+MSG_PAGE_DEFAULT = 50
+MSG_PAGE_MAX = 200
+LONGPOLL_MAX_WAIT = 25
+
+
+def message_page_args():
+    """after_id / before_id cursors and a capped limit from the query string."""
+    after_id = request.args.get("after_id", type=int)
+    before_id = request.args.get("before_id", type=int)
+    limit = request.args.get("limit", MSG_PAGE_DEFAULT, type=int) or MSG_PAGE_DEFAULT
+    return after_id, before_id, max(1, min(limit, MSG_PAGE_MAX))
+
+
+def message_wait_arg():
+    wait = request.args.get("wait", 0, type=float) or 0
+    return max(0.0, min(wait, LONGPOLL_MAX_WAIT))
+
+
+def fetch_message_page(c, base_sql, params, after_id, before_id, limit):
+    """
+    Keyset page over messages.id, always returned oldest-first.
+    after_id: messages newer than the cursor (polling); before_id: the page just older
+    than the cursor (scrolling back); neither: the latest page.
+    Returns (rows, has_more).
+    """
+    if after_id is not None:
+        c.execute(base_sql + " AND id > ? ORDER BY id ASC LIMIT ?", (*params, after_id, limit + 1))
+        rows = c.fetchall()
+        return rows[:limit], len(rows) > limit
+    if before_id is not None:
+        c.execute(base_sql + " AND id < ? ORDER BY id DESC LIMIT ?", (*params, before_id, limit + 1))
+    else:
+        c.execute(base_sql + " ORDER BY id DESC LIMIT ?", (*params, limit + 1))
+    rows = c.fetchall()
+    return list(reversed(rows[:limit])), len(rows) > limit
+
+
+def wait_for_messages(hub, topic, after_id, wait, fetch, release=None):
+    """
+    fetch() -> (list of message dicts, has_more). Returns fetch() at once if it has anything,
+    otherwise blocks up to `wait` seconds for messages published on `topic` with id > after_id.
+    release() runs before blocking; fetch() must open whatever connection it needs itself.
+    """
+    # subscribe before reading so a message posted between the read and the wait is not lost
+    with hub.subscribe(topic) as sub:
+        msgs, has_more = fetch()
+        if msgs or wait <= 0:
+            return msgs, has_more
+        if release is not None:
+            release()
+        deadline = time.monotonic() + wait
+        while True:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                return [], False
+            ev = sub.get(timeout=remaining)
+            if ev is None:
+                return [], False
+            new = published_messages(sub, ev, after_id)
+            if new is None:
+                return fetch()
+            if new:
+                return new, False
+
+
+def published_messages(sub, ev, after_id):
+    """
+    Messages newer than after_id from `ev` plus whatever else is queued on `sub`, oldest first.
+    None if the subscription dropped events: the caller must read the gap from the table instead.
+    """
+    if sub.dropped:
+        return None
+    new = [m for m in [ev] + sub.drain() if m["id"] > after_id]
+    new.sort(key=lambda m: m["id"])
+    return new
+
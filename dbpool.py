@@ -0,0 +1,132 @@
+# dbpool.py
+"""
+Pooled, pre-configured SQLite connections for routelink.db.
+
+Opening a sqlite3 connection, switching it to WAL and warming its page cache
+used to happen on every request (app.py) and on every helper call (the Tkinter
+client). A ConnectionPool keeps a small LIFO stack of ready connections instead:
+
+    with get_pool(DB).connection() as conn:
+        conn.execute(...)
+
+Rules:
+- Every connection gets the same PRAGMAs once, when it is opened (PRAGMAS below).
+- Each connection keeps its own prepared-statement cache (`cached_statements`),
+  which survives between uses because the connection is reused.
+- Thread affinity: a connection belongs to exactly one thread between acquire()
+  and release(). Connections are opened with check_same_thread=False only so that
+  a released connection can be handed to a different thread later; never share
+  one that is checked out.
+- release() rolls back anything left uncommitted, so a connection never goes
+  back to the pool mid-transaction.
+- After fork() the child discards the parent's connections and opens its own.
+"""
+
+import os
+import sqlite3
+import threading
+from contextlib import contextmanager
+from typing import Dict, List, Optional
+
+PRAGMAS = (
+    ("journal_mode", "WAL"),
+    ("synchronous", "NORMAL"),
+    ("mmap_size", str(256 * 1024 * 1024)),
+    ("cache_size", "-16000"),       # ~16 MB page cache per connection
+    ("temp_store", "MEMORY"),
+)
+
+
+class ConnectionPool:
+    def __init__(self, path: str, size: int = 8, timeout: float = 30.0,
+                 cached_statements: int = 256, row_factory=sqlite3.Row, factory=sqlite3.Connection):
+        self.path = path
+        self.size = size
+        self.timeout = timeout
+        self.cached_statements = cached_statements
+        self.row_factory = row_factory
+        self.factory = factory          # sqlite3.Connection subclass, e.g. metrics.TimedConnection
+        self._idle: List[sqlite3.Connection] = []
+        self._lock = threading.Lock()
+        self._pid = os.getpid()
+
+    def _open(self) -> sqlite3.Connection:
+        conn = sqlite3.connect(self.path, timeout=self.timeout, check_same_thread=False,
+                               cached_statements=self.cached_statements, factory=self.factory)
+        conn.row_factory = self.row_factory
+        conn.execute(f"PRAGMA busy_timeout={int(self.timeout * 1000)}")
+        for name, value in PRAGMAS:
+            try:
+                conn.execute(f"PRAGMA {name}={value}")
+            except sqlite3.DatabaseError:
+                pass
+        return conn
+
+    def _check_fork(self):
+        # sqlite connections must not cross fork(); drop the inherited ones without closing them
+        if os.getpid() != self._pid:
+            self._idle = []
+            self._lock = threading.Lock()
+            self._pid = os.getpid()
+
+    def acquire(self) -> sqlite3.Connection:
+        self._check_fork()
+        with self._lock:
+            if self._idle:
+                return self._idle.pop()
+        return self._open()
+
+    def release(self, conn: sqlite3.Connection):
+        if conn is None:
+            return
+        if os.getpid() != self._pid:
+            return
+        try:
+            if conn.in_transaction:
+                conn.rollback()
+        except sqlite3.Error:
+            try: conn.close()
+            except Exception: pass
+            return
+        with self._lock:
+            if len(self._idle) < self.size:
+                self._idle.append(conn)
+                return
+        conn.close()
+
+    @contextmanager
+    def connection(self):
+        conn = self.acquire()
+        try:
+            yield conn
+        finally:
+            self.release(conn)
+
+    def warm(self, n: Optional[int] = None):
+        """Open up to `n` (default: size) connections ahead of the first request."""
+        self._check_fork()
+        with self._lock:
+            missing = (n or self.size) - len(self._idle)
+        for _ in range(max(0, missing)):
+            self.release(self._open())
+
+    def close_all(self):
+        with self._lock:
+            idle, self._idle = self._idle, []
+        for conn in idle:
+            try: conn.close()
+            except Exception: pass
+
+
+_pools: Dict[str, ConnectionPool] = {}
+_pools_lock = threading.Lock()
+
+
+def get_pool(path: str, **kwargs) -> ConnectionPool:
+    """Process-wide pool for `path`; kwargs only apply when the pool is first created."""
+    key = os.path.abspath(path)
+    with _pools_lock:
+        pool = _pools.get(key)
+        if pool is None:
+            pool = _pools[key] = ConnectionPool(path, **kwargs)
+        return pool
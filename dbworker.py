@@ -0,0 +1,133 @@
+# dbworker.py
+"""
+Background SQLite executor for the Tkinter client.
+
+Tk widgets may only be touched from the main thread, but a query that waits on
+a locked WAL or a slow disk must not run there either. DbExecutor runs
+`work(conn)` on a worker thread with a pooled connection and hands the result
+back through a queue that the Tk main loop drains with after():
+
+    DBX = DbExecutor(POOL)
+    DBX.attach(root)      # start polling from the Tk loop
+    DBX.submit(lambda conn: conn.execute(...).fetchall(), on_done=fill_tree, key="route-tab")
+
+on_done(result) / on_error(exc) always run on the Tk thread.
+
+key: submitting again with the same key supersedes the earlier request. If the
+earlier one has not started it is skipped; if it is already running, its
+result is dropped. Use it for views that only show the latest request
+(clicking through dates quickly). Leave it out for writes.
+
+One worker by default, so requests run in submission order: a refresh
+submitted after a write sees that write.
+"""
+
+import itertools
+import queue
+import threading
+import traceback
+from typing import Any, Callable, Dict, Optional
+
+
+class Job:
+    __slots__ = ("work", "on_done", "on_error", "key", "seq", "cancelled")
+
+    def __init__(self, work, on_done, on_error, key, seq):
+        self.work = work
+        self.on_done = on_done
+        self.on_error = on_error
+        self.key = key
+        self.seq = seq
+        self.cancelled = False
+
+    def cancel(self):
+        self.cancelled = True
+
+
+class DbExecutor:
+    def __init__(self, pool, workers: int = 1, poll_ms: int = 20, max_per_tick: int = 50):
+        self.pool = pool
+        self.poll_ms = poll_ms
+        self.max_per_tick = max_per_tick
+        self._requests: "queue.Queue[Optional[Job]]" = queue.Queue()
+        self._results: "queue.Queue[tuple]" = queue.Queue()
+        self._latest: Dict[str, int] = {}
+        self._lock = threading.Lock()
+        self._seq = itertools.count(1)
+        self._root = None
+        self._stopped = False
+        self._threads = []
+        for i in range(workers):
+            t = threading.Thread(target=self._run, name=f"db-worker-{i}", daemon=True)
+            t.start()
+            self._threads.append(t)
+
+    def submit(self, work: Callable[[Any], Any], on_done: Optional[Callable[[Any], None]] = None,
+               on_error: Optional[Callable[[Exception], None]] = None, key: Optional[str] = None) -> Job:
+        job = Job(work, on_done, on_error, key, next(self._seq))
+        if key is not None:
+            with self._lock:
+                self._latest[key] = job.seq
+        self._requests.put(job)
+        return job
+
+    def cancel(self, key: str):
+        """Drop whatever is pending or running under `key`."""
+        with self._lock:
+            self._latest[key] = next(self._seq)
+
+    def _stale(self, job: Job) -> bool:
+        if job.cancelled:
+            return True
+        if job.key is None:
+            return False
+        with self._lock:
+            return self._latest.get(job.key) != job.seq
+
+    # ---- worker thread ----
+    def _run(self):
+        while True:
+            job = self._requests.get()
+            if job is None:
+                return
+            if self._stale(job):
+                continue
+            try:
+                with self.pool.connection() as conn:
+                    result = job.work(conn)
+                self._results.put((job, True, result))
+            except Exception as e:
+                self._results.put((job, False, e))
+
+    # ---- Tk thread ----
+    def attach(self, root):
+        self._root = root
+        root.after(self.poll_ms, self._poll)
+
+    def _poll(self):
+        for _ in range(self.max_per_tick):
+            try:
+                job, ok, value = self._results.get_nowait()
+            except queue.Empty:
+                break
+            if self._stale(job):
+                continue
+            cb = job.on_done if ok else job.on_error
+            try:
+                if cb is not None:
+                    cb(value)
+                elif not ok:
+                    traceback.print_exception(type(value), value, value.__traceback__)
+            except Exception:
+                traceback.print_exc()
+        if not self._stopped:
+            try:
+                self._root.after(self.poll_ms, self._poll)
+            except Exception:
+                # root destroyed
+                self._stopped = True
+
+    def shutdown(self):
+        self._stopped = True
+        for _ in self._threads:
+            self._requests.put(None)
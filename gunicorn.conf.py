@@ -0,0 +1,88 @@
+# gunicorn.conf.py
+"""
+Production serving for app.py: a prefork gunicorn master with threaded workers.
+
+    gunicorn -c gunicorn.conf.py app:app      (or: python app.py --prod)
+
+Environment:
+  ROUTELINK_BIND       default 0.0.0.0:5000
+  ROUTELINK_WORKERS    worker processes, default one per core
+  ROUTELINK_THREADS    threads per worker, default 8 (SSE and long-poll requests each hold one)
+  ROUTELINK_SSE_STREAMS  /events streams per worker, default ROUTELINK_THREADS / 2 (app.py)
+  ROUTELINK_WORKER     "gthread" (default) or "asgi": one uvicorn worker serving asgi_app:app
+  ROUTELINK_MAX_REQS   recycle a worker after this many requests, default 5000 (0 = never)
+
+Thread budget (gthread): every open /events stream and every chat long-poll
+holds a thread for as long as it waits, and each browser tab on the calendar
+keeps one /events stream open. app.py therefore gives /events at most half of
+a worker's threads (further tabs get an empty stream and retry in 30 s, and
+each stream is closed after 5 minutes so waiting tabs take turns). The pages
+close their stream while hidden. That leaves workers x threads / 2 threads for
+ordinary requests. Plan for about one thread per concurrently *visible* tab,
+and raise ROUTELINK_THREADS with it (threads are cheap while they wait).
+Beyond a few hundred live tabs, run ROUTELINK_WORKER=asgi instead: there
+/events and the chat long-polls are coroutines and cost no thread while
+idle. Alternatively, keep gthread for the API and let the proxy send /events
+and /conversations/*/messages to a separate `uvicorn asgi_app:app`.
+
+Startup: the master imports app.py once (preload_app). It then runs init_db()
+exactly once, which covers the CREATE TABLEs, migrations and ANALYZE. It also
+parses the holiday files once, before any worker exists. The forked workers
+inherit the loaded code and holidays copy-on-write. They do not inherit open
+SQLite connections: the master closes its own before forking, and each worker
+opens and warms its pool in post_fork.
+
+Reloads:
+  kill -HUP <master>    graceful: new workers start, old ones finish their
+                        requests (up to graceful_timeout) and exit. Picks up
+                        config changes. The preloaded code is NOT re-imported.
+  kill -USR2 <master>   then -WINCH / -QUIT the old master: zero-downtime
+                        upgrade to new code.
+  kill -TERM <master>   graceful shutdown.
+"""
+
+import multiprocessing
+import os
+
+bind = os.environ.get("ROUTELINK_BIND", "0.0.0.0:5000")
+workers = int(os.environ.get("ROUTELINK_WORKERS", 0)) or multiprocessing.cpu_count()
+threads = int(os.environ.get("ROUTELINK_THREADS", 8))
+worker_class = "gthread"
+if os.environ.get("ROUTELINK_WORKER", "gthread") == "asgi":
+    # same app routes; SSE and long-polls on the event loop (asgi_app.py, needs uvicorn installed)
+    worker_class = "uvicorn.workers.UvicornWorker"
+    wsgi_app = "asgi_app:app"
+    workers = 1   # chat wake-ups travel through in-process hubs (pubsub.py)
+preload_app = True
+
+# /events streams and 25 s long-polls are normal; the timeout only guards a stuck worker
+timeout = 60
+graceful_timeout = 30
+keepalive = 5
+max_requests = int(os.environ.get("ROUTELINK_MAX_REQS", 5000))
+max_requests_jitter = max_requests // 10
+
+accesslog = "-"
+errorlog = "-"
+loglevel = os.environ.get("ROUTELINK_LOGLEVEL", "info")
+proc_name = "routelink"
+
+
+def on_starting(server):
+    # master only, once per master (not on HUP)
+    import app
+    app.init_db()
+    app.load_academic_holidays()
+    app.POOL.close_all()   # no sqlite handle may cross fork()
+    server.log.info("routelink: database initialised, %d %s workers x %d threads", workers, worker_class, threads)
+
+
+def post_fork(server, worker):
+    import app
+    app.POOL.warm()
+
+
+def worker_exit(server, worker):
+    import app
+    app.HASHER.shutdown()
+    app.POOL.close_all()
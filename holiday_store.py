@@ -0,0 +1,177 @@
+# holiday_store.py
+"""
+Parse-once academic holiday store.
+
+academic_holidays.json (a list of "YYYY-MM-DD" strings or {"date": ...} objects)
+or, failing that, academic_holidays.csv (date in the first column) is read once
+into a sorted tuple plus a set. The files are re-read only when their mtime
+changes, checked at most once per `check_interval` seconds. When neither file
+exists, `fallback(year)` is called once per year that is asked for and the
+result is kept.
+
+    HOLIDAYS = HolidayStore(HOL_JSON, HOL_CSV, fallback=generate_sample_holidays)
+    HOLIDAYS.is_holiday("2025-10-20")          # O(1)
+    HOLIDAYS.between("2025-10-01", "2025-10-31")  # O(log n + k)
+"""
+
+import bisect
+import csv
+import json
+import os
+import threading
+import time
+from datetime import date
+from typing import Callable, Iterable, List, Optional, Tuple, Union
+
+DateLike = Union[str, date]
+
+
+def _iso(d: DateLike) -> str:
+    return d.isoformat() if isinstance(d, date) else str(d)
+
+
+def _valid(s: str) -> bool:
+    try:
+        date.fromisoformat(s)
+        return True
+    except (TypeError, ValueError):
+        return False
+
+
+def parse_json(path: str) -> List[str]:
+    with open(path, "r", encoding="utf-8") as f:
+        data = json.load(f)
+    out = []
+    if isinstance(data, list):
+        for item in data:
+            if isinstance(item, str):
+                out.append(item.strip())
+            elif isinstance(item, dict) and "date" in item:
+                out.append(str(item["date"]).strip())
+    return out
+
+
+def parse_csv(path: str) -> List[str]:
+    out = []
+    with open(path, newline="", encoding="utf-8") as f:
+        for row in csv.reader(f):
+            if not row:
+                continue
+            maybe = row[0].strip()
+            if maybe.lower() == "date":
+                continue
+            out.append(maybe)
+    return out
+
+
+class HolidayStore:
+    def __init__(self, json_path: str, csv_path: Optional[str] = None,
+                 fallback: Optional[Callable[[int], Iterable[str]]] = None, check_interval: float = 1.0):
+        self.json_path = json_path
+        self.csv_path = csv_path
+        self.fallback = fallback
+        self.check_interval = check_interval
+        self._lock = threading.Lock()
+        self._sorted: Tuple[str, ...] = ()
+        self._set = frozenset()
+        self._source: Optional[Tuple[str, float]] = None   # (path, mtime) currently loaded
+        self._fallback_years = {}                          # year -> list, only used without a file
+        self._checked = 0.0
+
+    # ---- loading ----
+    def _current_source(self) -> Optional[Tuple[str, float]]:
+        for path in (self.json_path, self.csv_path):
+            if not path:
+                continue
+            try:
+                return path, os.stat(path).st_mtime
+            except OSError:
+                continue
+        return None
+
+    def _refresh(self):
+        now = time.monotonic()
+        if self._checked and now - self._checked < self.check_interval:
+            return
+        with self._lock:
+            if self._checked and now - self._checked < self.check_interval:
+                return
+            self._checked = now
+            src = self._current_source()
+            if src == self._source and (src is not None or self._sorted or not self.fallback):
+                return
+            days: List[str] = []
+            if src is not None:
+                try:
+                    days = parse_json(src[0]) if src[0] == self.json_path else parse_csv(src[0])
+                except Exception:
+                    # unreadable / half-written file: keep serving what we had, retry next check
+                    return
+            else:
+                self._ensure_fallback_year(date.today().year)
+                for year_days in self._fallback_years.values():
+                    days.extend(year_days)
+            self._install(days)
+            self._source = src
+
+    def _install(self, days: Iterable[str]):
+        clean = sorted({d for d in days if _valid(d)})
+        self._sorted = tuple(clean)
+        self._set = frozenset(clean)
+
+    def _ensure_fallback_year(self, year: int) -> bool:
+        if not self.fallback or year in self._fallback_years:
+            return False
+        self._fallback_years[year] = list(self.fallback(year))
+        return True
+
+    def _ensure_years(self, start: str, end: str):
+        """Without a holidays file, generate fallback samples for any year a query touches."""
+        if self._source is not None or not self.fallback:
+            return
+        try:
+            y0, y1 = int(start[:4]), int(end[:4])
+        except ValueError:
+            return
+        with self._lock:
+            added = False
+            for y in range(y0, y1 + 1):
+                added = self._ensure_fallback_year(y) or added
+            if added:
+                self._install(d for ds in self._fallback_years.values() for d in ds)
+
+    # ---- queries ----
+    def all(self) -> Tuple[str, ...]:
+        self._refresh()
+        return self._sorted
+
+    def is_holiday(self, d: DateLike) -> bool:
+        self._refresh()
+        iso = _iso(d)
+        self._ensure_years(iso, iso)
+        return iso in self._set
+
+    def between(self, start: DateLike, end: DateLike) -> List[str]:
+        """Holidays with start <= date <= end (inclusive ISO bounds)."""
+        self._refresh()
+        s, e = _iso(start), _iso(end)
+        self._ensure_years(s, e)
+        days = self._sorted
+        return list(days[bisect.bisect_left(days, s):bisect.bisect_right(days, e)])
+
+    def version(self) -> str:
+        """Cheap token that changes whenever the loaded holiday set changes."""
+        self._refresh()
+        src = self._source
+        if src is None:
+            return f"sample-{len(self._sorted)}"
+        return f"{os.path.basename(src[0])}-{src[1]:.6f}"
+
+    def __contains__(self, d) -> bool:
+        return self.is_holiday(d)
+
+    def __iter__(self):
+        return iter(self.all())
+
+    def __len__(self) -> int:
+        return len(self.all())
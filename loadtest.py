@@ -0,0 +1,401 @@
+# loadtest.py
+"""
+End-to-end load test for the RouteLink HTTP API (app.py).
+
+Seeds a throw-away SQLite file and starts app.py on it on 127.0.0.1, or
+targets --url. It then runs --users concurrent virtual students for
+--duration seconds. Each student repeatedly plays a scenario drawn from
+--mix and reports, per endpoint: requests, throughput, p50/p95/p99/max
+latency, 4xx (expected rejections like "Route is full") and errors
+(5xx / connection failures). Standard library only; nothing leaves
+localhost.
+
+    python loadtest.py                                  # default mix, dev server, 50 users, 30 s
+    python loadtest.py --server gunicorn --users 200    # prefork config from gunicorn.conf.py
+    python loadtest.py --mix rush=1 --rush-seats 40     # everyone joins one route
+    python loadtest.py --url http://127.0.0.1:5000 --db routelink.db --no-seed
+
+Scenarios:
+  auth     register a new account, then log in
+  login    log in as a seeded student (legacy SHA-256 hash, upgraded on first login)
+  browse   month view, then /calendar/<date> for several days (hovering the grid)
+  fanout   /calendar/<date>, then /route_count for every route on it
+  create   log in, create a route on a random future day
+  rush     log in, join the hot route (seat-capped) with a fresh phone number
+"""
+
+import argparse
+import http.client
+import json
+import math
+import os
+import random
+import shutil
+import sqlite3
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from collections import defaultdict
+from datetime import date, timedelta
+from urllib.parse import urlsplit
+
+from bench_indexes import SCHEMA, END_POINTS, TRANSPORT
+from migrations import migrate
+from passwords import legacy_sha256
+from slotseq import slot_label
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+DEFAULT_MIX = "browse=40,fanout=25,login=10,auth=5,create=10,rush=10"
+TIMES = [f"{h:02d}:{m:02d}" for h in range(5, 23) for m in (0, 30)]
+
+
+# ---------------- seeding ----------------
+def seed(path: str, days: int, routes_per_day: int, joins_per_route: int, users: int, rush_seats: int):
+    """Routes on the next `days` days, each with joins; route 1 (tomorrow) is the seat-capped hot route."""
+    conn = sqlite3.connect(path)
+    conn.execute("PRAGMA journal_mode=WAL")
+    conn.execute("PRAGMA synchronous=OFF")
+    for sql in SCHEMA:
+        conn.execute(sql)
+    conn.commit()
+    migrate(conn)
+    rnd = random.Random(7)
+    combos = [(e, t, tt) for e in END_POINTS for t in TIMES for tt in TRANSPORT]
+    today = date.today()
+    routes = []
+    for d in range(1, days + 1):
+        iso = (today + timedelta(days=d)).isoformat()
+        for e, t, tt in rnd.sample(combos, min(routes_per_day, len(combos))):
+            routes.append((iso, e, t, tt))
+    conn.executemany(
+        "INSERT INTO routes (slot_no, end_point, major_stops, time, transport_type, no_of_people, key_date) VALUES (?, ?, '', ?, ?, 0, ?)",
+        ((slot_label(i), e, t, tt, iso) for i, (iso, e, t, tt) in enumerate(routes, start=1)))
+    conn.execute("UPDATE routes SET seat_cap = ? WHERE id = 1", (rush_seats,))
+    conn.execute("INSERT INTO calendar (travel_date, route_id, link_id) SELECT key_date, id, NULL FROM routes ORDER BY id")
+    phone = 7000000000
+    for rid, (iso, e, _t, _tt) in enumerate(routes, start=1):
+        if rid == 1:
+            continue   # the rush starts empty
+        for _ in range(rnd.randint(0, joins_per_route)):
+            phone += 1
+            cur = conn.execute("INSERT INTO links (name, gender, drop_point, phone, course_year, branch) VALUES (?, ?, ?, ?, '2', 'CSE')",
+                               (f"Student {phone}", rnd.choice("MF"), e, str(phone)))
+            conn.execute("INSERT INTO calendar (travel_date, route_id, link_id) VALUES (?, ?, ?)", (iso, rid, cur.lastrowid))
+    conn.executemany("INSERT INTO users (name, email, password_hash, gender, pw_algo) VALUES (?, ?, ?, ?, 'sha256')",
+                     ((f"Student {i}", f"student{i}@vitstudent.ac.in", legacy_sha256(f"pass{i}"), "MF"[i % 2])
+                      for i in range(users)))
+    conn.commit()
+    # the sequence must start past the seeded slot numbers (migration v5 only ran on an empty table)
+    conn.execute("INSERT OR REPLACE INTO sequences (name, next) VALUES ('slot_no', ?)", (len(routes) + 1,))
+    conn.commit()
+    hot = conn.execute("SELECT id, key_date, end_point FROM routes WHERE id = 1").fetchone()
+    conn.close()
+    return {"routes": len(routes), "days": [(today + timedelta(days=d)).isoformat() for d in range(1, days + 1)],
+            "hot": hot, "users": users}
+
+
+def describe(path: str, users: int):
+    """Same facts as seed() for an existing database (--no-seed)."""
+    conn = sqlite3.connect(path)
+    days = [r[0] for r in conn.execute("SELECT DISTINCT travel_date FROM calendar WHERE travel_date > date('now') ORDER BY 1")]
+    hot = conn.execute("""SELECT r.id, cal.travel_date, r.end_point FROM routes r JOIN calendar cal ON cal.route_id = r.id
+                          WHERE cal.travel_date > date('now') ORDER BY r.seat_cap IS NULL, r.id LIMIT 1""").fetchone()
+    n = conn.execute("SELECT COUNT(*) FROM routes").fetchone()[0]
+    conn.close()
+    if not days or hot is None:
+        raise SystemExit("no future routes in the database; seed one first")
+    return {"routes": n, "days": days, "hot": hot, "users": users}
+
+
+# ---------------- server ----------------
+def start_server(kind: str, workdir: str, port: int, workers: int):
+    env = dict(os.environ, PYTHONPATH=HERE + os.pathsep + os.environ.get("PYTHONPATH", ""))
+    if kind == "gunicorn":
+        env.update(ROUTELINK_WORKERS=str(workers), ROUTELINK_LOGLEVEL="warning")
+        cmd = ["gunicorn", "-c", os.path.join(HERE, "gunicorn.conf.py"), "--chdir", workdir,
+               "-b", f"127.0.0.1:{port}", "--access-logfile", "/dev/null", "app:app"]
+    else:
+        code = ("import logging, app; logging.getLogger('werkzeug').setLevel(logging.ERROR); "
+                f"app.init_db(); app.app.run(host='127.0.0.1', port={port}, threaded=True)")
+        cmd = [sys.executable, "-c", code]
+    proc = subprocess.Popen(cmd, cwd=workdir, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.PIPE)
+    deadline = time.monotonic() + 30
+    while time.monotonic() < deadline:
+        if proc.poll() is not None:
+            raise SystemExit("server exited:\n" + proc.stderr.read().decode(errors="replace"))
+        try:
+            c = http.client.HTTPConnection("127.0.0.1", port, timeout=1)
+            c.request("GET", "/me")
+            c.getresponse().read()
+            return proc
+        except OSError:
+            time.sleep(0.2)
+    proc.kill()
+    raise SystemExit("server did not come up within 30 s")
+
+
+# ---------------- client ----------------
+class Stats:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.lat = defaultdict(list)
+        self.status = defaultdict(lambda: defaultdict(int))
+
+    def add(self, label, seconds, status):
+        with self._lock:
+            self.lat[label].append(seconds)
+            self.status[label][status] += 1
+
+
+class Student:
+    """One virtual user: a keep-alive connection plus its session cookie."""
+
+    def __init__(self, host, port, stats: Stats, timeout: float):
+        self.host, self.port, self.stats, self.timeout = host, port, stats, timeout
+        self.conn = None
+        self.cookie = None
+
+    def call(self, method, path, label, body=None):
+        headers = {"Connection": "keep-alive"}
+        if self.cookie:
+            headers["Cookie"] = self.cookie
+        data = None
+        if body is not None:
+            data = json.dumps(body).encode()
+            headers["Content-Type"] = "application/json"
+        t0 = time.perf_counter()
+        try:
+            if self.conn is None:
+                self.conn = http.client.HTTPConnection(self.host, self.port, timeout=self.timeout)
+            self.conn.request(method, path, body=data, headers=headers)
+            resp = self.conn.getresponse()
+            payload = resp.read()
+            status = resp.status
+            cookie = resp.getheader("Set-Cookie")
+            if cookie:
+                self.cookie = cookie.split(";", 1)[0]
+        except (OSError, http.client.HTTPException):
+            self.close()
+            payload, status = b"", "error"
+        self.stats.add(label, time.perf_counter() - t0, status)
+        if status != "error" and payload[:1] in (b"{", b"["):
+            try:
+                return status, json.loads(payload)
+            except ValueError:
+                pass
+        return status, None
+
+    def close(self):
+        if self.conn is not None:
+            self.conn.close()
+        self.conn = None
+
+
+class Scenarios:
+    def __init__(self, world, rnd: random.Random):
+        self.world, self.rnd = world, rnd
+        self.ids = iter(range(10 ** 9))
+
+    def _login_seeded(self, s: Student):
+        i = self.rnd.randrange(self.world["users"])
+        s.call("POST", "/login", "POST /login", {"email": f"student{i}@vitstudent.ac.in", "password": f"pass{i}"})
+
+    def auth(self, s: Student):
+        tag = f"{os.getpid()}x{threading.get_ident()}x{next(self.ids)}"
+        email, pw = f"load{tag}@vitstudent.ac.in", "secret-" + tag
+        s.call("POST", "/register", "POST /register", {"name": "Load " + tag, "email": email, "password": pw, "gender": "M"})
+        s.call("POST", "/login", "POST /login", {"email": email, "password": pw})
+
+    def login(self, s: Student):
+        self._login_seeded(s)
+
+    def browse(self, s: Student):
+        day = self.rnd.choice(self.world["days"])
+        s.call("GET", f"/calendar/month/{day[:7]}", "GET /calendar/month/<ym>")
+        month = [d for d in self.world["days"] if d[:7] == day[:7]]
+        for d in self.rnd.sample(month, min(len(month), self.rnd.randint(3, 8))):
+            s.call("GET", f"/calendar/{d}", "GET /calendar/<date>")
+
+    def fanout(self, s: Student):
+        day = self.rnd.choice(self.world["days"])
+        _, routes = s.call("GET", f"/calendar/{day}", "GET /calendar/<date>")
+        for r in routes or []:
+            s.call("GET", f"/route_count?date={day}&route_id={r['id']}", "GET /route_count")
+
+    def create(self, s: Student):
+        if not s.cookie:
+            self._login_seeded(s)
+        s.call("POST", "/routes", "POST /routes", {
+            "date": self.rnd.choice(self.world["days"]), "end_point": self.rnd.choice(END_POINTS),
+            "time": self.rnd.choice(TIMES), "transport_type": self.rnd.choice(TRANSPORT), "major_stops": ""})
+
+    def rush(self, s: Student):
+        if not s.cookie:
+            self._login_seeded(s)
+        rid, day, end_point = self.world["hot"]
+        phone = f"8{self.rnd.randrange(10 ** 9):09d}"
+        s.call("POST", f"/routes/{rid}/join", "POST /routes/<id>/join", {
+            "date": day, "name": "Rush " + phone, "gender": "F", "drop": end_point, "phone": phone,
+            "course_year": "2", "branch": "CSE"})
+
+
+def parse_mix(text: str):
+    mix = []
+    for part in text.split(","):
+        name, _, weight = part.partition("=")
+        name = name.strip()
+        if not hasattr(Scenarios, name) or name.startswith("_"):
+            raise SystemExit(f"unknown scenario {name!r}")
+        mix.append((name, float(weight or 1)))
+    return mix
+
+
+def run(host, port, world, mix, users, duration, think, timeout, seed_value):
+    stats = Stats()
+    stop = time.monotonic() + duration
+    names = [n for n, _ in mix]
+    weights = [w for _, w in mix]
+    done = defaultdict(int)
+    done_lock = threading.Lock()
+
+    def student(n):
+        rnd = random.Random(seed_value * 100003 + n)
+        plays = Scenarios(world, rnd)
+        s = Student(host, port, stats, timeout)
+        while time.monotonic() < stop:
+            name = rnd.choices(names, weights)[0]
+            getattr(plays, name)(s)
+            with done_lock:
+                done[name] += 1
+            if think:
+                time.sleep(rnd.expovariate(1.0 / think))
+        s.close()
+
+    threads = [threading.Thread(target=student, args=(n,), daemon=True) for n in range(users)]
+    t0 = time.monotonic()
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    return stats, time.monotonic() - t0, dict(done)
+
+
+# ---------------- report ----------------
+def percentile(sorted_values, q):
+    if not sorted_values:
+        return 0.0
+    # nearest rank
+    k = max(0, min(len(sorted_values) - 1, math.ceil(q / 100.0 * len(sorted_values)) - 1))
+    return sorted_values[k]
+
+
+def summarize(stats: Stats, elapsed: float):
+    rows = []
+    for label in sorted(stats.lat):
+        lat = sorted(stats.lat[label])
+        codes = stats.status[label]
+        n = len(lat)
+        client_err = sum(v for k, v in codes.items() if isinstance(k, int) and 400 <= k < 500)
+        errors = sum(v for k, v in codes.items() if k == "error" or (isinstance(k, int) and k >= 500))
+        rows.append({
+            "endpoint": label, "requests": n, "rps": n / elapsed if elapsed else 0.0,
+            "p50_ms": percentile(lat, 50) * 1000, "p95_ms": percentile(lat, 95) * 1000,
+            "p99_ms": percentile(lat, 99) * 1000, "max_ms": lat[-1] * 1000 if lat else 0.0,
+            "4xx": client_err, "errors": errors, "error_rate": errors / n if n else 0.0,
+            "status": {str(k): v for k, v in sorted(codes.items(), key=lambda kv: str(kv[0]))},
+        })
+    return rows
+
+
+def print_report(rows, elapsed, done, users):
+    total = sum(r["requests"] for r in rows)
+    errors = sum(r["errors"] for r in rows)
+    print(f"\n{users} users, {elapsed:.1f} s, {total} requests, {total / elapsed:.1f} req/s, "
+          f"{errors} errors ({(errors / total * 100) if total else 0:.2f} %)")
+    print("scenarios played: " + ", ".join(f"{k}={v}" for k, v in sorted(done.items())))
+    head = f"{'endpoint':<28}{'reqs':>8}{'req/s':>9}{'p50 ms':>9}{'p95 ms':>9}{'p99 ms':>9}{'max ms':>9}{'4xx':>7}{'errors':>8}"
+    print(head)
+    print("-" * len(head))
+    for r in rows:
+        print(f"{r['endpoint']:<28}{r['requests']:>8}{r['rps']:>9.1f}{r['p50_ms']:>9.1f}{r['p95_ms']:>9.1f}"
+              f"{r['p99_ms']:>9.1f}{r['max_ms']:>9.1f}{r['4xx']:>7}{r['errors']:>8}")
+
+
+def main():
+    ap = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    ap.add_argument("--url", help="target a running instance instead of starting one")
+    ap.add_argument("--server", choices=["dev", "gunicorn"], default="dev")
+    ap.add_argument("--workers", type=int, default=os.cpu_count() or 2, help="gunicorn workers")
+    ap.add_argument("--port", type=int, default=5077)
+    ap.add_argument("--db", help="SQLite file to seed/use (default: a temp dir)")
+    ap.add_argument("--no-seed", action="store_true", help="use --db as it is")
+    ap.add_argument("--users", type=int, default=50)
+    ap.add_argument("--duration", type=float, default=30)
+    ap.add_argument("--think", type=float, default=0.0, help="mean pause between scenarios, seconds")
+    ap.add_argument("--timeout", type=float, default=30)
+    ap.add_argument("--mix", default=DEFAULT_MIX, help="scenario=weight,... (default: %(default)s)")
+    ap.add_argument("--days", type=int, default=45)
+    ap.add_argument("--routes-per-day", type=int, default=20)
+    ap.add_argument("--joins-per-route", type=int, default=12)
+    ap.add_argument("--seed-users", type=int, default=500)
+    ap.add_argument("--rush-seats", type=int, default=40)
+    ap.add_argument("--seed", type=int, default=1, help="random seed for the students")
+    ap.add_argument("--json", help="also write the report to this file")
+    args = ap.parse_args()
+    mix = parse_mix(args.mix)
+
+    workdir = None
+    if args.db:
+        db_path = os.path.abspath(args.db)
+    else:
+        workdir = tempfile.mkdtemp(prefix="routelink-load-")
+        db_path = os.path.join(workdir, "routelink.db")   # app.py opens ./routelink.db
+    if args.no_seed:
+        world = describe(db_path, args.seed_users)
+    else:
+        if os.path.exists(db_path):
+            raise SystemExit(f"{db_path} exists; pass --no-seed to use it or choose another --db")
+        t0 = time.monotonic()
+        world = seed(db_path, args.days, args.routes_per_day, args.joins_per_route, args.seed_users, args.rush_seats)
+        print(f"seeded {world['routes']} routes over {args.days} days in {time.monotonic() - t0:.1f} s ({db_path})")
+
+    proc = None
+    try:
+        if args.url:
+            u = urlsplit(args.url)
+            host, port = u.hostname, u.port or 80
+        else:
+            if os.path.basename(db_path) != "routelink.db":
+                raise SystemExit("app.py serves ./routelink.db; name the --db file routelink.db")
+            host, port = "127.0.0.1", args.port
+            proc = start_server(args.server, os.path.dirname(db_path), port, args.workers)
+        print(f"running {args.users} users for {args.duration:.0f} s against {host}:{port} ({args.mix})")
+        stats, elapsed, done = run(host, port, world, mix, args.users, args.duration, args.think, args.timeout, args.seed)
+    finally:
+        if proc is not None:
+            proc.terminate()
+            try:
+                proc.wait(timeout=10)
+            except subprocess.TimeoutExpired:
+                proc.kill()
+    rows = summarize(stats, elapsed)
+    print_report(rows, elapsed, done, args.users)
+    conn = sqlite3.connect(db_path)
+    hot_id, hot_day, _ = world["hot"]
+    joined = conn.execute("SELECT COUNT(*) FROM calendar WHERE route_id=? AND travel_date=? AND link_id IS NOT NULL",
+                          (hot_id, hot_day)).fetchone()[0]
+    cap = conn.execute("SELECT seat_cap FROM routes WHERE id=?", (hot_id,)).fetchone()[0]
+    conn.close()
+    print(f"hot route {hot_id}: {joined} joined, seat_cap {cap}")
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump({"users": args.users, "elapsed_s": elapsed, "mix": args.mix, "scenarios": done,
+                       "endpoints": rows, "hot_route": {"id": hot_id, "joined": joined, "seat_cap": cap}}, f, indent=2)
+    if workdir:
+        shutil.rmtree(workdir, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,259 @@
+# metrics.py
+"""
+In-process request and SQL metrics, rendered in Prometheus text format.
+
+    REGISTRY.render()        # body for GET /metrics
+
+app.py times every request in before_request/teardown_request and counts the
+exceptions its handlers turn into fallback responses. Its pooled connections
+are TimedConnection objects (dbpool.py `factory`). These time every
+execute()/executemany()/executescript(), on the connection or on one of its
+cursors, and every commit(). The time is added to the process totals and to the current thread's
+request, so each request also records how many statements it ran and for how
+long. Statement time is the execute() call: for a SELECT that is planning plus
+the first row; later fetches are not included.
+
+Everything is in-process: an observation is a dict lookup plus a few adds
+under one lock. With several gunicorn workers every worker has its own
+numbers, and a scrape sees the worker that answered it.
+"""
+
+import bisect
+import sqlite3
+import threading
+import time
+from typing import Callable, Dict, Iterable, List, Sequence, Tuple
+
+LATENCY_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+SQL_COUNT_BUCKETS = (0, 1, 2, 3, 5, 10, 20, 50, 100)
+
+
+def _escape(v) -> str:
+    return str(v).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _labels(names: Sequence[str], values: Sequence, extra: str = "") -> str:
+    parts = [f'{n}="{_escape(v)}"' for n, v in zip(names, values)]
+    if extra:
+        parts.append(extra)
+    return "{" + ",".join(parts) + "}" if parts else ""
+
+
+def _num(v: float) -> str:
+    if v == float("inf"):
+        return "+Inf"
+    return repr(float(v)) if isinstance(v, float) and not v.is_integer() else str(int(v))
+
+
+class Counter:
+    kind = "counter"
+
+    def __init__(self, name: str, help_text: str, labelnames: Sequence[str] = ()):
+        self.name, self.help, self.labelnames = name, help_text, tuple(labelnames)
+        self._values: Dict[tuple, float] = {}
+        self._lock = threading.Lock()
+
+    def inc(self, *labels, amount: float = 1.0):
+        with self._lock:
+            self._values[labels] = self._values.get(labels, 0.0) + amount
+
+    def samples(self) -> Iterable[str]:
+        with self._lock:
+            items = sorted(self._values.items())
+        for labels, v in items:
+            yield f"{self.name}{_labels(self.labelnames, labels)} {_num(v)}"
+
+
+class Histogram:
+    kind = "histogram"
+
+    def __init__(self, name: str, help_text: str, labelnames: Sequence[str] = (), buckets: Sequence[float] = LATENCY_BUCKETS):
+        self.name, self.help, self.labelnames = name, help_text, tuple(labelnames)
+        self.buckets = tuple(sorted(buckets))
+        self._data: Dict[tuple, list] = {}     # labels -> [per-bucket counts..., +Inf count, sum]
+        self._lock = threading.Lock()
+
+    def observe(self, value: float, *labels):
+        i = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            d = self._data.get(labels)
+            if d is None:
+                d = self._data[labels] = [0] * (len(self.buckets) + 1) + [0.0]
+            d[i] += 1
+            d[-1] += value
+
+    def samples(self) -> Iterable[str]:
+        with self._lock:
+            items = sorted((k, list(v)) for k, v in self._data.items())
+        for labels, d in items:
+            running = 0
+            for bound, n in zip(self.buckets + (float("inf"),), d[:-1]):
+                running += n
+                le = 'le="%s"' % _num(bound)
+                yield f"{self.name}_bucket{_labels(self.labelnames, labels, le)} {running}"
+            yield f"{self.name}_sum{_labels(self.labelnames, labels)} {_num(d[-1])}"
+            yield f"{self.name}_count{_labels(self.labelnames, labels)} {running}"
+
+
+class Gauge:
+    """Read at scrape time from a callback returning a number."""
+    kind = "gauge"
+
+    def __init__(self, name: str, help_text: str, fn: Callable[[], float]):
+        self.name, self.help, self.labelnames, self.fn = name, help_text, (), fn
+
+    def samples(self) -> Iterable[str]:
+        try:
+            yield f"{self.name} {_num(self.fn())}"
+        except Exception:
+            return
+
+
+class Registry:
+    def __init__(self):
+        self._metrics: List = []
+
+    def add(self, metric):
+        self._metrics.append(metric)
+        return metric
+
+    def counter(self, name, help_text, labelnames=()) -> Counter:
+        return self.add(Counter(name, help_text, labelnames))
+
+    def histogram(self, name, help_text, labelnames=(), buckets=LATENCY_BUCKETS) -> Histogram:
+        return self.add(Histogram(name, help_text, labelnames, buckets))
+
+    def gauge(self, name, help_text, fn) -> Gauge:
+        return self.add(Gauge(name, help_text, fn))
+
+    def render(self) -> str:
+        out = []
+        for m in self._metrics:
+            out.append(f"# HELP {m.name} {m.help}")
+            out.append(f"# TYPE {m.name} {m.kind}")
+            out.extend(m.samples())
+        return "\n".join(out) + "\n"
+
+
+REGISTRY = Registry()
+
+SQL_STATEMENTS = REGISTRY.counter("routelink_sql_statements_total", "SQL statements executed", ("op",))
+SQL_SECONDS = REGISTRY.counter("routelink_sql_seconds_total", "Time spent in execute(), seconds", ("op",))
+SQL_ERRORS = REGISTRY.counter("routelink_sql_errors_total", "Statements that raised", ("op", "error"))
+
+# ---------------- per-request SQL accounting ----------------
+_current = threading.local()
+
+
+def begin_request():
+    _current.statements = 0
+    _current.seconds = 0.0
+
+
+def end_request() -> Tuple[int, float]:
+    """(statements, seconds) since begin_request() on this thread."""
+    n, s = getattr(_current, "statements", 0), getattr(_current, "seconds", 0.0)
+    _current.statements, _current.seconds = 0, 0.0
+    return n, s
+
+
+_OPS = ("SELECT", "INSERT", "UPDATE", "DELETE", "BEGIN", "COMMIT", "ROLLBACK", "WITH", "PRAGMA", "CREATE")
+
+
+def _op(sql: str) -> str:
+    head = sql.lstrip()[:8].upper()
+    for op in _OPS:
+        if head.startswith(op):
+            return op
+    return "OTHER"
+
+
+def _record(sql, started, exc=None):
+    dt = time.perf_counter() - started
+    op = _op(sql)
+    SQL_STATEMENTS.inc(op)
+    SQL_SECONDS.inc(op, amount=dt)
+    if exc is not None:
+        SQL_ERRORS.inc(op, type(exc).__name__)
+    _current.statements = getattr(_current, "statements", 0) + 1
+    _current.seconds = getattr(_current, "seconds", 0.0) + dt
+
+
+class TimedCursor(sqlite3.Cursor):
+    def execute(self, sql, parameters=()):
+        t0 = time.perf_counter()
+        try:
+            result = super().execute(sql, parameters)
+        except Exception as e:
+            _record(sql, t0, e)
+            raise
+        _record(sql, t0)
+        return result
+
+    def executemany(self, sql, seq_of_parameters):
+        t0 = time.perf_counter()
+        try:
+            result = super().executemany(sql, seq_of_parameters)
+        except Exception as e:
+            _record(sql, t0, e)
+            raise
+        _record(sql, t0)
+        return result
+
+    def executescript(self, script):
+        t0 = time.perf_counter()
+        try:
+            result = super().executescript(script)
+        except Exception as e:
+            _record(script, t0, e)
+            raise
+        _record(script, t0)
+        return result
+
+
+class TimedConnection(sqlite3.Connection):
+    """Connection whose statements are counted and timed (pass as the pool's `factory`)."""
+
+    def cursor(self, factory=TimedCursor):
+        return super().cursor(factory)
+
+    # Connection.execute() does not go through cursor(), so it is timed here as well
+    def execute(self, sql, parameters=()):
+        t0 = time.perf_counter()
+        try:
+            result = super().execute(sql, parameters)
+        except Exception as e:
+            _record(sql, t0, e)
+            raise
+        _record(sql, t0)
+        return result
+
+    def executemany(self, sql, seq_of_parameters):
+        t0 = time.perf_counter()
+        try:
+            result = super().executemany(sql, seq_of_parameters)
+        except Exception as e:
+            _record(sql, t0, e)
+            raise
+        _record(sql, t0)
+        return result
+
+    def executescript(self, script):
+        t0 = time.perf_counter()
+        try:
+            result = super().executescript(script)
+        except Exception as e:
+            _record(script, t0, e)
+            raise
+        _record(script, t0)
+        return result
+
+    def commit(self):
+        # where a write actually waits on the disk
+        t0 = time.perf_counter()
+        try:
+            super().commit()
+        except Exception as e:
+            _record("COMMIT", t0, e)
+            raise
+        _record("COMMIT", t0)
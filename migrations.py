@@ -0,0 +1,243 @@
+# migrations.py
+"""
+Versioned schema migrations for routelink.db.
+
+The schema version lives in SQLite's `PRAGMA user_version`. Each entry in
+MIGRATIONS runs once, inside its own transaction, and bumps the version when it
+succeeds. Both app.py and the Tkinter client call `migrate()` from their
+init_db() right after the base CREATE TABLE statements.
+
+To change the schema, append a new (version, description, function) tuple;
+never edit a migration that has already shipped.
+"""
+
+import sqlite3
+from typing import Callable, List, Optional, Tuple
+
+
+def _columns(conn: sqlite3.Connection, table: str) -> List[str]:
+    return [r[1] for r in conn.execute(f"PRAGMA table_info({table})").fetchall()]
+
+
+def add_column(conn: sqlite3.Connection, table: str, column: str, col_type: str, default: Optional[str] = None):
+    """ALTER TABLE ADD COLUMN unless the column is already there (older DBs were patched ad hoc)."""
+    if column in _columns(conn, table):
+        return
+    sql = f"ALTER TABLE {table} ADD COLUMN {column} {col_type}"
+    if default is not None:
+        sql += f" DEFAULT {default}"
+    conn.execute(sql)
+
+
+# ---------------- migrations ----------------
+def _m1_gender_columns(conn):
+    # users.gender / links.gender: 'M', 'F' or NULL
+    add_column(conn, "users", "gender", "TEXT")
+    add_column(conn, "links", "gender", "TEXT")
+
+
+def _m2_lookup_indexes(conn):
+    # per-date route listing, /route_count and the duplicate-join check seek on (travel_date, route_id);
+    # link_id is included so the counts are answered from the index alone
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_calendar_date_route_link ON calendar(travel_date, route_id, link_id)")
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_links_phone ON links(phone)")
+    # normalized end point key; matches the LOWER(r.end_point)=LOWER(?) duplicate-route check
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_routes_end_point_norm ON routes(LOWER(end_point))")
+    conn.execute("ANALYZE")
+
+
+def _bump(keys_sql: str) -> str:
+    """Trigger body statements bumping data_versions for every key produced by `keys_sql`."""
+    return f"""
+        INSERT OR IGNORE INTO data_versions (key, n, ts) SELECT k, 0, 0 FROM ({keys_sql});
+        UPDATE data_versions SET n = n + 1, ts = CAST(strftime('%s','now') AS INTEGER)
+         WHERE key IN (SELECT k FROM ({keys_sql}));"""
+
+
+# Only columns the calendar views return bump a day's version. Bookkeeping columns (no_of_people and the
+# like) are rewritten by triggers and backfills; a catch-all UPDATE trigger would turn each of those row
+# writes into a calendar scan plus data_versions writes.
+ROUTE_VERSION_COLUMNS = "slot_no, end_point, major_stops, time, transport_type"
+CALENDAR_VERSION_COLUMNS = "travel_date, route_id, link_id"
+
+
+def _m3_data_versions(conn):
+    # Change counters for conditional GETs (ETag / Last-Modified). Maintained by triggers so that
+    # every writer -- any web worker, the desktop client, ad-hoc scripts -- bumps them.
+    conn.execute("""CREATE TABLE IF NOT EXISTS data_versions (
+                        key TEXT PRIMARY KEY, n INTEGER NOT NULL DEFAULT 0, ts INTEGER
+                    ) WITHOUT ROWID""")
+    def day_keys(ref):
+        return f"SELECT 'date:' || {ref}.travel_date AS k UNION SELECT 'month:' || substr({ref}.travel_date, 1, 7)"
+    conn.execute(f"CREATE TRIGGER IF NOT EXISTS trg_calendar_ins_version AFTER INSERT ON calendar BEGIN {_bump(day_keys('NEW'))} END")
+    conn.execute(f"CREATE TRIGGER IF NOT EXISTS trg_calendar_del_version AFTER DELETE ON calendar BEGIN {_bump(day_keys('OLD'))} END")
+    conn.execute(f"""CREATE TRIGGER IF NOT EXISTS trg_calendar_upd_version AFTER UPDATE OF {CALENDAR_VERSION_COLUMNS} ON calendar
+                     BEGIN {_bump(day_keys('OLD') + ' UNION ' + day_keys('NEW'))} END""")
+    route_days = ("SELECT 'date:' || travel_date AS k FROM calendar WHERE route_id = NEW.id "
+                  "UNION SELECT 'month:' || substr(travel_date, 1, 7) FROM calendar WHERE route_id = NEW.id")
+    conn.execute(f"""CREATE TRIGGER IF NOT EXISTS trg_routes_upd_version AFTER UPDATE OF {ROUTE_VERSION_COLUMNS} ON routes
+                     BEGIN {_bump(route_days)} END""")
+    for op in ("INSERT", "UPDATE", "DELETE"):
+        conn.execute(f"""CREATE TRIGGER IF NOT EXISTS trg_links_{op.lower()}_version AFTER {op} ON links BEGIN
+                            {_bump("SELECT 'links' AS k")} END""")
+
+
+GENDER_NORM_SQL = """CASE UPPER(TRIM(COALESCE({col}, '')))
+                         WHEN 'M' THEN 'M' WHEN 'MALE' THEN 'M'
+                         WHEN 'F' THEN 'F' WHEN 'FEMALE' THEN 'F' END"""
+
+
+def _m4_links_filters(conn):
+    # links.gender holds whatever the client sent ('m', 'Male', ' F', NULL); gender_norm is 'M' / 'F' / NULL,
+    # kept in step by triggers so the desktop client and old code paths need not know about it
+    add_column(conn, "links", "gender_norm", "TEXT")
+    conn.execute(f"UPDATE links SET gender_norm = {GENDER_NORM_SQL.format(col='gender')}")
+    conn.execute(f"""CREATE TRIGGER IF NOT EXISTS trg_links_gender_norm_ins AFTER INSERT ON links BEGIN
+                        UPDATE links SET gender_norm = {GENDER_NORM_SQL.format(col='NEW.gender')} WHERE id = NEW.id; END""")
+    conn.execute(f"""CREATE TRIGGER IF NOT EXISTS trg_links_gender_norm_upd AFTER UPDATE OF gender ON links BEGIN
+                        UPDATE links SET gender_norm = {GENDER_NORM_SQL.format(col='NEW.gender')} WHERE id = NEW.id; END""")
+    # /links filters page newest-first on id: (filter, id) lets each one seek and walk in order
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_links_gender_norm_id ON links(gender_norm, id)")
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_links_branch_id ON links(branch COLLATE NOCASE, id)")
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_links_course_year_id ON links(course_year COLLATE NOCASE, id)")
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_links_drop_point_id ON links(drop_point COLLATE NOCASE, id)")
+    # date-range filter: EXISTS(calendar row for this link in range) answered from the index alone
+    # (also serves DELETE FROM calendar WHERE link_id=? and the links -> calendar join)
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_calendar_link_date ON calendar(link_id, travel_date)")
+    conn.execute("ANALYZE")
+
+
+def _m5_sequences(conn):
+    # block-allocated counters (slotseq.py); slot_no continues after the highest number already handed out,
+    # which used to be MAX(routes.id) + 1 rendered as SL + base36
+    conn.execute("CREATE TABLE IF NOT EXISTS sequences (name TEXT PRIMARY KEY, next INTEGER NOT NULL) WITHOUT ROWID")
+    top = conn.execute("SELECT COALESCE(MAX(id), 0) FROM routes").fetchone()[0]
+    for (slot,) in conn.execute("SELECT slot_no FROM routes WHERE slot_no LIKE 'SL%'").fetchall():
+        try:
+            top = max(top, int(slot[2:], 36))
+        except (TypeError, ValueError):
+            pass
+    conn.execute("INSERT OR IGNORE INTO sequences (name, next) VALUES ('slot_no', ?)", (top + 1,))
+
+
+ROUTE_KEY_SQL = """end_point_key = LOWER(TRIM(COALESCE({r}.end_point, ''))),
+                   time_key = TRIM(COALESCE({r}.time, '')),
+                   transport_key = LOWER(TRIM(COALESCE({r}.transport_type, '')))"""
+
+
+def _m6_route_keys(conn):
+    # "same date + end point + time + transport" as normalized columns under a UNIQUE index, replacing the
+    # LOWER()/COALESCE() scan that every creator ran before inserting. key_date is the route's own date
+    # (the placeholder calendar row); it is not called travel_date so unqualified calendar joins stay unambiguous.
+    for col in ("key_date", "end_point_key", "time_key", "transport_key"):
+        add_column(conn, "routes", col, "TEXT")
+    # the per-route MIN(travel_date) below (and the route version trigger) seek on route_id
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_calendar_route_date ON calendar(route_id, travel_date)")
+    conn.execute("""UPDATE routes SET key_date = (SELECT MIN(cal.travel_date) FROM calendar cal WHERE cal.route_id = routes.id)
+                    WHERE key_date IS NULL""")
+    conn.execute(f"UPDATE routes SET {ROUTE_KEY_SQL.format(r='routes')}")
+    # duplicates created before the constraint: the oldest keeps the key, the rest stay out of the index
+    conn.execute("""UPDATE routes SET key_date = NULL
+                    WHERE key_date IS NOT NULL AND id NOT IN (
+                        SELECT MIN(id) FROM routes WHERE key_date IS NOT NULL
+                        GROUP BY key_date, end_point_key, time_key, transport_key)""")
+    conn.execute("""CREATE UNIQUE INDEX IF NOT EXISTS uq_routes_day_key
+                    ON routes(key_date, end_point_key, time_key, transport_key) WHERE key_date IS NOT NULL""")
+    # keep the keys current for every writer (desktop client, app2/app3, ad-hoc scripts)
+    conn.execute(f"""CREATE TRIGGER IF NOT EXISTS trg_routes_key_ins AFTER INSERT ON routes BEGIN
+                        UPDATE routes SET {ROUTE_KEY_SQL.format(r='NEW')} WHERE id = NEW.id; END""")
+    conn.execute(f"""CREATE TRIGGER IF NOT EXISTS trg_routes_key_upd AFTER UPDATE OF end_point, time, transport_type ON routes BEGIN
+                        UPDATE routes SET {ROUTE_KEY_SQL.format(r='NEW')} WHERE id = NEW.id; END""")
+    # writers that do not set key_date get it from the route's placeholder calendar row
+    conn.execute("""CREATE TRIGGER IF NOT EXISTS trg_calendar_route_key_date AFTER INSERT ON calendar
+                    WHEN NEW.link_id IS NULL BEGIN
+                        UPDATE routes SET key_date = NEW.travel_date WHERE id = NEW.route_id AND key_date IS NULL; END""")
+
+
+def _m7_join_constraints(conn):
+    # one join per phone per route per day: calendar.join_phone mirrors links.phone for join rows
+    # (link_id NOT NULL) so the rule can be a UNIQUE index instead of a links JOIN calendar lookup
+    add_column(conn, "calendar", "join_phone", "TEXT")
+    conn.execute("""UPDATE calendar SET join_phone = (SELECT l.phone FROM links l WHERE l.id = calendar.link_id)
+                    WHERE link_id IS NOT NULL""")
+    # joins made twice before the constraint: the first keeps the key
+    conn.execute("""UPDATE calendar SET join_phone = NULL
+                    WHERE join_phone IS NOT NULL AND id NOT IN (
+                        SELECT MIN(id) FROM calendar WHERE join_phone IS NOT NULL
+                        GROUP BY travel_date, route_id, join_phone)""")
+    conn.execute("""CREATE UNIQUE INDEX IF NOT EXISTS uq_calendar_join_phone
+                    ON calendar(travel_date, route_id, join_phone) WHERE join_phone IS NOT NULL""")
+
+    # seats: routes.no_of_people becomes the live join count, routes.seat_cap an optional limit (NULL = no limit).
+    # Both are maintained/checked by triggers inside the writer's own transaction, so concurrent joins
+    # serialize on the write lock and can neither overshoot nor drift.
+    add_column(conn, "routes", "seat_cap", "INTEGER")
+    conn.execute("""UPDATE routes SET no_of_people =
+                        (SELECT COUNT(*) FROM calendar cal WHERE cal.route_id = routes.id AND cal.link_id IS NOT NULL)""")
+
+    # triggers only after the backfills, so those run as plain bulk UPDATEs
+    conn.execute("""CREATE TRIGGER IF NOT EXISTS trg_calendar_join_phone AFTER INSERT ON calendar
+                    WHEN NEW.link_id IS NOT NULL BEGIN
+                        UPDATE calendar SET join_phone = (SELECT phone FROM links WHERE id = NEW.link_id) WHERE id = NEW.id; END""")
+    conn.execute("""CREATE TRIGGER IF NOT EXISTS trg_links_phone_join_phone AFTER UPDATE OF phone ON links BEGIN
+                        UPDATE calendar SET join_phone = NEW.phone WHERE link_id = NEW.id; END""")
+    conn.execute("""CREATE TRIGGER IF NOT EXISTS trg_calendar_seat_check BEFORE INSERT ON calendar
+                    WHEN NEW.link_id IS NOT NULL BEGIN
+                        SELECT RAISE(ABORT, 'route full') FROM routes
+                         WHERE id = NEW.route_id AND seat_cap IS NOT NULL AND COALESCE(no_of_people, 0) >= seat_cap; END""")
+    conn.execute("""CREATE TRIGGER IF NOT EXISTS trg_calendar_seat_ins AFTER INSERT ON calendar
+                    WHEN NEW.link_id IS NOT NULL BEGIN
+                        UPDATE routes SET no_of_people = COALESCE(no_of_people, 0) + 1 WHERE id = NEW.route_id; END""")
+    conn.execute("""CREATE TRIGGER IF NOT EXISTS trg_calendar_seat_del AFTER DELETE ON calendar
+                    WHEN OLD.link_id IS NOT NULL BEGIN
+                        UPDATE routes SET no_of_people = MAX(COALESCE(no_of_people, 0) - 1, 0) WHERE id = OLD.route_id; END""")
+
+
+def _m8_password_algo(conn):
+    # per-user hash algorithm and KDF parameters (passwords.py); everything stored so far is plain SHA-256
+    add_column(conn, "users", "pw_algo", "TEXT")
+    add_column(conn, "users", "pw_params", "TEXT")
+    conn.execute("UPDATE users SET pw_algo = 'sha256' WHERE pw_algo IS NULL")
+
+
+MIGRATIONS: List[Tuple[int, str, Callable[[sqlite3.Connection], None]]] = [
+    (1, "gender columns on users and links", _m1_gender_columns),
+    (2, "lookup indexes on calendar, links and routes", _m2_lookup_indexes),
+    (3, "data_versions change counters for conditional GETs", _m3_data_versions),
+    (4, "links.gender_norm and /links filter indexes", _m4_links_filters),
+    (5, "sequences table for slot numbers", _m5_sequences),
+    (6, "normalized route keys with a per-day UNIQUE index", _m6_route_keys),
+    (7, "unique join per phone/route/day and seat counting", _m7_join_constraints),
+    (8, "per-user password algorithm and parameters", _m8_password_algo),
+]
+
+
+def schema_version(conn: sqlite3.Connection) -> int:
+    return int(conn.execute("PRAGMA user_version").fetchone()[0])
+
+
+def migrate(conn: sqlite3.Connection, target: Optional[int] = None) -> List[int]:
+    """
+    Apply every pending migration up to `target` (default: latest).
+    Returns the list of versions that were applied.
+    """
+    current = schema_version(conn)
+    applied = []
+    conn.commit()
+    for version, _desc, fn in MIGRATIONS:
+        if version <= current or (target is not None and version > target):
+            continue
+        try:
+            conn.execute("BEGIN IMMEDIATE")
+            # another process (web worker / desktop client) may have migrated meanwhile
+            if schema_version(conn) >= version:
+                conn.rollback()
+                continue
+            fn(conn)
+            conn.execute(f"PRAGMA user_version = {int(version)}")
+            conn.commit()
+        except Exception:
+            conn.rollback()
+            raise
+        applied.append(version)
+    return applied
@@ -0,0 +1,159 @@
+# passwords.py
+"""
+Password hashing that stays off the request thread.
+
+New hashes use scrypt (hashlib, memory-hard). The KDF runs in a small process
+pool, so a login rush uses a few cores instead of the web server's request
+threads, and the number of hashes in flight is capped. Once the cap is reached,
+hash()/verify() raise HasherBusy immediately instead of queueing; the web apps
+answer it with hasher_busy() (503 with Retry-After).
+
+Each user row stores its algorithm and parameters (users.pw_algo,
+users.pw_params; migrations.py v8). Legacy rows are plain unsalted SHA-256
+(pw_algo 'sha256' or NULL). They are still accepted, and needs_rehash() tells
+the caller to store a fresh scrypt hash after the next successful login. The
+same applies once SCRYPT_PARAMS is raised.
+
+    HASHER = PasswordHasher()
+    stored, algo, params = HASHER.hash(pw)
+    ok = HASHER.verify(pw, row["password_hash"], row["pw_algo"], row["pw_params"])
+
+password_hash for scrypt is "<salt hex>$<key hex>".
+"""
+
+import hashlib
+import hmac
+import json
+import os
+import threading
+from concurrent.futures import ProcessPoolExecutor, TimeoutError as FutureTimeout
+from typing import Optional, Tuple
+
+# ~16 MiB and roughly 50 ms per hash on one core
+SCRYPT_PARAMS = {"n": 2 ** 14, "r": 8, "p": 1, "dklen": 32}
+SALT_BYTES = 16
+
+
+class HasherBusy(RuntimeError):
+    """Too many hashes in flight; retry shortly."""
+
+
+def hasher_busy():
+    """The web apps' answer to HasherBusy: 503 + Retry-After."""
+    from flask import jsonify   # imported here: the Tk clients use this module without Flask
+    resp = jsonify({"error": "Server busy, please retry"})
+    resp.status_code = 503
+    resp.headers["Retry-After"] = "1"
+    return resp
+
+
+def legacy_sha256(password: str) -> str:
+    return hashlib.sha256(password.encode()).hexdigest()
+
+
+def _scrypt(password: str, salt: bytes, n: int, r: int, p: int, dklen: int) -> bytes:
+    # runs in a pool process
+    return hashlib.scrypt(password.encode(), salt=salt, n=n, r=r, p=p, dklen=dklen,
+                          maxmem=256 * n * r + (1 << 20))
+
+
+class PasswordHasher:
+    def __init__(self, workers: Optional[int] = None, max_in_flight: Optional[int] = None,
+                 timeout: float = 10.0, params: Optional[dict] = None):
+        self.workers = workers or max(1, min(4, (os.cpu_count() or 2) // 2))
+        self.max_in_flight = max_in_flight or self.workers * 8
+        self.timeout = timeout
+        self.params = dict(params or SCRYPT_PARAMS)
+        self._lock = threading.Lock()
+        self._pool = None
+        self._pid = os.getpid()
+        self._slots = threading.BoundedSemaphore(self.max_in_flight)
+
+    def _executor(self) -> ProcessPoolExecutor:
+        with self._lock:
+            if self._pid != os.getpid():
+                # forked web worker: the parent's pool and in-flight count are not ours
+                self._pid = os.getpid()
+                self._pool = None
+                self._slots = threading.BoundedSemaphore(self.max_in_flight)
+            if self._pool is None:
+                self._pool = ProcessPoolExecutor(max_workers=self.workers)
+            return self._pool
+
+    def _run(self, fn, *args):
+        pool = self._executor()
+        slots = self._slots
+        if not slots.acquire(blocking=False):
+            raise HasherBusy("password hashing queue is full")
+        try:
+            fut = pool.submit(fn, *args)
+        except Exception:
+            slots.release()
+            raise
+        # the slot is held until the hash is actually done, even if the caller timed out
+        fut.add_done_callback(lambda _f: slots.release())
+        try:
+            return fut.result(timeout=self.timeout)
+        except FutureTimeout:   # not the builtin TimeoutError before Python 3.11
+            raise HasherBusy("password hashing timed out")
+
+    def in_flight(self) -> int:
+        return self.max_in_flight - self._slots._value
+
+    def hash(self, password: str) -> Tuple[str, str, str]:
+        """(password_hash, pw_algo, pw_params) for a new password."""
+        salt = os.urandom(SALT_BYTES)
+        p = self.params
+        key = self._run(_scrypt, password, salt, p["n"], p["r"], p["p"], p["dklen"])
+        return f"{salt.hex()}${key.hex()}", "scrypt", json.dumps(p, sort_keys=True)
+
+    def verify(self, password: str, stored: Optional[str], algo: Optional[str], params: Optional[str]) -> bool:
+        if not stored:
+            return False
+        algo = algo or "sha256"
+        if algo == "sha256":
+            return hmac.compare_digest(stored, legacy_sha256(password))
+        if algo != "scrypt":
+            return False
+        try:
+            p = json.loads(params or "{}")
+            salt_hex, _, key_hex = stored.partition("$")
+            salt = bytes.fromhex(salt_hex)
+            args = (int(p["n"]), int(p["r"]), int(p["p"]), int(p["dklen"]))
+        except (ValueError, KeyError, TypeError):
+            return False
+        key = self._run(_scrypt, password, salt, *args)
+        return hmac.compare_digest(key.hex(), key_hex)
+
+    def needs_rehash(self, algo: Optional[str], params: Optional[str]) -> bool:
+        if algo != "scrypt":
+            return True
+        try:
+            return json.loads(params or "{}") != self.params
+        except ValueError:
+            return True
+
+    def shutdown(self):
+        with self._lock:
+            if self._pool is not None and self._pid == os.getpid():
+                self._pool.shutdown(wait=False, cancel_futures=True)
+            self._pool = None
+
+
+def upgrade_stored_hash(conn, hasher: PasswordHasher, user_id: int, password: str,
+                        stored: str, algo: Optional[str], params: Optional[str]) -> bool:
+    """
+    After a successful login: replace a legacy/outdated hash with a current one. Best effort -- a busy
+    hasher just means the upgrade happens on a later login. Returns True if the row was updated.
+    """
+    if not hasher.needs_rehash(algo, params):
+        return False
+    try:
+        new_hash, new_algo, new_params = hasher.hash(password)
+    except HasherBusy:
+        return False
+    # guarded by the old hash: a password change that raced this login wins
+    cur = conn.execute("UPDATE users SET password_hash=?, pw_algo=?, pw_params=? WHERE id=? AND password_hash=?",
+                       (new_hash, new_algo, new_params, user_id, stored))
+    conn.commit()
+    return cur.rowcount == 1
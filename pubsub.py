@@ -0,0 +1,142 @@
+# pubsub.py
+"""
+In-process publish/subscribe hub used for live updates (SSE counters, chat delivery).
+
+Topics are plain strings ("date:2025-10-20", "conv:12", ...). Every subscriber
+gets its own bounded queue; publish() never blocks -- if a subscriber has fallen
+behind, its oldest event is dropped to make room. Subscribers cost a queue and
+whatever is waiting on it, nothing else.
+
+    with HUB.subscribe("date:2025-10-20") as sub:
+        event = sub.get(timeout=15)   # None on timeout
+
+Coroutines use `await sub.aget(timeout=15)` instead; it parks on the event loop,
+not on a thread, and publish() from any thread wakes it (asgi_app.py).
+
+The hub lives in one process. Other workers and the desktop client do not
+publish into it, so long-lived consumers should also re-check data_versions now
+and then (see app.py /events).
+"""
+
+import asyncio
+import queue
+import threading
+from typing import Any, Dict, List, Optional, Set, Tuple
+
+
+class Subscription:
+    def __init__(self, hub: "Hub", topic: str, maxsize: int):
+        self.hub = hub
+        self.topic = topic
+        self.queue: "queue.Queue[Any]" = queue.Queue(maxsize=maxsize)
+        self.dropped = 0
+        self._waiters: List[Tuple[asyncio.AbstractEventLoop, asyncio.Future]] = []
+        self._waiters_lock = threading.Lock()
+
+    def put(self, event):
+        while True:
+            try:
+                self.queue.put_nowait(event)
+                break
+            except queue.Full:
+                try:
+                    self.queue.get_nowait()
+                    self.dropped += 1
+                except queue.Empty:
+                    pass
+        with self._waiters_lock:
+            waiters, self._waiters = self._waiters, []
+        for loop, fut in waiters:
+            try:
+                loop.call_soon_threadsafe(_wake, fut)
+            except RuntimeError:
+                pass   # loop already closed
+
+    def get(self, timeout: Optional[float] = None):
+        try:
+            return self.queue.get(timeout=timeout)
+        except queue.Empty:
+            return None
+
+    async def aget(self, timeout: Optional[float] = None):
+        """Like get(), for coroutines."""
+        loop = asyncio.get_running_loop()
+        deadline = None if timeout is None else loop.time() + timeout
+        while True:
+            try:
+                return self.queue.get_nowait()
+            except queue.Empty:
+                pass
+            fut = loop.create_future()
+            with self._waiters_lock:
+                self._waiters.append((loop, fut))
+            # an event put between the check above and registering would not wake us
+            try:
+                return self.queue.get_nowait()
+            except queue.Empty:
+                pass
+            remaining = None if deadline is None else deadline - loop.time()
+            if remaining is not None and remaining <= 0:
+                return None
+            try:
+                await asyncio.wait_for(fut, remaining)
+            except asyncio.TimeoutError:
+                return None
+
+    def drain(self):
+        """Everything already queued, without waiting."""
+        out = []
+        while True:
+            try:
+                out.append(self.queue.get_nowait())
+            except queue.Empty:
+                return out
+
+    def close(self):
+        self.hub._unsubscribe(self)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+def _wake(fut: asyncio.Future):
+    if not fut.done():
+        fut.set_result(None)
+
+
+class Hub:
+    def __init__(self, max_queue: int = 256):
+        self.max_queue = max_queue
+        self._topics: Dict[str, Set[Subscription]] = {}
+        self._lock = threading.Lock()
+
+    def subscribe(self, topic: str) -> Subscription:
+        sub = Subscription(self, topic, self.max_queue)
+        with self._lock:
+            self._topics.setdefault(topic, set()).add(sub)
+        return sub
+
+    def _unsubscribe(self, sub: Subscription):
+        with self._lock:
+            subs = self._topics.get(sub.topic)
+            if subs is not None:
+                subs.discard(sub)
+                if not subs:
+                    del self._topics[sub.topic]
+
+    def publish(self, topic: str, event) -> int:
+        """Deliver `event` to every current subscriber of `topic`; returns how many got it."""
+        with self._lock:
+            subs = list(self._topics.get(topic, ()))
+        for sub in subs:
+            sub.put(event)
+        return len(subs)
+
+    def subscriber_count(self, topic: Optional[str] = None) -> int:
+        with self._lock:
+            if topic is not None:
+                return len(self._topics.get(topic, ()))
+            return sum(len(s) for s in self._topics.values())
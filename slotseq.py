@@ -0,0 +1,68 @@
+# slotseq.py
+"""
+Persistent, block-allocating sequence for route slot numbers.
+
+The next free value lives in the `sequences` table (migrations.py, v5). A
+process does not touch the database for every number. It reserves a block of
+`block` values in one short BEGIN IMMEDIATE transaction and hands them out from
+memory under a thread lock. Blocks never overlap, so two workers, the web app
+and the desktop client, or two requests racing for /next_slot can never get the
+same number.
+
+    SLOTS = SlotSequence(POOL, block=32)
+    slot_label(SLOTS.next())      # -> "SL0017"
+
+Numbers are unique and increasing per process but not gap-free: the unused
+rest of a block is skipped after a restart, and a number handed to a form that
+is never submitted is not reused.
+"""
+
+import os
+import threading
+
+DIGITS = "0123456789ABCDEFGHIJKLMNOPQRSTUVWXYZ"
+
+
+def slot_label(n: int) -> str:
+    """SL + base36, zero-padded to 4: the slot_no format of every route ever created (SL0001, SL000A, ...)."""
+    out = ""
+    while n:
+        n, rem = divmod(n, 36)
+        out = DIGITS[rem] + out
+    return "SL" + (out or "0").rjust(4, "0")
+
+
+class SlotSequence:
+    def __init__(self, pool, name: str = "slot_no", block: int = 32):
+        self.pool = pool
+        self.name = name
+        self.block = max(1, int(block))
+        self._lock = threading.Lock()
+        self._next = 0
+        self._end = 0          # exclusive end of the reserved block
+        self._pid = os.getpid()
+
+    def _reserve(self):
+        with self.pool.connection() as conn:
+            conn.execute("BEGIN IMMEDIATE")
+            try:
+                r = conn.execute("SELECT next FROM sequences WHERE name=?", (self.name,)).fetchone()
+                start = int(r[0]) if r else 1
+                conn.execute("INSERT OR REPLACE INTO sequences (name, next) VALUES (?, ?)", (self.name, start + self.block))
+                conn.commit()
+            except Exception:
+                conn.rollback()
+                raise
+        self._next, self._end = start, start + self.block
+
+    def next(self) -> int:
+        with self._lock:
+            if os.getpid() != self._pid:
+                # forked worker: the parent's block is the parent's; reserve our own
+                self._pid = os.getpid()
+                self._next = self._end = 0
+            if self._next >= self._end:
+                self._reserve()
+            n = self._next
+            self._next += 1
+            return n
@@ -0,0 +1,132 @@
+# tests/conftest.py
+"""
+Shared fixtures. Every test gets its own routelink.db under tmp_path; nothing
+touches the working copy's database.
+
+    db         pooled TimedConnection on a fresh, fully migrated database
+    webapp     app.py wired to that database (skipped without flask)
+    client     webapp.app.test_client(); login(client, user_id) signs it in
+    chat_app   app2 (the conversations app) on its own fresh database
+    route_chat_app  app3 (per-route group chat) likewise
+"""
+
+import importlib.machinery
+import importlib.util
+import os
+import sys
+
+import pytest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from dbpool import ConnectionPool          # noqa: E402
+from metrics import TimedConnection        # noqa: E402
+from migrations import migrate             # noqa: E402
+
+# the tables app.py's init_db() creates before migrate()
+BASE_SCHEMA = """
+CREATE TABLE IF NOT EXISTS users (id INTEGER PRIMARY KEY AUTOINCREMENT, name TEXT, email TEXT UNIQUE, password_hash TEXT);
+CREATE TABLE IF NOT EXISTS routes (id INTEGER PRIMARY KEY AUTOINCREMENT, slot_no TEXT, end_point TEXT,
+                                   major_stops TEXT, time TEXT, transport_type TEXT, no_of_people INTEGER DEFAULT 0);
+CREATE TABLE IF NOT EXISTS links (id INTEGER PRIMARY KEY AUTOINCREMENT, name TEXT, drop_point TEXT, phone TEXT,
+                                  course_year TEXT, branch TEXT);
+CREATE TABLE IF NOT EXISTS calendar (id INTEGER PRIMARY KEY AUTOINCREMENT, travel_date TEXT, route_id INTEGER, link_id INTEGER);
+"""
+
+
+def base_db(conn, target=None):
+    conn.executescript(BASE_SCHEMA)
+    migrate(conn, target)
+    return conn
+
+
+def add_route(conn, d, end_point="Main Gate", ttime="09:00", ttype="Bus", seat_cap=None):
+    """Route plus its placeholder calendar row, as api_create_route writes them."""
+    rid = conn.execute("""INSERT INTO routes (slot_no, end_point, time, transport_type, no_of_people, key_date, seat_cap)
+                          VALUES ('SL1', ?, ?, ?, 0, ?, ?)""", (end_point, ttime, ttype, d, seat_cap)).lastrowid
+    conn.execute("INSERT INTO calendar (travel_date, route_id, link_id) VALUES (?, ?, NULL)", (d, rid))
+    conn.commit()
+    return rid
+
+
+def add_join(conn, d, rid, phone, name="A"):
+    lid = conn.execute("INSERT INTO links (name, gender, drop_point, phone) VALUES (?, 'M', 'Main Gate', ?)",
+                       (name, phone)).lastrowid
+    conn.execute("INSERT INTO calendar (travel_date, route_id, link_id) VALUES (?, ?, ?)", (d, rid, lid))
+    conn.commit()
+    return lid
+
+
+@pytest.fixture
+def pool(tmp_path):
+    p = ConnectionPool(str(tmp_path / "routelink.db"), factory=TimedConnection)
+    yield p
+    p.close_all()
+
+
+@pytest.fixture
+def db(pool):
+    with pool.connection() as conn:
+        yield base_db(conn)
+
+
+@pytest.fixture
+def webapp(tmp_path, monkeypatch, pool):
+    pytest.importorskip("flask")
+    monkeypatch.chdir(tmp_path)
+    import app
+    from slotseq import SlotSequence
+    monkeypatch.setattr(app, "POOL", pool)
+    monkeypatch.setattr(app, "SLOTS", SlotSequence(pool, "slot_no", block=32))
+    app.CACHE.clear()
+    app.init_db()
+    yield app
+    app.CACHE.clear()
+
+
+@pytest.fixture
+def client(webapp):
+    return webapp.app.test_client()
+
+
+def login(client, user_id=1, name="Tester"):
+    with client.session_transaction() as s:
+        s["user_id"] = user_id
+        s["user_name"] = name
+
+
+def load_source(name):
+    # app2 / app3 have no .py extension
+    loader = importlib.machinery.SourceFileLoader(name, os.path.join(ROOT, name))
+    module = importlib.util.module_from_spec(importlib.util.spec_from_loader(name, loader))
+    loader.exec_module(module)
+    return module
+
+
+@pytest.fixture
+def chat_app(tmp_path, monkeypatch):
+    pytest.importorskip("flask")
+    monkeypatch.chdir(tmp_path)
+    module = load_source("app2")
+    module.init_db()
+    yield module
+    module.HASHER.shutdown()
+
+
+@pytest.fixture
+def route_chat_app(tmp_path, monkeypatch):
+    pytest.importorskip("flask")
+    monkeypatch.chdir(tmp_path)
+    module = load_source("app3")
+    module.init_db()
+    yield module
+    module.HASHER.shutdown()
+
+
+@pytest.fixture(scope="session", autouse=True)
+def _shutdown_hashers():
+    yield
+    app = sys.modules.get("app")
+    if app is not None:
+        app.HASHER.shutdown()
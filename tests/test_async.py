@@ -0,0 +1,66 @@
+import asyncio
+import threading
+import time
+
+import pytest
+
+from pubsub import Hub
+
+
+def _publish_later(hub, topic, *events):
+    def run():
+        time.sleep(0.05)
+        for ev in events:
+            hub.publish(topic, ev)
+    threading.Thread(target=run).start()
+
+
+def test_aget_is_woken_by_a_publish_from_another_thread():
+    hub = Hub()
+    async def main():
+        with hub.subscribe("t") as sub:
+            _publish_later(hub, "t", {"id": 1})
+            started = time.monotonic()
+            ev = await sub.aget(timeout=5)
+            return ev, time.monotonic() - started
+    ev, took = asyncio.run(main())
+    assert ev == {"id": 1} and took < 2
+
+
+def test_aget_times_out_without_blocking_the_loop():
+    hub = Hub()
+    ticks = []
+    async def ticker():
+        for _ in range(5):
+            ticks.append(1)
+            await asyncio.sleep(0.01)
+    async def main():
+        with hub.subscribe("t") as sub:
+            ev, _ = await asyncio.gather(sub.aget(timeout=0.1), ticker())
+            return ev
+    assert asyncio.run(main()) is None
+    assert len(ticks) == 5
+
+
+def test_asgi_wait_for_messages_filters_old_ids(tmp_path, monkeypatch):
+    pytest.importorskip("starlette")
+    monkeypatch.chdir(tmp_path)
+    import asgi_app
+    async def fetch():
+        return [], False
+    async def main():
+        _publish_later(asgi_app.chat.HUB, "conv:1", {"id": 3}, {"id": 9})
+        return await asgi_app.wait_for_messages("conv:1", 5, 2, fetch)
+    msgs, more = asyncio.run(main())
+    assert [m["id"] for m in msgs] == [9] and not more
+
+
+def test_asgi_routes_answer_without_the_flask_apps(tmp_path, monkeypatch):
+    pytest.importorskip("starlette")
+    pytest.importorskip("httpx")
+    monkeypatch.chdir(tmp_path)
+    import asgi_app
+    from starlette.testclient import TestClient
+    client = TestClient(asgi_app.app)   # no lifespan: nothing below touches the database
+    assert client.get("/events?date=tomorrow").status_code == 400
+    assert client.get("/conversations/1/messages").status_code == 401
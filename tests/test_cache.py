@@ -0,0 +1,75 @@
+import sqlite3
+from datetime import date, timedelta
+
+from conftest import add_join, add_route, login
+
+DAY = (date.today() + timedelta(days=7)).isoformat()
+
+
+def test_ttl_cache_lru_and_expiry(webapp, monkeypatch):
+    cache = webapp.TTLCache(maxsize=2, ttl=10)
+    cache.set("a", 1); cache.set("b", 2)
+    cache.get("a")
+    cache.set("c", 3)                       # evicts b, the least recently used
+    assert cache.get("b") is None and cache.get("a") == 1
+    now = webapp.time.monotonic()
+    monkeypatch.setattr(webapp.time, "monotonic", lambda: now + 11)
+    assert cache.get("a") is None
+
+
+def test_set_after_invalidation_is_dropped(webapp):
+    cache = webapp.TTLCache()
+    gen = cache.generation()
+    cache.delete("k")                       # a write landed while the value was computed
+    cache.set("k", "stale", gen)
+    assert cache.get("k") is None
+
+
+def test_calendar_etag_and_304(client, webapp):
+    with webapp.POOL.connection() as conn:
+        add_route(conn, DAY)
+    first = client.get(f"/calendar/{DAY}")
+    assert first.status_code == 200 and len(first.json) == 1
+    etag = first.headers["ETag"]
+    again = client.get(f"/calendar/{DAY}", headers={"If-None-Match": etag})
+    assert again.status_code == 304 and again.data == b""
+
+
+def test_write_from_another_process_changes_etag_and_body(client, webapp, tmp_path):
+    with webapp.POOL.connection() as conn:
+        rid = add_route(conn, DAY)
+    etag = client.get(f"/calendar/{DAY}").headers["ETag"]
+    # not through the app: only the data_versions triggers can tell the cache
+    other = sqlite3.connect(str(tmp_path / "routelink.db"))
+    add_join(other, DAY, rid, "9000000001")
+    other.close()
+    resp = client.get(f"/calendar/{DAY}", headers={"If-None-Match": etag})
+    assert resp.status_code == 200
+    assert resp.json[0]["count"] == 1
+
+
+def test_route_count_and_links_are_versioned(client, webapp, tmp_path):
+    login(client)
+    with webapp.POOL.connection() as conn:
+        rid = add_route(conn, DAY)
+    assert client.get(f"/route_count?date={DAY}&route_id={rid}").json == {"count": 0}
+    assert client.get(f"/routes/{rid}/links?date={DAY}").json == []
+    other = sqlite3.connect(str(tmp_path / "routelink.db"))
+    lid = add_join(other, DAY, rid, "9000000002", name="Old")
+    assert client.get(f"/route_count?date={DAY}&route_id={rid}").json == {"count": 1}
+    assert [l["name"] for l in client.get(f"/routes/{rid}/links?date={DAY}").json] == ["Old"]
+    other.execute("UPDATE links SET name='New' WHERE id=?", (lid,))
+    other.commit(); other.close()
+    assert [l["name"] for l in client.get(f"/routes/{rid}/links?date={DAY}").json] == ["New"]
+
+
+def test_join_through_api_invalidates(client, webapp):
+    login(client)
+    with webapp.POOL.connection() as conn:
+        rid = add_route(conn, DAY)
+    assert client.get(f"/route_count?date={DAY}&route_id={rid}").json == {"count": 0}
+    resp = client.post(f"/routes/{rid}/join", json={"date": DAY, "name": "B", "gender": "F", "drop": "Main Gate",
+                                                    "phone": "9000000003", "course_year": "2", "branch": "CSE"})
+    assert resp.status_code in (200, 201)
+    assert client.get(f"/route_count?date={DAY}&route_id={rid}").json == {"count": 1}
+    assert client.get(f"/calendar/{DAY}").json[0]["count"] == 1
@@ -0,0 +1,57 @@
+import json
+
+import pytest
+
+from conftest import add_join, add_route
+from holiday_store import HolidayStore
+
+
+@pytest.fixture
+def holidays(webapp, tmp_path, monkeypatch):
+    path = tmp_path / "academic_holidays.json"
+    path.write_text(json.dumps(["2030-02-14", "2030-03-10"]))
+    store = HolidayStore(str(path), check_interval=0)
+    monkeypatch.setattr(webapp, "HOLIDAYS", store)
+    return path
+
+
+def test_month_view_has_every_day_with_routes_counts_and_holidays(client, db, holidays):
+    a = add_route(db, "2030-03-04")
+    b = add_route(db, "2030-03-04", end_point="Library")
+    add_join(db, "2030-03-04", a, "9000000001")
+    add_join(db, "2030-03-04", b, "9000000002")
+    add_join(db, "2030-03-04", b, "9000000003")
+    add_route(db, "2030-04-01")
+    body = client.get("/calendar/month/2030-03").get_json()
+    assert body["month"] == "2030-03"
+    assert len(body["days"]) == 31
+    day = body["days"]["2030-03-04"]
+    assert day["joined"] == 3 and not day["holiday"]
+    assert [(r["id"], r["joined"]) for r in day["routes"]] == [(b, 2), (a, 1)]
+    assert body["days"]["2030-03-10"] == {"holiday": True, "joined": 0, "routes": []}
+    assert "2030-04-01" not in body["days"]
+    assert len(client.get("/calendar/month/2030-02").get_json()["days"]) == 28
+
+
+def test_month_view_rejects_bad_month(client):
+    assert client.get("/calendar/month/2030-13").status_code == 400
+    assert client.get("/calendar/month/March").status_code == 400
+
+
+def test_month_view_follows_writes(client, db, holidays):
+    assert client.get("/calendar/month/2030-03").get_json()["days"]["2030-03-04"]["routes"] == []
+    add_route(db, "2030-03-04")
+    assert len(client.get("/calendar/month/2030-03").get_json()["days"]["2030-03-04"]["routes"]) == 1
+
+
+def test_day_listing_embeds_join_counts(client, db):
+    a = add_route(db, "2030-03-04")
+    b = add_route(db, "2030-03-04", end_point="Library")
+    add_join(db, "2030-03-04", a, "9000000001")
+    add_join(db, "2030-03-04", a, "9000000002")
+    rows = client.get("/calendar/2030-03-04").get_json()
+    assert [(r["id"], r["count"]) for r in rows] == [(b, 0), (a, 2)]
+    assert client.get(f"/route_count?date=2030-03-04&route_id={a}").get_json() == {"count": 2}
+    add_join(db, "2030-03-04", b, "9000000003")
+    rows = client.get("/calendar/2030-03-04").get_json()
+    assert [(r["id"], r["count"]) for r in rows] == [(b, 1), (a, 2)]
@@ -0,0 +1,110 @@
+import sqlite3
+import threading
+import time
+
+import pytest
+
+from conftest import login
+
+pytest.importorskip("flask")
+
+from chatpoll import fetch_message_page, published_messages, wait_for_messages  # noqa: E402
+from pubsub import Hub  # noqa: E402
+
+
+@pytest.fixture
+def conv(chat_app):
+    conn = chat_app.sqlite3.connect(chat_app.DB)
+    conn.execute("INSERT INTO users (id, name, email) VALUES (1, 'A', 'a@vitstudent.ac.in')")
+    cid = conn.execute("INSERT INTO conversations (title) VALUES ('t')").lastrowid
+    conn.execute("INSERT INTO conversation_participants (conversation_id, user_id) VALUES (?, 1)", (cid,))
+    conn.commit(); conn.close()
+    client = chat_app.app.test_client()
+    login(client, 1, "A")
+    ids = [client.post(f"/conversations/{cid}/messages", json={"text": f"m{i}"}).json["id"] for i in range(7)]
+    return client, cid, ids
+
+
+def test_latest_page_then_scroll_back(conv):
+    client, cid, ids = conv
+    latest = client.get(f"/conversations/{cid}/messages?limit=3")
+    assert [m["id"] for m in latest.json] == ids[-3:]          # oldest-first within the page
+    assert latest.headers["X-Has-More"] == "1"
+    older = client.get(f"/conversations/{cid}/messages?limit=3&before_id={ids[-3]}")
+    assert [m["id"] for m in older.json] == ids[1:4]
+    oldest = client.get(f"/conversations/{cid}/messages?limit=3&before_id={ids[1]}")
+    assert [m["id"] for m in oldest.json] == ids[:1] and oldest.headers["X-Has-More"] == "0"
+
+
+def test_after_id_returns_only_newer(conv):
+    client, cid, ids = conv
+    resp = client.get(f"/conversations/{cid}/messages?after_id={ids[4]}")
+    assert [m["id"] for m in resp.json] == ids[5:]
+    assert resp.headers["X-Has-More"] == "0"
+
+
+def test_long_poll_wakes_on_post_and_holds_no_connection(conv, chat_app, monkeypatch):
+    client, cid, ids = conv
+    held = []
+    real_close = chat_app.close_db
+    def close_db(exc=None):
+        held.append("closed")
+        real_close(exc)
+    monkeypatch.setattr(chat_app, "close_db", close_db)   # the handler passes it as release=
+
+    result = {}
+    def poll():
+        started = time.monotonic()
+        r = client.get(f"/conversations/{cid}/messages?after_id={ids[-1]}&wait=5")
+        result.update(ids=[m["id"] for m in r.json], took=time.monotonic() - started)
+    t = threading.Thread(target=poll)
+    t.start()
+    deadline = time.monotonic() + 2
+    while not chat_app.HUB.subscriber_count(f"conv:{cid}") and time.monotonic() < deadline:
+        time.sleep(0.01)
+    other = chat_app.app.test_client()
+    login(other, 1, "A")
+    new_id = other.post(f"/conversations/{cid}/messages", json={"text": "wake"}).json["id"]
+    t.join(5)
+    assert result["ids"] == [new_id] and result["took"] < 4
+    assert "closed" in held
+
+
+def test_fetch_message_page_keyset():
+    conn = sqlite3.connect(":memory:")
+    conn.execute("CREATE TABLE messages (id INTEGER PRIMARY KEY, conversation_id INTEGER)")
+    conn.executemany("INSERT INTO messages VALUES (?, 1)", [(i,) for i in range(1, 11)])
+    base = "SELECT id FROM messages WHERE conversation_id=?"
+    rows, more = fetch_message_page(conn.cursor(), base, (1,), None, None, 4)
+    assert [r[0] for r in rows] == [7, 8, 9, 10] and more
+    rows, more = fetch_message_page(conn.cursor(), base, (1,), 8, None, 4)
+    assert [r[0] for r in rows] == [9, 10] and not more
+
+
+def test_wait_for_messages_times_out_and_releases():
+    hub = Hub()
+    released = []
+    msgs, more = wait_for_messages(hub, "t", 5, 0.05, lambda: ([], False), release=lambda: released.append(1))
+    assert (msgs, more) == ([], False) and released == [1]
+
+
+def test_wait_for_messages_filters_old_ids():
+    hub = Hub()
+    def publish():
+        time.sleep(0.05)
+        hub.publish("t", {"id": 3})
+        hub.publish("t", {"id": 9})
+    threading.Thread(target=publish).start()
+    msgs, _ = wait_for_messages(hub, "t", 5, 2, lambda: ([], False))
+    assert [m["id"] for m in msgs] == [9]
+
+
+def test_published_messages_sorts_and_flags_dropped_events():
+    hub = Hub(max_queue=2)
+    with hub.subscribe("t") as sub:
+        hub.publish("t", {"id": 7})
+        hub.publish("t", {"id": 4})
+        assert [m["id"] for m in published_messages(sub, {"id": 6}, 4)] == [6, 7]
+        for i in range(3):
+            hub.publish("t", {"id": 10 + i})
+        assert published_messages(sub, sub.get(timeout=0), 4) is None   # fell behind: re-read the table
@@ -0,0 +1,25 @@
+from conftest import login
+
+
+def _conversation(chat_app, user_ids):
+    conn = chat_app.sqlite3.connect(chat_app.DB)
+    cid = conn.execute("INSERT INTO conversations (title) VALUES ('t')").lastrowid
+    for uid in user_ids:
+        conn.execute("INSERT INTO users (id, name, email) VALUES (?, ?, ?)", (uid, f"U{uid}", f"u{uid}@vitstudent.ac.in"))
+        conn.execute("INSERT INTO conversation_participants (conversation_id, user_id) VALUES (?, ?)", (cid, uid))
+    conn.commit(); conn.close()
+    return cid
+
+
+def test_read_cursor_is_clamped_to_newest_message(chat_app):
+    cid = _conversation(chat_app, [1, 2])
+    sender, reader = chat_app.app.test_client(), chat_app.app.test_client()
+    login(sender, 1, "U1"); login(reader, 2, "U2")
+    ids = [sender.post(f"/conversations/{cid}/messages", json={"text": f"m{i}"}).json["id"] for i in range(3)]
+
+    assert reader.post(f"/conversations/{cid}/read", json={"last_read_id": 10 ** 6}).json["last_read_id"] == ids[-1]
+    # never moves backwards
+    assert reader.post(f"/conversations/{cid}/read", json={"last_read_id": ids[0]}).json["last_read_id"] == ids[-1]
+    # a message posted after the oversized cursor still counts as unread
+    sender.post(f"/conversations/{cid}/messages", json={"text": "late"})
+    assert reader.get("/conversations").json[0]["unread"] == 1
@@ -0,0 +1,54 @@
+import json
+import os
+
+from conftest import add_join, add_route, login
+from holiday_store import HolidayStore
+
+DAY = "2030-03-04"
+
+
+def _revalidate(client, url):
+    first = client.get(url)
+    assert first.status_code == 200 and first.headers["Cache-Control"] == "no-cache"
+    etag = first.headers["ETag"]
+    again = client.get(url, headers={"If-None-Match": etag})
+    assert again.status_code == 304 and again.data == b""
+    return etag
+
+
+def test_day_listing_revalidates_until_a_join(client, webapp):
+    with webapp.POOL.connection() as conn:
+        rid = add_route(conn, DAY)
+    etag = _revalidate(client, f"/calendar/{DAY}")
+    with webapp.POOL.connection() as conn:
+        add_join(conn, DAY, rid, "9000000001")
+    resp = client.get(f"/calendar/{DAY}", headers={"If-None-Match": etag})
+    assert resp.status_code == 200 and resp.headers["ETag"] != etag
+    assert resp.get_json()[0]["count"] == 1
+
+
+def test_holidays_etag_follows_the_file_and_the_query(client, webapp, tmp_path, monkeypatch):
+    path = tmp_path / "hol.json"
+    path.write_text(json.dumps(["2030-01-26"]))
+    os.utime(path, (1000, 1000))
+    monkeypatch.setattr(webapp, "HOLIDAYS", HolidayStore(str(path), check_interval=0))
+    etag = _revalidate(client, "/holidays")
+    ranged = _revalidate(client, "/holidays?from=2030-01-01&to=2030-01-31")
+    assert ranged != etag
+    path.write_text(json.dumps(["2030-01-26", "2030-08-15"]))
+    os.utime(path, (2000, 2000))
+    resp = client.get("/holidays", headers={"If-None-Match": etag})
+    assert resp.status_code == 200 and resp.get_json() == ["2030-01-26", "2030-08-15"]
+
+
+def test_links_revalidate_until_a_link_changes(client, webapp):
+    login(client)
+    with webapp.POOL.connection() as conn:
+        rid = add_route(conn, DAY)
+        add_join(conn, DAY, rid, "9000000001")
+    etag = _revalidate(client, "/links")
+    assert _revalidate(client, "/links?gender=M") != etag
+    with webapp.POOL.connection() as conn:
+        add_join(conn, DAY, rid, "9000000002")
+    resp = client.get("/links", headers={"If-None-Match": etag})
+    assert resp.status_code == 200 and len(resp.get_json()) == 2
@@ -0,0 +1,80 @@
+import sqlite3
+
+import pytest
+
+from conftest import add_join, add_route
+
+DAY = "2030-03-04"
+
+
+def test_same_route_twice_on_a_day_is_rejected(db):
+    add_route(db, DAY, end_point="Main Gate", ttime="09:00", ttype="Bus")
+    with pytest.raises(sqlite3.IntegrityError):
+        add_route(db, DAY, end_point="  main gate ", ttime="09:00", ttype="BUS")
+    db.rollback()
+    add_route(db, "2030-03-05", end_point="Main Gate", ttime="09:00", ttype="Bus")   # other day is fine
+
+
+def test_phone_joins_a_route_once_per_day(db):
+    rid = add_route(db, DAY)
+    add_join(db, DAY, rid, "9000000001")
+    with pytest.raises(sqlite3.IntegrityError):
+        add_join(db, DAY, rid, "9000000001")
+    db.rollback()
+    add_join(db, DAY, rid, "9000000002")
+
+
+def test_seat_cap_is_enforced_and_count_maintained(db):
+    rid = add_route(db, DAY, seat_cap=2)
+    add_join(db, DAY, rid, "9000000001")
+    add_join(db, DAY, rid, "9000000002")
+    with pytest.raises(sqlite3.IntegrityError, match="route full"):
+        add_join(db, DAY, rid, "9000000003")
+    db.rollback()
+    assert db.execute("SELECT no_of_people FROM routes WHERE id=?", (rid,)).fetchone()[0] == 2
+    db.execute("DELETE FROM calendar WHERE route_id=? AND link_id IS NOT NULL AND join_phone='9000000001'", (rid,))
+    db.commit()
+    assert db.execute("SELECT no_of_people FROM routes WHERE id=?", (rid,)).fetchone()[0] == 1
+    add_join(db, DAY, rid, "9000000003")
+
+
+def test_phone_change_follows_into_calendar(db):
+    rid = add_route(db, DAY)
+    lid = add_join(db, DAY, rid, "9000000001")
+    db.execute("UPDATE links SET phone='9000000009' WHERE id=?", (lid,))
+    db.commit()
+    assert db.execute("SELECT join_phone FROM calendar WHERE link_id=?", (lid,)).fetchone()[0] == "9000000009"
+
+
+def test_api_join_reports_full_and_duplicate(client, webapp):
+    from datetime import date, timedelta
+    from conftest import login
+    day = (date.today() + timedelta(days=3)).isoformat()
+    login(client)
+    with webapp.POOL.connection() as conn:
+        rid = add_route(conn, day, seat_cap=1)
+    body = {"date": day, "name": "A", "gender": "M", "drop": "Main Gate", "phone": "9000000001",
+            "course_year": "2", "branch": "CSE"}
+    assert client.post(f"/routes/{rid}/join", json=body).status_code in (200, 201)
+    assert client.post(f"/routes/{rid}/join", json=body).status_code == 409
+    assert client.post(f"/routes/{rid}/join", json=dict(body, phone="9000000002")).get_data(as_text=True) == "Route is full"
+
+
+def test_api_create_route_allocates_a_slot_and_rejects_duplicates(client, webapp):
+    from conftest import login
+    login(client)
+    body = {"date": DAY, "end_point": "Main Gate", "time": "09:00", "transport_type": "Bus"}
+    resp = client.post("/routes", json=body)
+    assert resp.status_code == 201
+    rid = resp.json["route_id"]
+    with webapp.POOL.connection() as conn:
+        slot = conn.execute("SELECT slot_no FROM routes WHERE id=?", (rid,)).fetchone()[0]
+        placeholder = [r[0] for r in conn.execute("SELECT link_id FROM calendar WHERE route_id=?", (rid,))]
+    assert slot.startswith("SL") and placeholder == [None]
+    dup = client.post("/routes", json=dict(body, end_point=" main GATE", transport_type="bus"))
+    assert dup.status_code == 409
+    assert client.post("/routes", json=dict(body, time="10:00")).status_code == 201
+    assert client.post("/routes", json=dict(body, date="2020-01-01")).status_code == 400
+    assert client.post("/routes", json=dict(body, seat_cap=0)).status_code == 400
+    with webapp.POOL.connection() as conn:
+        assert conn.execute("SELECT COUNT(*) FROM routes").fetchone()[0] == 2
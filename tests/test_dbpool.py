@@ -0,0 +1,50 @@
+import os
+import threading
+
+from dbpool import ConnectionPool, get_pool
+
+
+def test_connections_are_reused_and_configured(pool):
+    with pool.connection() as a:
+        assert a.execute("PRAGMA journal_mode").fetchone()[0] == "wal"
+    with pool.connection() as b:
+        assert b is a
+
+
+def test_release_rolls_back_open_transaction(pool):
+    with pool.connection() as conn:
+        conn.execute("CREATE TABLE t (x)")
+        conn.commit()
+        conn.execute("INSERT INTO t VALUES (1)")
+        assert conn.in_transaction
+    with pool.connection() as conn:
+        assert not conn.in_transaction
+        assert conn.execute("SELECT COUNT(*) FROM t").fetchone()[0] == 0
+
+
+def test_pool_keeps_at_most_size_idle(tmp_path):
+    p = ConnectionPool(str(tmp_path / "x.db"), size=2)
+    conns = [p.acquire() for _ in range(4)]
+    for c in conns:
+        p.release(c)
+    assert len(p._idle) == 2
+    p.close_all()
+
+
+def test_threads_get_distinct_connections(pool):
+    seen = []
+    barrier = threading.Barrier(3)
+    def worker():
+        with pool.connection() as conn:
+            seen.append(id(conn))
+            barrier.wait()
+    threads = [threading.Thread(target=worker) for _ in range(3)]
+    for t in threads: t.start()
+    for t in threads: t.join()
+    assert len(set(seen)) == 3
+
+
+def test_get_pool_is_per_path(tmp_path):
+    a = get_pool(str(tmp_path / "a.db"))
+    assert get_pool(os.path.join(str(tmp_path), ".", "a.db")) is a
+    assert get_pool(str(tmp_path / "b.db")) is not a
@@ -0,0 +1,305 @@
+# Desktop client logic that runs without a display: DbExecutor delivery and the screens' DB work.
+import threading
+import time
+
+import pytest
+
+pytest.importorskip("tkinter")
+
+import RouteLinkFinal_ForReview as desktop  # noqa: E402
+from conftest import add_join, add_route, base_db  # noqa: E402
+from dbworker import DbExecutor  # noqa: E402
+
+DAY = "2030-03-04"
+
+
+class FakeRoot:
+    """Stands in for the Tk root: after() callbacks run when the test pumps them, on the test's thread."""
+
+    def __init__(self):
+        self.pending = []
+
+    def after(self, _ms, fn):
+        self.pending.append(fn)
+
+    def pump(self, until=lambda: False, timeout=2.0):
+        deadline = time.monotonic() + timeout
+        while time.monotonic() < deadline:
+            pending, self.pending = self.pending, []
+            for fn in pending:
+                fn()
+            if until():
+                return True
+            time.sleep(0.005)
+        return until()
+
+
+@pytest.fixture
+def dbx(pool):
+    with pool.connection() as conn:
+        base_db(conn)
+    ex = DbExecutor(pool, poll_ms=1)
+    root = FakeRoot()
+    ex.attach(root)
+    ex.root = root
+    yield ex
+    ex.shutdown()
+
+
+def test_month_aggregate():
+    rows = [(DAY, 1, "SL0001", "Gate", "09:00"), (DAY, 2, "SL0002", "Library", None), ("2030-03-05", None, None, None, None)]
+    data = desktop.month_aggregate(rows)
+    assert data[DAY]["routes"] == 2
+    assert data[DAY]["summary"].splitlines() == ["1) SL0001 → Gate @ 09:00 (RouteID:1)", "2) SL0002 → Library @ - (RouteID:2)"]
+    assert data["2030-03-05"]["routes"] == 0
+
+
+def test_load_month_queries_on_the_db_thread_and_reuses_the_cache(dbx, pool):
+    with pool.connection() as conn:
+        rid = add_route(conn, DAY)
+    app = type("App", (), {"month_cache": {}, "db": dbx})()
+    got = []
+    desktop.RouteLinkApp.load_month(app, 2030, 3, got.append)
+    assert got == []                                  # nothing ran on the calling thread
+    assert dbx.root.pump(lambda: got)
+    assert got[0][DAY]["routes"] == 1
+
+    got.clear()
+    desktop.RouteLinkApp.load_month(app, 2030, 3, got.append)
+    assert len(got) == 1                              # cached copy painted at once
+    dbx.root.pump(timeout=0.1)
+    assert len(got) == 1                              # version unchanged: no second delivery
+
+    with pool.connection() as conn:
+        add_route(conn, DAY, end_point="Library")
+        add_join(conn, DAY, rid, "9000000001")
+    got.clear()
+    desktop.RouteLinkApp.load_month(app, 2030, 3, got.append)
+    assert dbx.root.pump(lambda: len(got) == 2)
+    assert got[1][DAY]["routes"] == 2
+    assert desktop.RouteLinkApp.cached_month_day(app, DAY)["routes"] == 2
+    assert desktop.RouteLinkApp.cached_month_day(app, "2030-04-01") is None
+
+
+def test_submit_runs_off_thread_and_delivers_through_the_dispatcher(dbx):
+    main = threading.get_ident()
+    seen = {}
+    def work(conn):
+        seen["work"] = threading.get_ident()
+        return conn.execute("SELECT 41 + 1").fetchone()[0]
+    dbx.submit(work, on_done=lambda v: seen.update(done=(v, threading.get_ident())))
+    dbx.submit(lambda conn: conn.execute("SELECT * FROM missing"),
+               on_error=lambda e: seen.update(error=(type(e).__name__, threading.get_ident())))
+    assert dbx.root.pump(lambda: "done" in seen and "error" in seen)
+    assert seen["work"] != main
+    assert seen["done"] == (42, main)
+    assert seen["error"] == ("OperationalError", main)
+
+
+def test_keyed_submit_keeps_only_the_latest(dbx):
+    started, release = threading.Event(), threading.Event()
+    def slow(conn):
+        started.set()
+        release.wait(2)
+        return "first"
+    got = []
+    dbx.submit(slow, on_done=got.append, key="view")
+    assert started.wait(2)
+    dbx.submit(lambda conn: "second", on_done=got.append, key="view")
+    dbx.submit(lambda conn: "third", on_done=got.append, key="view")
+    release.set()
+    assert dbx.root.pump(lambda: got)
+    dbx.root.pump(timeout=0.1)
+    assert got == ["third"]
+
+
+class Field:
+    def __init__(self, value=""):
+        self.value = value
+
+    def get(self):
+        return self.value
+
+    def config(self, **_kw):
+        pass
+
+
+@pytest.fixture(params=["RouteLinkFinal_ForReview", "RouteLink_Using_Tkinter"])
+def tk_client(request, monkeypatch):
+    """One of the two desktop clients with a fast hasher and recorded message boxes (module.shown)."""
+    import importlib
+    from passwords import PasswordHasher
+    module = importlib.import_module(request.param)
+    hasher = PasswordHasher(workers=1, params={"n": 2 ** 10, "r": 8, "p": 1, "dklen": 32})
+    monkeypatch.setattr(module, "HASHER", hasher)
+    shown = []
+    for kind in ("showinfo", "showerror", "showwarning"):
+        monkeypatch.setattr(module.messagebox, kind, lambda title, msg, kind=kind: shown.append((kind, title)))
+    monkeypatch.setattr(module, "shown", shown, raising=False)
+    yield module
+    hasher.shutdown()
+
+
+def _dialog(dbx, **fields):
+    d = type("Dialog", (), {})()
+    for k, v in fields.items():
+        setattr(d, k, Field(v))
+    d.submit_btn = Field()
+    d.app = type("App", (), {"db": dbx, "opened": 0})()
+    d.app.show_calendar_tab = lambda: setattr(d.app, "opened", d.app.opened + 1)
+    d.destroyed = False
+    d.destroy = lambda: setattr(d, "destroyed", True)
+    return d
+
+
+def test_register_then_login_with_scrypt(dbx, pool, tk_client):
+    shown = tk_client.shown
+    reg = _dialog(dbx, name="Asha", email="asha@vitstudent.ac.in", pw="pw1234", gender_var="F")
+    tk_client.RegisterDialog.do_register(reg)
+    assert dbx.root.pump(lambda: reg.destroyed)
+    with pool.connection() as conn:
+        assert conn.execute("SELECT pw_algo FROM users").fetchone()[0] == "scrypt"
+    assert shown == [("showinfo", "Success")]
+    shown.clear()
+
+    bad = _dialog(dbx, email="asha@vitstudent.ac.in", pw="wrong")
+    tk_client.LoginDialog.do_login(bad)
+    assert dbx.root.pump(lambda: shown)
+    assert shown[-1][0] == "showerror" and not bad.destroyed
+
+    ok = _dialog(dbx, email="asha@vitstudent.ac.in", pw="pw1234")
+    tk_client.LoginDialog.do_login(ok)
+    assert dbx.root.pump(lambda: ok.destroyed)
+    assert ok.app.opened == 1
+
+
+def test_login_upgrades_legacy_hash_and_reports_unknown_email(dbx, pool, tk_client):
+    shown = tk_client.shown
+    from passwords import legacy_sha256
+    with pool.connection() as conn:
+        conn.execute("INSERT INTO users (name, email, password_hash, gender) VALUES ('A', 'a@vitstudent.ac.in', ?, 'M')",
+                     (legacy_sha256("pw"),))
+        conn.commit()
+    unknown = _dialog(dbx, email="nobody@vitstudent.ac.in", pw="pw")
+    tk_client.LoginDialog.do_login(unknown)
+    assert dbx.root.pump(lambda: shown)
+    assert shown == [("showerror", "No account")]
+
+    d = _dialog(dbx, email="a@vitstudent.ac.in", pw="pw")
+    tk_client.LoginDialog.do_login(d)
+    assert dbx.root.pump(lambda: d.destroyed)
+    with pool.connection() as conn:
+        assert conn.execute("SELECT pw_algo FROM users").fetchone()[0] == "scrypt"
+
+
+class FakeWidget:
+    def __init__(self):
+        self.shown, self.configs = True, []
+
+    def grid(self):
+        self.shown = True
+
+    def grid_remove(self):
+        self.shown = False
+
+    def config(self, **opts):
+        self.configs.append(opts)
+
+
+class Grid:
+    """MiniCalendar's painting code over fake rows and cells."""
+    _paint = desktop.MiniCalendar._paint
+    _configure_cell = desktop.MiniCalendar._configure_cell
+    _day_count = desktop.MiniCalendar._day_count
+
+    def __init__(self, year, month):
+        self.year, self.month, self.today = year, month, desktop.date(2030, 3, 4)
+        self.holidays, self.get_month = {"2030-03-10"}, lambda *a: None
+        self.month_data = {DAY: {"routes": 2}}
+        self.rows = [FakeWidget() for _ in range(6)]
+        self.cells = [FakeWidget() for _ in range(42)]
+        self.cell_days, self.cell_iso, self.cell_opts = [0] * 42, [None] * 42, [None] * 42
+
+
+def test_calendar_grid_is_reconfigured_not_rebuilt():
+    grid = Grid(2030, 3)   # March 2030: Friday the 1st, five week rows
+    cells = list(grid.cells)
+    grid._paint()
+    assert [row.shown for row in grid.rows] == [True] * 5 + [False]
+    assert grid.cell_iso[4] == "2030-03-01" and grid.cell_days[3] == 0
+    assert grid.cells[4].configs[-1]["text"] == "1"
+    monday = grid.cell_iso.index(DAY)
+    assert grid.cells[monday].configs[-1]["text"] == "4\n2 joined"
+    assert grid.cells[monday].configs[-1]["bg"] == "#4a90e2"
+    assert grid.cells[grid.cell_iso.index("2030-03-10")].configs[-1]["text"] == "10\n★ Holiday"
+
+    calls = sum(len(c.configs) for c in grid.cells)
+    grid._paint()                  # nothing changed: no Tk calls at all
+    assert sum(len(c.configs) for c in grid.cells) == calls
+    grid.month_data = {DAY: {"routes": 3}}
+    grid._paint()                  # one badge changed: one cell touched
+    assert sum(len(c.configs) for c in grid.cells) == calls + 1
+
+    grid.year, grid.month = 2027, 2   # February 2027: Monday the 1st, four week rows
+    grid._paint()
+    assert grid.cells == cells
+    assert [row.shown for row in grid.rows] == [True] * 4 + [False] * 2
+    assert grid.cell_iso[0] == "2027-02-01" and grid.cell_iso[28] is None
+
+
+class FakeTree:
+    def __init__(self):
+        self.items = []
+
+    def get_children(self):
+        return tuple(self.items)
+
+    def delete(self, *iids):
+        self.items = [i for i in self.items if i not in iids]
+
+    def exists(self, iid):
+        return iid in self.items
+
+    def insert(self, _parent, _index, iid, values):
+        self.items.append(iid)
+
+
+class Links:
+    """LinkTab's paging code over a fake Treeview; PAGE_SIZE shrunk so a handful of rows spans pages."""
+    PAGE_SIZE = 3
+    GENDER_CODES = desktop.LinkTab.GENDER_CODES
+    _gender_clause = desktop.LinkTab._gender_clause
+    _load_page = desktop.LinkTab._load_page
+    _load_failed = desktop.LinkTab._load_failed
+    _on_tree_scroll = desktop.LinkTab._on_tree_scroll
+    _fill_tree = desktop.LinkTab._fill_tree
+
+    def __init__(self, db, gender=""):
+        self.app = type("App", (), {"db": db})()
+        self.gender_filter = type("Var", (), {"get": lambda _self: gender})()
+        self.tree, self.tree_vbar, self.delete_link_btn = FakeTree(), FakeWidget(), FakeWidget()
+        self.tree_vbar.set = lambda *a: None
+        self._last_id, self._has_more, self._loading = None, False, False
+
+
+def test_links_tab_pages_by_keyset_as_the_tree_scrolls(dbx, pool):
+    with pool.connection() as conn:
+        rid = add_route(conn, DAY)
+        ids = [add_join(conn, DAY, rid, f"90000000{i:02d}") for i in range(7)]
+        conn.execute("UPDATE links SET gender = 'F' WHERE id IN (?, ?)", (ids[1], ids[5]))
+        conn.commit()
+    tab = Links(dbx)
+    tab._load_page(replace=True)
+    assert dbx.root.pump(lambda: not tab._loading)
+    assert tab.tree.items == [f"link_{i}" for i in ids[:3:-1]] and tab._has_more
+    tab._on_tree_scroll("0.0", "0.5")   # not near the end yet
+    assert not tab._loading
+    while tab._has_more:
+        tab._on_tree_scroll("0.6", "0.95")
+        assert dbx.root.pump(lambda: not tab._loading)
+    assert tab.tree.items == [f"link_{i}" for i in reversed(ids)]
+
+    women = Links(dbx, gender="Female")
+    women._load_page(replace=True)
+    assert dbx.root.pump(lambda: not women._loading)
+    assert women.tree.items == [f"link_{ids[5]}", f"link_{ids[1]}"] and not women._has_more
@@ -0,0 +1,36 @@
+import json
+
+from conftest import add_route, login
+
+DAY = "2030-03-04"
+
+
+def test_events_rejects_bad_date(client):
+    assert client.get("/events?date=tomorrow").status_code == 400
+
+
+def test_events_answers_busy_when_streams_are_used_up(client, webapp, monkeypatch):
+    monkeypatch.setattr(webapp, "SSE_MAX_STREAMS", 1)
+    with webapp.HUB.subscribe("date:2030-03-04"):
+        resp = client.get("/events?date=2030-03-04")
+        assert resp.status_code == 200 and resp.mimetype == "text/event-stream"
+        assert resp.get_data(as_text=True) == f"retry: {webapp.SSE_BUSY_RETRY_MS}\n: busy\n\n"
+    assert webapp.HUB.subscriber_count() == 0
+
+
+def test_join_is_pushed_to_the_open_stream(client, webapp):
+    with webapp.POOL.connection() as conn:
+        rid = add_route(conn, DAY)
+    resp = client.get(f"/events?date={DAY}", buffered=False)
+    assert resp.headers["Cache-Control"] == "no-cache" and resp.headers["X-Accel-Buffering"] == "no"
+    chunks = iter(resp.response)
+    assert next(chunks).decode() == f"retry: 5000\n: subscribed {DAY}\n\n"
+    login(client)
+    joined = client.post(f"/routes/{rid}/join", json={"date": DAY, "name": "A", "gender": "M", "drop": "Main Gate",
+                                                     "phone": "9000000001", "course_year": "2", "branch": "CSE"})
+    assert joined.status_code == 201
+    event = next(chunks).decode()
+    assert event.startswith("data: ")
+    assert json.loads(event[6:]) == {"type": "count", "date": DAY, "route_id": rid, "count": 1, "delta": 1}
+    resp.close()
+    assert webapp.HUB.subscriber_count() == 0
@@ -0,0 +1,58 @@
+import json
+import os
+
+from holiday_store import HolidayStore
+
+
+def _write(path, days, mtime):
+    path.write_text(json.dumps(days))
+    os.utime(path, (mtime, mtime))
+
+
+def test_json_is_parsed_once_and_reloaded_on_mtime_change(tmp_path, monkeypatch):
+    path = tmp_path / "h.json"
+    _write(path, ["2030-01-26", {"date": "2030-01-01"}, "not a date"], 1000)
+    store = HolidayStore(str(path), check_interval=0)
+    calls = []
+    import holiday_store
+    real = holiday_store.parse_json
+    monkeypatch.setattr(holiday_store, "parse_json", lambda p: calls.append(p) or real(p))
+    assert store.all() == ("2030-01-01", "2030-01-26")
+    assert store.is_holiday("2030-01-26") and "2030-01-02" not in store
+    v1 = store.version()
+    assert len(calls) == 1
+    _write(path, ["2030-08-15"], 2000)
+    assert store.all() == ("2030-08-15",)
+    assert store.version() != v1 and len(calls) == 2
+
+
+def test_between_is_inclusive(tmp_path):
+    path = tmp_path / "h.json"
+    _write(path, ["2030-01-01", "2030-01-26", "2030-03-08", "2030-08-15"], 1000)
+    store = HolidayStore(str(path))
+    assert store.between("2030-01-26", "2030-03-08") == ["2030-01-26", "2030-03-08"]
+    assert store.between("2030-04-01", "2030-04-30") == []
+
+
+def test_csv_fallback_and_unreadable_file_keeps_last_good_set(tmp_path):
+    js, cs = tmp_path / "h.json", tmp_path / "h.csv"
+    cs.write_text("date,name\n2030-10-02,Gandhi Jayanti\n")
+    store = HolidayStore(str(js), str(cs), check_interval=0)
+    assert store.all() == ("2030-10-02",)
+    _write(js, ["2030-11-01"], 1000)
+    assert store.all() == ("2030-11-01",)
+    js.write_text("[\"2030-")   # half-written
+    os.utime(js, (2000, 2000))
+    assert store.all() == ("2030-11-01",)
+
+
+def test_sample_fallback_is_generated_once_per_year(tmp_path):
+    years = []
+    def sample(year):
+        years.append(year)
+        return [f"{year}-12-25"]
+    store = HolidayStore(str(tmp_path / "missing.json"), fallback=sample, check_interval=0)
+    assert store.is_holiday("2031-12-25")
+    assert store.between("2031-01-01", "2032-12-31") == ["2031-12-25", "2032-12-25"]
+    store.is_holiday("2031-12-24")
+    assert sorted(set(years)) == sorted(years)
@@ -0,0 +1,43 @@
+import pytest
+
+from conftest import add_join, add_route, login
+
+
+@pytest.fixture
+def links(client, webapp):
+    login(client)
+    with webapp.POOL.connection() as conn:
+        march = add_route(conn, "2030-03-04")
+        april = add_route(conn, "2030-04-01")
+        ids = [add_join(conn, "2030-03-04", march, f"90000000{i:02d}", name=f"L{i}") for i in range(5)]
+        ids.append(add_join(conn, "2030-04-01", april, "9000000099", name="L5"))
+        conn.execute("UPDATE links SET gender = 'f', branch = 'ECE' WHERE id = ?", (ids[2],))
+        conn.commit()
+    return ids
+
+
+def test_links_keyset_pages(client, links):
+    seen, cursor = [], None
+    while True:
+        resp = client.get("/links?limit=4" + (f"&cursor={cursor}" if cursor else ""))
+        seen += [l["id"] for l in resp.json]
+        if resp.headers["X-Has-More"] == "0":
+            assert "X-Next-Cursor" not in resp.headers
+            break
+        cursor = resp.headers["X-Next-Cursor"]
+        assert int(cursor) == seen[-1]
+    assert seen == sorted(links, reverse=True)
+
+
+def test_links_filters(client, links):
+    assert [l["id"] for l in client.get("/links?gender=F").json] == [links[2]]
+    assert [l["id"] for l in client.get("/links?branch=ece").json] == [links[2]]
+    assert [l["id"] for l in client.get("/links?from=2030-04-01").json] == [links[5]]
+    assert len(client.get("/links?from=2030-03-01&to=2030-03-31").json) == 5
+    assert client.get("/links?from=March").status_code == 400
+
+
+def test_links_limit_is_clamped(client, links):
+    assert len(client.get("/links?limit=0").json) == 6
+    resp = client.get("/links?limit=1")
+    assert len(resp.json) == 1 and resp.headers["X-Has-More"] == "1"
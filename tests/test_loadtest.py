@@ -0,0 +1,45 @@
+import sqlite3
+
+import pytest
+
+import loadtest
+
+
+def test_parse_mix():
+    assert loadtest.parse_mix("browse=3, rush") == [("browse", 3.0), ("rush", 1.0)]
+    with pytest.raises(SystemExit):
+        loadtest.parse_mix("browse=1,_login_seeded=1")
+    with pytest.raises(SystemExit):
+        loadtest.parse_mix("nap=1")
+
+
+def test_percentile_is_nearest_rank():
+    values = [i / 100 for i in range(1, 101)]
+    assert loadtest.percentile(values, 50) == 0.5
+    assert loadtest.percentile(values, 99) == 0.99
+    assert loadtest.percentile([0.2], 95) == 0.2 and loadtest.percentile([], 95) == 0.0
+
+
+def test_summarize_splits_rejections_from_errors():
+    stats = loadtest.Stats()
+    for seconds, status in [(0.01, 201), (0.02, 409), (0.03, 500), (0.04, "error")]:
+        stats.add("POST /routes/<id>/join", seconds, status)
+    stats.add("GET /holidays", 0.005, 200)
+    rows = {r["endpoint"]: r for r in loadtest.summarize(stats, 2.0)}
+    join = rows["POST /routes/<id>/join"]
+    assert (join["requests"], join["rps"], join["4xx"], join["errors"], join["error_rate"]) == (4, 2.0, 1, 2, 0.5)
+    assert join["max_ms"] == pytest.approx(40.0)
+    assert rows["GET /holidays"]["errors"] == 0
+
+
+def test_seed_then_describe(tmp_path):
+    path = str(tmp_path / "load.db")
+    world = loadtest.seed(path, days=3, routes_per_day=4, joins_per_route=2, users=5, rush_seats=10)
+    assert world["routes"] == 12 and len(world["days"]) == 3 and world["hot"][0] == 1
+    again = loadtest.describe(path, users=5)
+    assert again["routes"] == 12 and again["days"] == world["days"] and again["hot"][0] == 1
+    conn = sqlite3.connect(path)
+    assert conn.execute("SELECT seat_cap, no_of_people FROM routes WHERE id = 1").fetchone() == (10, 0)
+    assert conn.execute("SELECT next FROM sequences WHERE name = 'slot_no'").fetchone()[0] == 13
+    assert conn.execute("SELECT COUNT(*) FROM users WHERE pw_algo = 'sha256'").fetchone()[0] == 5
+    conn.close()
@@ -0,0 +1,79 @@
+import sqlite3
+
+import pytest
+
+import metrics
+from conftest import login
+from metrics import Registry, TimedConnection, begin_request, end_request
+
+
+def _value(counter, *labels):
+    return counter._values.get(labels, 0.0)
+
+
+def test_render_counter_histogram_and_gauge():
+    reg = Registry()
+    c = reg.counter("t_total", "help", ("op",))
+    h = reg.histogram("t_seconds", "help", ("op",), buckets=(0.1, 1.0))
+    reg.gauge("t_open", "help", lambda: 3)
+    reg.gauge("t_broken", "help", lambda: 1 / 0)
+    c.inc('say "hi"')
+    c.inc('say "hi"', amount=2)
+    h.observe(0.05, "read")
+    h.observe(0.5, "read")
+    h.observe(5, "read")
+    lines = reg.render().splitlines()
+    assert "# TYPE t_total counter" in lines
+    assert 't_total{op="say \\"hi\\""} 3' in lines
+    assert 't_seconds_bucket{op="read",le="0.1"} 1' in lines
+    assert 't_seconds_bucket{op="read",le="1"} 2' in lines
+    assert 't_seconds_bucket{op="read",le="+Inf"} 3' in lines
+    assert 't_seconds_sum{op="read"} 5.55' in lines
+    assert 't_seconds_count{op="read"} 3' in lines
+    assert "t_open 3" in lines
+    assert not any(line.startswith("t_broken ") for line in lines)
+
+
+def test_timed_connection_counts_statements_per_request():
+    conn = sqlite3.connect(":memory:", factory=TimedConnection)
+    selects = _value(metrics.SQL_STATEMENTS, "SELECT")
+    begin_request()
+    conn.executescript("CREATE TABLE t (x); CREATE TABLE u (y);")
+    conn.executemany("INSERT INTO t VALUES (?)", [(1,), (2,)])
+    conn.execute("SELECT COUNT(*) FROM t").fetchone()
+    conn.cursor().execute("SELECT x FROM t").fetchall()
+    conn.commit()
+    statements, seconds = end_request()
+    assert statements == 5 and seconds >= 0
+    assert _value(metrics.SQL_STATEMENTS, "SELECT") == selects + 2
+    assert end_request() == (0, 0.0)
+
+
+def test_failing_statement_is_counted_as_error():
+    conn = sqlite3.connect(":memory:", factory=TimedConnection)
+    before = _value(metrics.SQL_ERRORS, "SELECT", "OperationalError")
+    with pytest.raises(sqlite3.OperationalError):
+        conn.execute("SELECT * FROM missing")
+    with pytest.raises(sqlite3.OperationalError):
+        conn.cursor().execute("SELECT * FROM missing")
+    assert _value(metrics.SQL_ERRORS, "SELECT", "OperationalError") == before + 2
+
+
+def test_metrics_endpoint_reports_requests(client, webapp):
+    client.get("/me")
+    body = client.get("/metrics").get_data(as_text=True)
+    assert 'routelink_http_requests_total{method="GET",endpoint="/me",status="200"}' in body
+    assert "routelink_pool_idle_connections" in body
+
+
+def test_failed_links_query_is_500_and_counted(client, webapp):
+    login(client)
+    with webapp.POOL.connection() as conn:
+        conn.execute("DROP TABLE calendar")
+        conn.execute("DROP TABLE links")
+        conn.commit()
+    before = _value(webapp.HANDLED, "/links", "OperationalError")
+    resp = client.get("/links")
+    assert resp.status_code == 500 and "error" in resp.get_json()
+    assert _value(webapp.HANDLED, "/links", "OperationalError") == before + 1
+    assert _value(webapp.REQUESTS, "GET", "/links", "500") >= 1
@@ -0,0 +1,85 @@
+import sqlite3
+
+import pytest
+
+from conftest import BASE_SCHEMA, add_join, add_route, base_db
+from migrations import MIGRATIONS, migrate, schema_version
+
+LATEST = MIGRATIONS[-1][0]
+DAY = "2030-03-04"
+
+
+def _version(conn, key="date:" + DAY):
+    r = conn.execute("SELECT n FROM data_versions WHERE key=?", (key,)).fetchone()
+    return r[0] if r else 0
+
+
+def test_fresh_database_reaches_latest_and_is_idempotent():
+    conn = base_db(sqlite3.connect(":memory:"))
+    assert schema_version(conn) == LATEST
+    assert migrate(conn) == []
+
+
+def test_step_by_step_upgrade_keeps_data():
+    conn = sqlite3.connect(":memory:")
+    conn.executescript(BASE_SCHEMA)
+    conn.execute("INSERT INTO routes (slot_no, end_point, time, transport_type) VALUES ('SL1', ' Gate ', '09:00', 'Bus')")
+    conn.execute("INSERT INTO calendar (travel_date, route_id) VALUES (?, 1)", (DAY,))
+    conn.execute("INSERT INTO links (name, phone) VALUES ('A', '9000000001')")
+    conn.execute("INSERT INTO calendar (travel_date, route_id, link_id) VALUES (?, 1, 1)", (DAY,))
+    conn.commit()
+    for version, _, _ in MIGRATIONS:
+        assert migrate(conn, version) == [version]
+    row = conn.execute("SELECT key_date, end_point_key, no_of_people FROM routes").fetchone()
+    assert row == (DAY, "gate", 1)
+    assert conn.execute("SELECT join_phone FROM calendar WHERE link_id = 1").fetchone()[0] == "9000000001"
+
+
+def test_failed_migration_rolls_back(monkeypatch):
+    conn = sqlite3.connect(":memory:")
+    conn.executescript(BASE_SCHEMA)
+    def boom(c):
+        c.execute("CREATE TABLE half_done (x)")
+        raise RuntimeError("boom")
+    monkeypatch.setattr("migrations.MIGRATIONS", [(1, "ok", lambda c: None), (2, "fails", boom)])
+    with pytest.raises(RuntimeError):
+        migrate(conn)
+    assert schema_version(conn) == 1
+    assert conn.execute("SELECT 1 FROM sqlite_master WHERE name = 'half_done'").fetchone() is None
+
+
+def test_lookup_indexes_serve_the_per_date_counts():
+    conn = base_db(sqlite3.connect(":memory:"), 2)
+    names = {r[0] for r in conn.execute("SELECT name FROM sqlite_master WHERE type = 'index'")}
+    assert {"idx_calendar_date_route_link", "idx_links_phone", "idx_routes_end_point_norm"} <= names
+    plan = conn.execute("""EXPLAIN QUERY PLAN SELECT COUNT(*) FROM calendar
+                           WHERE travel_date = ? AND route_id = ? AND link_id IS NOT NULL""", (DAY, 1)).fetchall()
+    assert any("COVERING INDEX idx_calendar_date_route_link" in r[-1] for r in plan)
+    plan = conn.execute("EXPLAIN QUERY PLAN SELECT id FROM routes WHERE LOWER(end_point) = ?", ("gate",)).fetchall()
+    assert any("idx_routes_end_point_norm" in r[-1] for r in plan)
+
+
+def test_route_update_bumps_versions_only_for_displayed_columns(db):
+    rid = add_route(db, DAY, seat_cap=None)
+    before = _version(db)
+    db.execute("UPDATE routes SET seat_cap = 5, no_of_people = 0, key_date = key_date WHERE id = ?", (rid,))
+    db.commit()
+    assert _version(db) == before
+    db.execute("UPDATE routes SET end_point = 'Elsewhere' WHERE id = ?", (rid,))
+    db.commit()
+    assert _version(db) == before + 1
+
+
+def test_calendar_writes_bump_date_and_month(db):
+    rid = add_route(db, DAY)
+    day, month = _version(db), _version(db, "month:" + DAY[:7])
+    add_join(db, DAY, rid, "9000000001")
+    assert _version(db) == day + 1 and _version(db, "month:" + DAY[:7]) == month + 1
+
+
+def test_calendar_indexes(db):
+    names = {r[0] for r in db.execute("SELECT name FROM sqlite_master WHERE type = 'index' AND tbl_name = 'calendar'")}
+    assert {"idx_calendar_date_route_link", "idx_calendar_link_date", "idx_calendar_route_date"} <= names
+    assert "idx_calendar_link" not in names   # a prefix of idx_calendar_link_date
+    plan = db.execute("EXPLAIN QUERY PLAN SELECT travel_date FROM calendar WHERE route_id = 1").fetchall()
+    assert any("idx_calendar_route_date" in r[-1] for r in plan)
@@ -0,0 +1,91 @@
+import json
+
+import pytest
+
+from passwords import HasherBusy, PasswordHasher, hasher_busy, legacy_sha256, upgrade_stored_hash
+
+FAST = {"n": 2 ** 10, "r": 8, "p": 1, "dklen": 32}
+
+
+@pytest.fixture
+def hasher():
+    h = PasswordHasher(workers=1, params=FAST)
+    yield h
+    h.shutdown()
+
+
+def test_scrypt_hash_round_trip(hasher):
+    stored, algo, params = hasher.hash("hunter22")
+    assert algo == "scrypt" and json.loads(params) == FAST
+    salt, _, key = stored.partition("$")
+    assert len(bytes.fromhex(salt)) == 16 and len(bytes.fromhex(key)) == 32
+    assert hasher.verify("hunter22", stored, algo, params)
+    assert not hasher.verify("hunter23", stored, algo, params)
+    assert hasher.hash("hunter22")[0] != stored   # salted
+    assert hasher.in_flight() == 0
+
+
+def test_legacy_and_malformed_hashes(hasher):
+    assert hasher.verify("pw", legacy_sha256("pw"), None, None)
+    assert hasher.verify("pw", legacy_sha256("pw"), "sha256", None)
+    assert not hasher.verify("pw", legacy_sha256("other"), None, None)
+    assert not hasher.verify("pw", None, "scrypt", None)
+    assert not hasher.verify("pw", "zz$zz", "scrypt", json.dumps(FAST))
+    assert not hasher.verify("pw", "00$00", "bcrypt", None)
+
+
+def test_needs_rehash(hasher):
+    assert hasher.needs_rehash(None, None)
+    assert hasher.needs_rehash("sha256", None)
+    assert hasher.needs_rehash("scrypt", json.dumps(dict(FAST, n=2 ** 9)))
+    assert hasher.needs_rehash("scrypt", "not json")
+    assert not hasher.needs_rehash("scrypt", json.dumps(FAST))
+
+
+def test_upgrade_replaces_legacy_hash(db, hasher):
+    old = legacy_sha256("pw")
+    db.execute("INSERT INTO users (id, name, email, password_hash, gender) VALUES (1, 'A', 'a@vitstudent.ac.in', ?, 'F')", (old,))
+    db.commit()
+    assert upgrade_stored_hash(db, hasher, 1, "pw", old, None, None)
+    stored, algo, params = db.execute("SELECT password_hash, pw_algo, pw_params FROM users WHERE id = 1").fetchone()
+    assert algo == "scrypt" and hasher.verify("pw", stored, algo, params)
+    assert not upgrade_stored_hash(db, hasher, 1, "pw", stored, algo, params)   # already current
+    # a password change that raced the login is not overwritten
+    assert not upgrade_stored_hash(db, hasher, 1, "pw", old, None, None)
+
+
+def test_busy_when_full_or_slow():
+    h = PasswordHasher(workers=1, max_in_flight=1, params=FAST)
+    try:
+        h._slots.acquire()
+        with pytest.raises(HasherBusy):
+            h.hash("pw")
+        h._slots.release()
+        h.timeout = 0.001
+        with pytest.raises(HasherBusy):
+            h.verify("pw", "00$00", "scrypt", json.dumps(dict(FAST, n=2 ** 15)))
+    finally:
+        h.shutdown()
+
+
+def test_login_upgrades_legacy_account(client, webapp, monkeypatch):
+    fast = PasswordHasher(workers=1, params=FAST)
+    monkeypatch.setattr(webapp, "HASHER", fast)
+    with webapp.POOL.connection() as conn:
+        conn.execute("INSERT INTO users (name, email, password_hash, gender) VALUES ('A', 'a@vitstudent.ac.in', ?, 'F')",
+                     (legacy_sha256("pw"),))
+        conn.commit()
+    try:
+        assert client.post("/login", json={"email": "a@vitstudent.ac.in", "password": "nope"}).status_code == 401
+        assert client.post("/login", json={"email": "a@vitstudent.ac.in", "password": "pw"}).get_json()["ok"]
+        with webapp.POOL.connection() as conn:
+            assert conn.execute("SELECT pw_algo FROM users").fetchone()[0] == "scrypt"
+        assert client.post("/login", json={"email": "a@vitstudent.ac.in", "password": "pw"}).status_code == 200
+    finally:
+        fast.shutdown()
+
+
+def test_hasher_busy_response(webapp):
+    with webapp.app.test_request_context():
+        resp = hasher_busy()
+    assert resp.status_code == 503 and resp.headers["Retry-After"] == "1"
@@ -0,0 +1,50 @@
+import threading
+import time
+
+from conftest import login
+
+ROUTE = {"route_id": "3", "date": "2030-03-04"}
+QUERY = "/messages?route_id=3&date=2030-03-04"
+
+
+def _client(module):
+    client = module.app.test_client()
+    login(client, 1, "A")
+    return client
+
+
+def test_route_messages_page_both_ways(route_chat_app):
+    client = _client(route_chat_app)
+    ids = [client.post("/messages", json={**ROUTE, "text": f"m{i}"}).json["id"] for i in range(5)]
+    client.post("/messages", json={"route_id": "4", "date": "2030-03-04", "text": "other route"})
+    latest = client.get(QUERY + "&limit=2")
+    assert [m["id"] for m in latest.json] == ids[-2:] and latest.headers["X-Has-More"] == "1"
+    older = client.get(QUERY + f"&limit=2&before_id={ids[-2]}")
+    assert [m["id"] for m in older.json] == ids[1:3]
+    newer = client.get(QUERY + f"&after_id={ids[1]}")
+    assert [m["id"] for m in newer.json] == ids[2:] and newer.headers["X-Has-More"] == "0"
+
+
+def test_route_long_poll_wakes_on_post(route_chat_app):
+    client = _client(route_chat_app)
+    first = client.post("/messages", json={**ROUTE, "text": "hello"}).json["id"]
+    result = {}
+    def poll():
+        started = time.monotonic()
+        r = client.get(QUERY + f"&after_id={first}&wait=5")
+        result.update(ids=[m["id"] for m in r.json], took=time.monotonic() - started)
+    t = threading.Thread(target=poll)
+    t.start()
+    deadline = time.monotonic() + 2
+    while not route_chat_app.HUB.subscriber_count("route:3:2030-03-04") and time.monotonic() < deadline:
+        time.sleep(0.01)
+    new_id = _client(route_chat_app).post("/messages", json={**ROUTE, "text": "wake"}).json["id"]
+    t.join(5)
+    assert result["ids"] == [new_id] and result["took"] < 4
+
+
+def test_route_long_poll_times_out_empty(route_chat_app):
+    client = _client(route_chat_app)
+    first = client.post("/messages", json={**ROUTE, "text": "hello"}).json["id"]
+    resp = client.get(QUERY + f"&after_id={first}&wait=0.1")
+    assert resp.status_code == 200 and resp.json == []
@@ -0,0 +1,42 @@
+import threading
+
+from conftest import base_db
+from slotseq import SlotSequence, slot_label
+
+
+def test_slot_label_format():
+    assert [slot_label(n) for n in (1, 10, 36, 46656)] == ["SL0001", "SL000A", "SL0010", "SL1000"]
+
+
+def test_blocks_are_reserved_once_and_never_overlap(pool):
+    with pool.connection() as conn:
+        base_db(conn)
+    a, b = SlotSequence(pool, block=4), SlotSequence(pool, block=4)
+    assert [a.next() for _ in range(3)] == [1, 2, 3]
+    assert [b.next() for _ in range(2)] == [5, 6]      # a holds 1-4
+    assert [a.next() for _ in range(2)] == [4, 9]      # a's next block starts after b's
+    with pool.connection() as conn:
+        assert conn.execute("SELECT next FROM sequences WHERE name = 'slot_no'").fetchone()[0] == 13
+
+
+def test_continues_after_existing_slots(pool):
+    with pool.connection() as conn:
+        base_db(conn, target=4)
+        conn.execute("INSERT INTO routes (slot_no) VALUES ('SL00ZZ')")
+        conn.commit()
+        base_db(conn)
+    assert SlotSequence(pool).next() == int("ZZ", 36) + 1
+
+
+def test_threads_get_distinct_numbers(pool):
+    with pool.connection() as conn:
+        base_db(conn)
+    seq, got = SlotSequence(pool, block=3), []
+    def take():
+        got.extend(seq.next() for _ in range(50))
+    threads = [threading.Thread(target=take) for _ in range(4)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    assert sorted(got) == list(range(1, 201))